@@ -3,30 +3,77 @@ from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import paho.mqtt.client as mqtt
 import subprocess
-import threading
 import os
 import sys
 import time
 from datetime import datetime
 import io
 import signal
+import argparse
+import numpy as np
+from ui_queue import UiUpdateQueue
+from device_registry import load_registry
+from sensor_series import SensorHistory
+from voice_console import StreamReader, BoundedConsole
+from voice_events import EventServer
+from local_broker import LocalBroker
+from mqtt_session import MqttSession
+from mqtt_metrics import MqttMetrics
+from mqtt_replay import MessageLog, Replayer, RecordedMessage, LoopLagProbe, format_report
+from tk_watchdog import TkWatchdog
+from view_model import ViewModel
+from home_controller import HomeController, HomeHub
 
 # Fix encoding issues
 if sys.stdout.encoding != 'UTF-8':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
 if sys.stderr.encoding != 'UTF-8':
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', line_buffering=True)
 
 if os.name == 'nt':
     os.system('chcp 65001 > nul')
 
+# ========== COMMAND LINE ==========
+parser = argparse.ArgumentParser(description="Smart home dashboard")
+parser.add_argument("--broker", help="MQTT broker host (default: devices.json)")
+parser.add_argument("--port", type=int, help="MQTT broker port (default: devices.json)")
+parser.add_argument("--record", metavar="LOG", help="append every received message to a binary log")
+parser.add_argument("--replay", metavar="LOG", help="replay a recorded log to load test the dashboard")
+parser.add_argument("--replay-speed", type=float, default=1.0, help="replay speed multiple, 0 = as fast as possible")
+parser.add_argument("--replay-via-broker", action="store_true",
+                    help="replay through a local broker instead of straight into on_message")
+parser.add_argument("--metrics-file", metavar="PATH", help="write MQTT metrics snapshots (JSON) to this file")
+parser.add_argument("--metrics-interval", type=float, default=30, help="seconds between metrics snapshots")
+parser.add_argument("--watchdog-threshold", type=float, default=100,
+                    help="Tk loop lag (ms) past which the watchdog samples stacks")
+parser.add_argument("--watchdog-file", metavar="PATH", default="tk_watchdog_profile.json",
+                    help="where the watchdog profile is written (on exit and from the Watchdog window)")
+args = parser.parse_args()
+
 # ========== CONSTANTS ==========
-MQTT_BROKER = "broker.emqx.io"
-MQTT_PORT = 1883
-LED_TOPIC = "/home/led"
-FAN_TOPIC = "/home/fan"
-TEMP_TOPIC = "/home/temp"
-HUMIDITY_TOPIC = "/home/humidity"
+registry = load_registry()
+MQTT_BROKER = args.broker or registry.broker.get("host", "broker.emqx.io")
+MQTT_PORT = args.port or registry.broker.get("port", 1883)
+local_broker = None
+if args.replay and args.replay_via_broker:
+    local_broker = LocalBroker().start()
+    MQTT_BROKER, MQTT_PORT = local_broker.host, local_broker.port
+FAN_PUBLISH_RATE = 10  # Max fan updates per second while dragging the slider
+DASHBOARD_STATUS_TOPIC = "/dashboard/status"  # "online" while connected, "offline" otherwise
+CONSOLE_MAX_LINES = 2000  # Older voice output lines are trimmed past this
+STALE_CHECK_MS = 5000  # How often sensor cards are checked for stale readings
+HISTORY_DIR = "sensor_history"  # Memory-mapped sensor time series, kept across restarts
+CHART_HEIGHT = 160
+CHART_WINDOWS = (("1 h", 3600), ("24 h", 86400), ("7 d", 7 * 86400))
+CONNECTION_CHECK_MS = 1000  # Status bar refresh while the broker is unreachable
+DIAGNOSTICS_REFRESH_MS = 1000
+DIAGNOSTICS_COLUMNS = (
+    ("out", "Out/s"), ("in", "In/s"), ("acked", "Acked"), ("in_flight", "In flight"),
+    ("ack_p50", "Ack p50"), ("ack_p95", "Ack p95"), ("retries", "Retries"), ("dropped", "Dropped"),
+    ("handler_p95", "Handler p95"),
+)
+REPLAY_DELAY_MS = 2000  # Let the window and broker connection settle before replaying
+WATCHDOG_REFRESH_MS = 1000
 
 # Color Scheme
 BG_COLOR = "#121212"
@@ -47,22 +94,34 @@ LED_IMG_SIZE = (60, 60)
 FAN_IMG_SIZE = (60, 60)
 HOME_IMG_SIZE = (200, 200)
 
-# ========== GLOBALS ==========
-# Old (broken):
-# client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+# Device cards
+DEVICE_COLUMNS = 4
+SENSOR_UNITS = {"temperature": "°C", "humidity": "%"}
 
-# New (working):
-client = mqtt.Client(
-    callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
-    protocol=mqtt.MQTTv5  # or mqtt.MQTTv311
-)
+# ========== GLOBALS ==========
+# Reconnects with backoff and holds commands while offline (see mqtt_session.py)
+mqtt_metrics = MqttMetrics()  # Per-topic ack latency, in-flight, retries, rates, handler time
+session = MqttSession(MQTT_BROKER, MQTT_PORT, protocol=mqtt.MQTTv5, metrics=mqtt_metrics, topic_aliases=True)
+client = session.client
+sensor_history = SensorHistory(HISTORY_DIR)
+# Device state, commands and message decoding live in the headless core (home_controller.py);
+# the dashboard is one home on a hub and only renders what the controller applies.
+hub = HomeHub(session, reader_id="dashboard", status_topic=DASHBOARD_STATUS_TOPIC)
+controller = hub.add_home(HomeController(registry, session, history=sensor_history, fan_rate=FAN_PUBLISH_RATE))
+publisher = controller.publisher
+device_state = controller.device_state  # Last-known value per topic, as in the voice script
+view = ViewModel()  # What each widget shows; handlers only touch Tk when a value changes
 
 voice_process = None
 voice_control_active = False
-voice_thread = None
-ignore_initial_messages = True
+voice_reader = None
 last_update_time = "Never"
-fan_slider_moving = False
+device_widgets = {}  # device id -> widgets built for that device
+voice_timing = {}  # Timestamps of the utterance being handled, from voice events
+chart_devices = {}  # chart picker label -> sensor device
+message_log = MessageLog(args.record) if args.record else None
+replay_samples = None  # Handler latencies (s) while a replay runs
+replay_received = 0
 
 def resource_path(relative_path):
     try:
@@ -71,16 +130,20 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+def set_status(text):
+    # Every status bar write goes through the view model so its cached text stays true
+    view.config(status_bar, text=text)
+
 def update_timestamp():
     global last_update_time
     last_update_time = datetime.now().strftime("%H:%M:%S")
-    status_bar.config(text=f"Last update: {last_update_time} | Connected to {MQTT_BROKER}")
+    set_status(f"Last update: {last_update_time} | Connected to {MQTT_BROKER}")
 
 def on_connect(client, userdata, flags, reason_code, properties=None):
     if reason_code == 0:
+        # The hub has subscribed (no-local, so our own commands never echo back)
         print("Connected to MQTT broker!")
-        client.subscribe([(LED_TOPIC, 0), (FAN_TOPIC, 0), (TEMP_TOPIC, 0), (HUMIDITY_TOPIC, 0)])
-        update_timestamp()
+        ui_queue.post("status", update_timestamp)
     else:
         error_messages = {
             1: "Incorrect protocol version",
@@ -91,222 +154,376 @@ def on_connect(client, userdata, flags, reason_code, properties=None):
         }
         error_msg = error_messages.get(reason_code, f"Unknown error ({reason_code})")
         print(f"Connection failed: {error_msg}")
-        status_bar.config(text=f"Connection failed: {error_msg}")
-
-def on_disconnect(client, userdata, rc, properties=None, reasonCode=None):
-    disconnect_reasons = {
-        0: "Normal disconnection",
-        1: "Broker unavailable",
-        2: "Protocol error",
-        3: "Client error",
-        4: "Transport error"
-    }
-    reason = disconnect_reasons.get(rc, f"Unknown reason ({rc})")
-    print(f"Disconnected: {reason}")
-    # Your reconnection logic here
-def on_message(client, userdata, msg):
-    global ignore_initial_messages
-    
-    if ignore_initial_messages:
-        ignore_initial_messages = False
+        ui_queue.post("status", set_status, f"Connection failed: {error_msg}")
+
+def on_disconnect(client, userdata, flags, reason_code, properties=None):
+    # The session reconnects on its own; commands sent meanwhile wait in its outbox
+    print(f"Disconnected: {reason_code}")
+    ui_queue.post("status", show_connection_status)
+
+def show_connection_status():
+    stats = session.stats()
+    if stats["connected"]:
+        update_timestamp()
         return
+    retry = session.next_retry
+    retry_text = f", retrying in {max(0, retry - time.time()):.0f} s" if retry else ""
+    set_status(f"Offline for {stats['current_outage']:.0f} s{retry_text} "
+               f"({stats['outbox']} command(s) waiting, {stats['reconnects']} reconnect(s) so far)")
 
-    print(f"Received on {msg.topic}: {msg.payload.decode()}")
-    update_timestamp()
+def watch_connection():
+    if not session.connected:
+        show_connection_status()
+    root.after(CONNECTION_CHECK_MS, watch_connection)
 
+def on_message(client, userdata, msg):
+    # Runs on paho's network thread: the controller decodes and caches the
+    # message, then show_message hands it to the Tk loop.
+    global replay_received
+    if message_log:
+        message_log.record(msg.topic, msg.payload)
+    if replay_samples is not None:
+        replay_received += 1
     try:
-        if msg.topic == LED_TOPIC:
-            handle_led_message(msg.payload.decode())
-        elif msg.topic == FAN_TOPIC:
-            handle_fan_message(msg.payload.decode())
-        elif msg.topic == TEMP_TOPIC:
-            handle_temp_message(msg.payload.decode())
-        elif msg.topic == HUMIDITY_TOPIC:
-            handle_humidity_message(msg.payload.decode())
+        hub.on_message(client, userdata, msg)
     except Exception as e:
         print(f"Error processing message: {e}")
 
-def handle_led_message(state):
+def show_message(topic, payload, received, older):
+    # ui_queue keeps only the newest message per topic until the next frame;
+    # the controller has already put every reading into the history.
+    print(f"Received on {topic}: {payload}")
+    ui_queue.post("status", update_timestamp)
+    ui_queue.post(topic, dispatch_message, topic, payload, received)
+
+controller.on_receive = show_message
+
+def dispatch_message(topic, payload, received):
+    started = time.perf_counter()
+    controller.apply(topic, payload)
+    finished = time.perf_counter()
+    mqtt_metrics.handled(topic, finished - started)
+    if replay_samples is not None:
+        replay_samples.append(finished - received)
+
+def start_replay():
+    global replay_samples, replay_received
+    replay_samples = []
+    replay_received = 0
+    lag_probe.start()
+    if args.replay_via_broker:
+        feeder = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="replayer")
+        feeder.connect(MQTT_BROKER, MQTT_PORT)
+        feeder.loop_start()
+        deliver = lambda topic, payload: feeder.publish(topic, payload)
+    else:
+        deliver = lambda topic, payload: on_message(client, None, RecordedMessage(topic, payload))
+    console.append(f"Replaying {args.replay} at {args.replay_speed or 'max'}x...\n")
+    Replayer(args.replay, args.replay_speed).start(
+        deliver, on_done=lambda stats: ui_queue.call(root.after, 500, finish_replay, stats)
+    )
+
+def finish_replay(stats):
+    global replay_samples
+    lag_probe.stop()
+    report = format_report(stats, replay_samples, lag_probe.samples, replay_received)
+    replay_samples = None
+    print(report)
+    console.append(report + "\n")
+
+def set_image(widget, photo, text):
+    if photo is not None:
+        view.config(widget, image=photo)
+    else:
+        view.config(widget, text=text)
+
+def handle_led_message(device, state):
+    widgets = device_widgets[device.id]
     if state == "ON":
-        led_button.config(image=led_on_photo)
-        led_status.config(text="Status: ON")
+        set_image(widgets["button"], led_on_photo, device.name)
+        view.config(widgets["status"], text="Status: ON")
     else:
-        led_button.config(image=led_off_photo)
-        led_status.config(text="Status: OFF")
+        set_image(widgets["button"], led_off_photo, device.name)
+        view.config(widgets["status"], text="Status: OFF")
 
-def handle_fan_message(speed):
-    global fan_slider_moving
-    
+def handle_fan_message(device, speed):
+    widgets = device_widgets[device.id]
     try:
         speed = int(speed)
-        if not fan_slider_moving:
-            fan_slider.set(speed)
-            fan_entry.delete(0, tk.END)
-            fan_entry.insert(0, str(speed))
-        if speed > 0:
-            fan_button.config(image=fan_on_photo)
-        else:
-            fan_button.config(image=fan_off_photo)
+        if not widgets["moving"]:
+            view.set_value(widgets["slider"], speed)
+            view.set_text(widgets["entry"], str(speed))
+        set_image(widgets["icon"], fan_on_photo if speed > 0 else fan_off_photo, device.name)
     except ValueError:
         pass
 
-def handle_temp_message(temp):
+def handle_sensor_message(device, value):
     try:
-        temp = float(temp)
-        temp_gauge.config(text=f"{temp}°C")
+        value = float(value)
+        unit = device.options.get("unit", SENSOR_UNITS.get(device.type, ""))
+        view.config(device_widgets[device.id]["gauge"], text=f"{value}{unit}")
     except ValueError:
-        pass
+        return
+    # The controller has already added the reading to sensor_history
+    if chart_devices.get(chart_device.get()) is device and chart_scroll.get() == 0:
+        ui_queue.post("chart", redraw_chart)
+
+def redraw_chart():
+    # Only the decimated points of the visible window are handed to the canvas
+    device = chart_devices.get(chart_device.get())
+    series = sensor_history.get(device.id) if device else None
+    time_range = series.time_range() if series else None
+    width = chart_canvas.winfo_width()
+    height = chart_canvas.winfo_height()
+    if time_range is None or width < 2:
+        chart_canvas.coords(chart_line, 0, 0, 0, 0)
+        chart_range_label.config(text="No data")
+        return
 
-def handle_humidity_message(humidity):
-    try:
-        humidity = float(humidity)
-        humidity_gauge.config(text=f"{humidity}%")
-    except ValueError:
-        pass
+    first, last = time_range
+    span = chart_span.get()
+    end = last - float(chart_scroll.get()) * max(0.0, (last - first) - span)
+    start = end - span
+    times, values = series.window(start, end, max_points=width)
+    if len(times) < 2:
+        chart_canvas.coords(chart_line, 0, 0, 0, 0)
+    else:
+        low, high = float(values.min()), float(values.max())
+        if high == low:
+            high = low + 1
+        pad = 12
+        xs = (times - start) * ((width - 1) / span)
+        ys = pad + (high - values) * ((height - 2 * pad) / (high - low))
+        chart_canvas.coords(chart_line, *np.column_stack((xs, ys)).ravel().tolist())
+        chart_canvas.itemconfig(chart_high_text, text=f"{high:.1f}")
+        chart_canvas.itemconfig(chart_low_text, text=f"{low:.1f}")
+        chart_canvas.coords(chart_low_text, 4, height - 2)
+    chart_range_label.config(
+        text=f"{datetime.fromtimestamp(start):%d %b %H:%M} - {datetime.fromtimestamp(end):%d %b %H:%M}"
+    )
+
+registry.register_handler("led", handle_led_message)
+registry.register_handler("fan", handle_fan_message)
+registry.register_handler("temperature", handle_sensor_message)
+registry.register_handler("humidity", handle_sensor_message)
 
 def connect_to_mqtt():
+    session.on_message = on_message  # Logs and counts raw traffic, then forwards to the hub
+    hub.on_connect = on_connect
+    hub.on_disconnect = on_disconnect
+    # Announces /dashboard/status and device availability, then connects and
+    # reconnects in the background
+    hub.start()
+
+def refresh_staleness():
+    # Grey out sensor readings older than their max_age
+    for device in registry.devices.values():
+        widgets = device_widgets.get(device.id)
+        if widgets and "gauge" in widgets:
+            state = device_state.get(device.topic)
+            if state is not None:
+                stale = device_state.is_stale(state)
+                view.config(widgets["gauge"], style='StaleGauge.TLabel' if stale else 'Gauge.TLabel')
+    root.after(STALE_CHECK_MS, refresh_staleness)
+
+def toggle_led(device):
+    controller.toggle_led(device)  # Published and rendered at once; the broker sends no echo
+
+def apply_scene(scene_id):
+    # Every state goes out back to back; the status bar reports once the broker has acked them all
     try:
-        client.will_set(FAN_TOPIC, "0", qos=1, retain=True)
-        client.will_set(LED_TOPIC, "OFF", qos=1, retain=True)
-        
-        client.on_connect = on_connect
-        client.on_message = on_message
-        client.on_disconnect = on_disconnect
-        
-        # Add clean_start parameter for MQTTv5
-        client.connect(
-            MQTT_BROKER, 
-            MQTT_PORT, 
-            keepalive=60,
-            clean_start=True  # False if you want persistent session
-        )
-        client.loop_start()
-    except Exception as e:
-        print(f"MQTT error: {e}")
-        status_bar.config(text=f"Connection error: {str(e)}")
-    
-def toggle_led():
-    current_state = led_status.cget("text").split(": ")[1]
-    if current_state == "OFF":
-        client.publish(LED_TOPIC, "ON", qos=1)
-    else:
-        client.publish(LED_TOPIC, "OFF", qos=1)
-
-def set_fan_speed(value=None):
+        controller.apply_scene(scene_id, on_complete=lambda batch: ui_queue.call(show_scene_result, batch))
+    except KeyError as e:
+        messagebox.showerror("Error", f"Cannot apply scene: {e}")
+        return
+    set_status(f"Applying scene {registry.scenes[scene_id].get('name', scene_id)}...")
+
+def show_scene_result(batch):
+    name = registry.scenes[batch.name].get("name", batch.name)
+    failed = f", {len(batch.failed)} failed" if batch.failed else ""
+    set_status(f"Scene {name}: {len(batch.topics)} device(s) acknowledged "
+               f"in {batch.elapsed * 1000:.0f} ms{failed}")
+
+def set_fan_speed(device, value=None):
+    widgets = device_widgets[device.id]
+    max_speed = device.options.get("max", 255)
+    explicit = value is None
     if value is None:
         try:
-            value = int(fan_entry.get())
+            value = int(widgets["entry"].get())
         except ValueError:
-            messagebox.showerror("Error", "Please enter a number between 0-255")
+            messagebox.showerror("Error", f"Please enter a number between 0-{max_speed}")
             return
     
-    if 0 <= value <= 255:
-        client.publish(FAN_TOPIC, str(value), qos=1)
-        if value > 0:
-            fan_button.config(image=fan_on_photo)
-        else:
-            fan_button.config(image=fan_off_photo)
-
-def on_slider_change(event):
-    global fan_slider_moving
-    fan_slider_moving = True
-    value = fan_slider.get()
-    fan_entry.delete(0, tk.END)
-    fan_entry.insert(0, str(int(value)))
-    if abs(value - int(value)) < 0.1:
-        set_fan_speed(int(value))
-    fan_slider_moving = False
-
-def on_entry_change(event):
     try:
-        value = int(fan_entry.get())
-        if 0 <= value <= 255:
-            fan_slider.set(value)
-            set_fan_speed(value)
+        # "Set" button: send right away instead of waiting for the rate limit
+        controller.set_fan_speed(device, value, immediate=explicit)
+    except ValueError:
+        return
+    set_image(widgets["icon"], fan_on_photo if value > 0 else fan_off_photo, device.name)
+
+def on_slider_change(device, event):
+    widgets = device_widgets[device.id]
+    widgets["moving"] = True
+    value = int(round(widgets["slider"].get()))
+    view.note(widgets["slider"], "value", value)
+    view.set_text(widgets["entry"], str(value))
+    set_fan_speed(device, value)
+    widgets["moving"] = False
+
+def on_entry_change(device, event):
+    widgets = device_widgets[device.id]
+    text = widgets["entry"].get()
+    view.note(widgets["entry"], "text", text)
+    try:
+        value = int(text)
+        if 0 <= value <= device.options.get("max", 255):
+            view.set_value(widgets["slider"], value)
+            set_fan_speed(device, value)
     except ValueError:
         pass
 
+def voice_engine_running():
+    return voice_process is not None and voice_process.poll() is None
+
+def send_voice_command(command):
+    # Control channel to the warm voice engine: one command per line on its stdin
+    try:
+        voice_process.stdin.write(command + "\n")
+        voice_process.stdin.flush()
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
+
 def launch_voice_control():
-    global voice_process, voice_control_active, voice_thread
+    global voice_control_active
     
     if not voice_control_active:
-        try:
-            script_path = resource_path("VoiceControlForHome.py")
-            if not os.path.exists(script_path):
-                script_path = "C:\\codes\\IOT\\VoiceControlForHome.py"
-                if not os.path.exists(script_path):
-                    raise FileNotFoundError("VoiceControlForHome.py not found")
-
-            output_text.delete(1.0, tk.END)
-            output_text.insert(tk.END, "Starting voice control...\n")
-            output_text.see(tk.END)
-            
-            voice_btn.config(text="Stop Voice Control", style='Accent.TButton')
-            voice_control_active = True
-            
-            voice_process = subprocess.Popen(
-                [sys.executable, script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1,
-                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0,
-                shell=True
-            )
-            
-            voice_thread = threading.Thread(
-                target=monitor_voice_output,
-                daemon=True
-            )
-            voice_thread.start()
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to launch voice control:\n{str(e)}")
-            voice_control_active = False
-            voice_btn.config(text="Start Voice Control", style='TButton')
+        if voice_engine_running() and send_voice_command("resume"):
+            # Engine is still warm: broker, recognizer and TTS cache are ready
+            console.append("Voice control resumed\n")
+        else:
+            try:
+                start_voice_engine()
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to launch voice control:\n{str(e)}")
+                return
+        voice_control_active = True
+        voice_btn.config(text="Stop Voice Control", style='Accent.TButton')
     else:
-        stop_voice_control()
+        if not send_voice_command("pause"):
+            stop_voice_control()
+        voice_control_active = False
         voice_btn.config(text="Start Voice Control", style='TButton')
-        output_text.insert(tk.END, "Voice control stopped\n")
-        output_text.see(tk.END)
+        console.append("Voice control stopped\n")
 
-def monitor_voice_output():
-    global voice_process, voice_control_active
+def start_voice_engine():
+    global voice_process, voice_reader
     
-    while voice_control_active and voice_process:
-        output = voice_process.stdout.readline()
-        if output:
-            output_text.insert(tk.END, output)
-            output_text.see(tk.END)
-        
-        err = voice_process.stderr.readline()
-        if err:
-            output_text.insert(tk.END, f"ERROR: {err}")
-            output_text.see(tk.END)
-        
-        if voice_process.poll() is not None:
-            output_text.insert(tk.END, "\nVoice control process ended\n")
-            output_text.see(tk.END)
-            voice_control_active = False
+    script_path = resource_path("VoiceControlForHome.py")
+    if not os.path.exists(script_path):
+        script_path = "C:\\codes\\IOT\\VoiceControlForHome.py"
+        if not os.path.exists(script_path):
+            raise FileNotFoundError("VoiceControlForHome.py not found")
+
+    console.clear()
+    console.append("Starting voice control...\n")
+    
+    # One long-lived engine, paused and resumed over stdin instead of respawned
+    voice_process = subprocess.Popen(
+        [sys.executable, script_path, "--fast-start", "--control-stdin", "--events", voice_events.address],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        stdin=subprocess.PIPE,
+        universal_newlines=True,
+        encoding='utf-8',
+        bufsize=1,
+        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0,
+        env=dict(os.environ, PYTHONUNBUFFERED="1")  # Deliver lines as they are printed
+    )
+    
+    # One reader thread per pipe; lines reach the console once per frame
+    reader = StreamReader(
+        on_data=lambda: ui_queue.post("console", flush_voice_output),
+        on_close=lambda: ui_queue.call(on_voice_output_closed, reader)
+    )
+    reader.add(voice_process.stdout)
+    reader.add(voice_process.stderr, prefix="ERROR: ")
+    voice_reader = reader
+
+def flush_voice_output():
+    if voice_reader:
+        console.append(voice_reader.read_available())
+
+def on_voice_output_closed(reader):
+    global voice_control_active, voice_process
+    
+    console.append(reader.read_available())
+    if reader is voice_reader:
+        console.append("\nVoice control process ended\n")
+        voice_process = None
+        voice_control_active = False
+        voice_btn.config(text="Start Voice Control", style='TButton')
+
+def handle_voice_event(event):
+    # Structured events from the voice engine (see voice_events.py), applied in order
+    global voice_control_active
+    kind = event.get("event")
+    if kind == "utterance":
+        voice_timing.clear()
+        voice_timing.update(heard=event["ts"], recognize_ms=event.get("recognize_ms", 0))
+    elif kind == "intent":
+        voice_timing["intent"] = event.get("name") or "none"
+    elif kind == "device_command":
+        # Show the new state now instead of waiting for the broker round trip
+        device_state.update(event["topic"], event["payload"])
+        controller.apply(event["topic"], event["payload"])
+        if "heard" in voice_timing:
+            voice_timing["command_ms"] = (event["ts"] - voice_timing["heard"]) * 1000
+    elif kind == "tts_finished" and "first_audio_ms" in event:
+        voice_timing["first_audio_ms"] = event["first_audio_ms"]
+    elif kind == "listening" and voice_engine_running():
+        voice_control_active = event.get("active", False)
+        if voice_control_active:
+            voice_btn.config(text="Stop Voice Control", style='Accent.TButton')
+        else:
             voice_btn.config(text="Start Voice Control", style='TButton')
-            break
-        
-        time.sleep(0.1)
+    elif kind == "error":
+        where = f"{event['room']}, " if event.get("room") else ""
+        voice_status.config(text=f"Voice error ({where}{event.get('stage')}): {event.get('message', '')[:60]}")
+        return
+    else:
+        return
+    show_voice_latency()
+
+def show_voice_latency():
+    if "heard" not in voice_timing:
+        return
+    parts = [f"Intent: {voice_timing.get('intent', '...')}",
+             f"recognize {voice_timing['recognize_ms']:.0f} ms"]
+    if "command_ms" in voice_timing:
+        parts.append(f"command +{voice_timing['command_ms']:.0f} ms")
+    if "first_audio_ms" in voice_timing:
+        parts.append(f"first audio {voice_timing['first_audio_ms']:.0f} ms")
+    voice_status.config(text=" | ".join(parts))
 
 def stop_voice_control():
     global voice_process, voice_control_active
     
     if voice_process:
         try:
-            if os.name == 'nt':
-                os.system(f'taskkill /F /PID {voice_process.pid}')
-            else:
-                voice_process.send_signal(signal.SIGINT)
-                try:
-                    voice_process.wait(timeout=3)
-                except subprocess.TimeoutExpired:
-                    voice_process.kill()
+            send_voice_command("quit")
+            try:
+                voice_process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                if os.name == 'nt':
+                    os.system(f'taskkill /F /PID {voice_process.pid}')
+                else:
+                    voice_process.send_signal(signal.SIGINT)
+                    try:
+                        voice_process.wait(timeout=3)
+                    except subprocess.TimeoutExpired:
+                        voice_process.kill()
         except Exception as e:
             print(f"Error stopping process: {e}")
         finally:
@@ -320,6 +537,8 @@ root.geometry("950x850")
 root.minsize(850, 750)
 root.configure(bg=BG_COLOR)
 root.iconbitmap('smart_home_icon.ico')
+watchdog = TkWatchdog(root, threshold_ms=args.watchdog_threshold)  # Finds what freezes the main loop
+ui_queue = UiUpdateQueue(root, watchdog=watchdog)
 
 
 style = ttk.Style()
@@ -333,11 +552,15 @@ style.configure('TButton', background=BG_COLOR, foreground=FG_COLOR, font=BODY_F
 style.configure('Title.TLabel', font=TITLE_FONT)
 style.configure('Header.TLabel', font=HEADER_FONT)
 style.configure('Gauge.TLabel', font=("Segoe UI", 24, "bold"))
+style.configure('StaleGauge.TLabel', font=("Segoe UI", 24, "bold"), foreground="#757575")
 style.configure('TLabelframe', background=BG_COLOR, foreground=FG_COLOR)
 style.configure('TLabelframe.Label', background=BG_COLOR, foreground=FG_COLOR)
 style.configure('TScale', background=BG_COLOR)
 style.configure('Black.TEntry', fieldbackground=ENTRY_BG, foreground=ENTRY_FG, insertcolor=ENTRY_FG)
 style.configure('Accent.TButton', background=ACCENT_COLOR, foreground=BG_COLOR)
+style.configure('Treeview', background=BG_COLOR, fieldbackground=BG_COLOR, foreground=FG_COLOR, font=SMALL_FONT)
+style.configure('Treeview.Heading', font=SMALL_FONT)
+
 
 main_frame = ttk.Frame(root, padding=15)
 main_frame.pack(fill=tk.BOTH, expand=True)
@@ -378,37 +601,118 @@ output_text.pack(fill=tk.BOTH, expand=True)
 scrollbar = ttk.Scrollbar(output_frame, command=output_text.yview)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 output_text.config(yscrollcommand=scrollbar.set)
+console = BoundedConsole(output_text, max_lines=CONSOLE_MAX_LINES)
+
+# Widget callbacks, device handlers and console output are timed by the
+# watchdog under their own names (updates from ui_queue already are).
+toggle_led = watchdog.watch(toggle_led)
+set_fan_speed = watchdog.watch(set_fan_speed)
+on_slider_change = watchdog.watch(on_slider_change)
+on_entry_change = watchdog.watch(on_entry_change)
+for device_type, handler in list(registry.handlers.items()):
+    registry.register_handler(device_type, watchdog.watch(handler))
+console.append = watchdog.watch(console.append, "console.append")
+
+def load_photo(filename, size):
+    try:
+        return ImageTk.PhotoImage(Image.open(resource_path(filename)).resize(size))
+    except Exception as e:
+        print(f"Error loading {filename}: {e}")
+        return None
+
+led_on_photo = load_photo("led_on.png", LED_IMG_SIZE)
+led_off_photo = load_photo("led_off.png", LED_IMG_SIZE)
+fan_on_photo = load_photo("fan_on.png", FAN_IMG_SIZE)
+fan_off_photo = load_photo("fan_off.png", FAN_IMG_SIZE)
+
+def place_card(section, card, columns=DEVICE_COLUMNS):
+    index = len(section.grid_slaves())
+    card.grid(row=index // columns, column=index % columns, sticky="nsew", padx=5, pady=5)
+    section.columnconfigure(index % columns, weight=1)
+
+def build_led_widget(device):
+    led_frame = ttk.LabelFrame(led_section, text=f"{device.name} Control", padding=10)
+    place_card(led_section, led_frame)
+    led_btn_frame = ttk.Frame(led_frame)
+    led_btn_frame.pack()
+
+    led_button = ttk.Button(led_btn_frame, command=lambda: toggle_led(device))
+    set_image(led_button, led_off_photo, device.name)
+    led_button.pack(side=tk.LEFT, padx=10)
+    led_status = ttk.Label(led_btn_frame, text="Status: OFF", font=HEADER_FONT)
+    led_status.pack(side=tk.LEFT, padx=15)
+    device_widgets[device.id] = {"button": led_button, "status": led_status}
 
-# Control Section - LED and Voice Control
-control_section = ttk.Frame(main_frame)
-control_section.pack(fill=tk.X, pady=10)
+def build_fan_widget(device):
+    fan_frame = ttk.LabelFrame(fan_section, text=f"{device.name} Control", padding=10)
+    place_card(fan_section, fan_frame, columns=1)
+    fan_control_frame = ttk.Frame(fan_frame)
+    fan_control_frame.pack(fill=tk.X)
 
-# LED Control
-led_frame = ttk.LabelFrame(control_section, text="LED Control", padding=10)
-led_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+    fan_button = ttk.Label(fan_control_frame)
+    set_image(fan_button, fan_off_photo, device.name)
+    fan_button.pack(side=tk.LEFT, padx=10)
 
-led_btn_frame = ttk.Frame(led_frame)
-led_btn_frame.pack()
+    fan_slider = ttk.Scale(
+        fan_control_frame, 
+        from_=0, 
+        to=device.options.get("max", 255), 
+        command=lambda value: on_slider_change(device, value),
+        orient=tk.HORIZONTAL,
+        length=200
+    )
+    fan_slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+
+    fan_entry_frame = ttk.Frame(fan_control_frame)
+    fan_entry_frame.pack(side=tk.LEFT, padx=10)
+    fan_entry = ttk.Entry(fan_entry_frame, width=5, font=BODY_FONT, style='Black.TEntry')
+    fan_entry.pack(side=tk.LEFT)
+    fan_entry.insert(0, "0")
+    fan_entry.bind("<KeyRelease>", lambda event: on_entry_change(device, event))
+    set_button = ttk.Button(fan_entry_frame, text="Set", command=lambda: set_fan_speed(device))
+    set_button.pack(side=tk.LEFT, padx=5)
+    device_widgets[device.id] = {
+        "icon": fan_button,
+        "slider": fan_slider,
+        "entry": fan_entry,
+        "moving": False,
+    }
 
-try:
-    led_on_img = Image.open(resource_path("led_on.png")).resize(LED_IMG_SIZE)
-    led_off_img = Image.open(resource_path("led_off.png")).resize(LED_IMG_SIZE)
-    led_on_photo = ImageTk.PhotoImage(led_on_img)
-    led_off_photo = ImageTk.PhotoImage(led_off_img)
-    led_button = ttk.Button(led_btn_frame, image=led_off_photo, command=toggle_led)
-    led_button.pack(side=tk.LEFT, padx=10)
-    led_status = ttk.Label(led_btn_frame, text="Status: OFF", font=HEADER_FONT)
-    led_status.pack(side=tk.LEFT, padx=15)
-except Exception as e:
-    print(f"Error loading LED images: {e}")
-    led_button = ttk.Button(led_btn_frame, text="LED", command=toggle_led)
-    led_button.pack(side=tk.LEFT, padx=10)
-    led_status = ttk.Label(led_btn_frame, text="Status: OFF", font=HEADER_FONT)
-    led_status.pack(side=tk.LEFT, padx=15)
+def build_sensor_widget(device):
+    sensor_frame = ttk.LabelFrame(env_frame, text=device.name, padding=10)
+    place_card(env_frame, sensor_frame)
+    ttk.Label(sensor_frame, text="Current:", font=BODY_FONT).pack()
+    unit = device.options.get("unit", SENSOR_UNITS.get(device.type, ""))
+    gauge = ttk.Label(sensor_frame, text=f"--{unit}", style='Gauge.TLabel')
+    gauge.pack()
+    device_widgets[device.id] = {"gauge": gauge}
+    chart_devices[device.name] = device
+    chart_picker.config(values=list(chart_devices))
+    if not chart_device.get():
+        chart_device.set(device.name)
+
+DEVICE_BUILDERS = {
+    "led": build_led_widget,
+    "fan": build_fan_widget,
+    "temperature": build_sensor_widget,
+    "humidity": build_sensor_widget,
+}
+
+def build_device_widget(device):
+    builder = DEVICE_BUILDERS.get(device.type)
+    if builder and device.id not in device_widgets:
+        builder(device)
+
+# Control Section - LEDs and Voice Control
+control_section = ttk.Frame(main_frame)
+control_section.pack(fill=tk.X, pady=10)
+
+led_section = ttk.Frame(control_section)
+led_section.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
 # Voice Control
 voice_frame = ttk.LabelFrame(control_section, text="Voice Control", padding=10)
-voice_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+voice_frame.pack(side=tk.LEFT, fill=tk.BOTH, padx=5)
 voice_btn = ttk.Button(
     voice_frame, 
     text="Start Voice Control", 
@@ -416,73 +720,165 @@ voice_btn = ttk.Button(
     width=20
 )
 voice_btn.pack(expand=True, pady=10, padx=10)
+voice_status = ttk.Label(voice_frame, text="", font=SMALL_FONT, wraplength=220)
+voice_status.pack(pady=(0, 5))
 
-# Fan Control Section
-fan_frame = ttk.LabelFrame(main_frame, text="Fan Control", padding=10)
-fan_frame.pack(fill=tk.X, pady=10)
-
-fan_control_frame = ttk.Frame(fan_frame)
-fan_control_frame.pack(fill=tk.X)
-
-try:
-    fan_on_img = Image.open(resource_path("fan_on.png")).resize(FAN_IMG_SIZE)
-    fan_off_img = Image.open(resource_path("fan_off.png")).resize(FAN_IMG_SIZE)
-    fan_on_photo = ImageTk.PhotoImage(fan_on_img)
-    fan_off_photo = ImageTk.PhotoImage(fan_off_img)
-    fan_button = ttk.Label(fan_control_frame, image=fan_off_photo)
-    fan_button.pack(side=tk.LEFT, padx=10)
-except Exception as e:
-    print(f"Error loading fan images: {e}")
-    fan_button = ttk.Label(fan_control_frame, text="FAN")
-    fan_button.pack(side=tk.LEFT, padx=10)
-
-fan_slider = ttk.Scale(
-    fan_control_frame, 
-    from_=0, 
-    to=255, 
-    command=on_slider_change,
-    orient=tk.HORIZONTAL,
-    length=200
-)
-fan_slider.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+# Scenes from devices.json, one button each
+if registry.scenes:
+    scenes_frame = ttk.LabelFrame(control_section, text="Scenes", padding=10)
+    scenes_frame.pack(side=tk.LEFT, fill=tk.BOTH, padx=5)
+    for scene_id, scene in registry.scenes.items():
+        ttk.Button(scenes_frame, text=scene.get("name", scene_id), width=16,
+                   command=lambda scene_id=scene_id: apply_scene(scene_id)).pack(pady=2)
 
-fan_entry_frame = ttk.Frame(fan_control_frame)
-fan_entry_frame.pack(side=tk.LEFT, padx=10)
-fan_entry = ttk.Entry(fan_entry_frame, width=5, font=BODY_FONT, style='Black.TEntry')
-fan_entry.pack(side=tk.LEFT)
-fan_entry.insert(0, "0")
-fan_entry.bind("<KeyRelease>", on_entry_change)
-set_button = ttk.Button(fan_entry_frame, text="Set", command=lambda: set_fan_speed())
-set_button.pack(side=tk.LEFT, padx=5)
+# Fan Control Section
+fan_section = ttk.Frame(main_frame)
+fan_section.pack(fill=tk.X, pady=10)
 
 # Environment Section
 env_frame = ttk.Frame(main_frame)
 env_frame.pack(fill=tk.X, pady=15)
 
-temp_frame = ttk.LabelFrame(env_frame, text="Temperature", padding=10)
-temp_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-ttk.Label(temp_frame, text="Current:", font=BODY_FONT).pack()
-temp_gauge = ttk.Label(temp_frame, text="--°C", style='Gauge.TLabel')
-temp_gauge.pack()
-
-humidity_frame = ttk.LabelFrame(env_frame, text="Humidity", padding=10)
-humidity_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-ttk.Label(humidity_frame, text="Current:", font=BODY_FONT).pack()
-humidity_gauge = ttk.Label(humidity_frame, text="--%", style='Gauge.TLabel')
-humidity_gauge.pack()
+# Sensor History Chart
+chart_frame = ttk.LabelFrame(main_frame, text="Sensor History", padding=10)
+chart_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+chart_controls = ttk.Frame(chart_frame)
+chart_controls.pack(fill=tk.X)
+chart_device = tk.StringVar()
+chart_picker = ttk.Combobox(chart_controls, textvariable=chart_device, state="readonly", width=25)
+chart_picker.pack(side=tk.LEFT)
+chart_picker.bind("<<ComboboxSelected>>", lambda event: redraw_chart())
+chart_span = tk.IntVar(value=CHART_WINDOWS[0][1])
+for label, seconds in CHART_WINDOWS:
+    ttk.Radiobutton(chart_controls, text=label, variable=chart_span, value=seconds,
+                    command=redraw_chart).pack(side=tk.LEFT, padx=5)
+chart_range_label = ttk.Label(chart_controls, text="No data", font=SMALL_FONT)
+chart_range_label.pack(side=tk.RIGHT)
+# 0 = live (newest data at the right edge), 1 = oldest stored data
+chart_scroll = ttk.Scale(chart_frame, from_=1, to=0, orient=tk.HORIZONTAL,
+                         command=lambda value: ui_queue.post("chart", redraw_chart))
+chart_scroll.set(0)
+chart_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+chart_canvas = tk.Canvas(chart_frame, height=CHART_HEIGHT, bg=BG_COLOR, highlightthickness=0)
+chart_canvas.pack(fill=tk.BOTH, expand=True, pady=5)
+chart_line = chart_canvas.create_line(0, 0, 0, 0, fill=ACCENT_COLOR, width=2)
+chart_high_text = chart_canvas.create_text(4, 2, anchor=tk.NW, fill=FG_COLOR, font=SMALL_FONT)
+chart_low_text = chart_canvas.create_text(4, CHART_HEIGHT - 2, anchor=tk.SW, fill=FG_COLOR, font=SMALL_FONT)
+chart_canvas.bind("<Configure>", lambda event: ui_queue.post("chart", redraw_chart))
+
+# Widgets for statically configured devices; wildcard matches are built
+# as their first message arrives.
+for device in list(registry.devices.values()):
+    build_device_widget(device)
+registry.on_new_device = build_device_widget
 
 # Status Bar
-status_bar = ttk.Label(root, text="Connecting to MQTT broker...", relief=tk.SUNKEN, 
+status_frame = ttk.Frame(root)
+status_frame.pack(side=tk.BOTTOM, fill=tk.X, before=main_frame)
+status_bar = ttk.Label(status_frame, text="Connecting to MQTT broker...", relief=tk.SUNKEN, 
                       anchor=tk.W, padding=5, font=SMALL_FONT)
-status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+watchdog_btn = ttk.Button(status_frame, text="Watchdog", command=lambda: show_watchdog())
+watchdog_btn.pack(side=tk.RIGHT)
+diagnostics_btn = ttk.Button(status_frame, text="Diagnostics", command=lambda: toggle_diagnostics())
+diagnostics_btn.pack(side=tk.RIGHT)
+diagnostics_summary = ttk.Label(status_frame, text="", relief=tk.SUNKEN, padding=5, font=SMALL_FONT)
+diagnostics_summary.pack(side=tk.RIGHT)
+
+# Diagnostics Panel (hidden until the Diagnostics button is pressed)
+diagnostics_frame = ttk.LabelFrame(root, text="MQTT Diagnostics", padding=5)
+diagnostics_tree = ttk.Treeview(diagnostics_frame, columns=[key for key, _ in DIAGNOSTICS_COLUMNS], height=8)
+diagnostics_tree.heading("#0", text="Topic")
+diagnostics_tree.column("#0", width=180)
+for key, title in DIAGNOSTICS_COLUMNS:
+    diagnostics_tree.heading(key, text=title)
+    diagnostics_tree.column(key, width=70, anchor=tk.E)
+diagnostics_tree.pack(fill=tk.BOTH, expand=True)
+
+def toggle_diagnostics():
+    if diagnostics_frame.winfo_ismapped():
+        diagnostics_frame.pack_forget()
+    else:
+        diagnostics_frame.pack(side=tk.BOTTOM, fill=tk.X, before=main_frame)
+        refresh_diagnostics_table()
+
+def refresh_diagnostics_table():
+    snapshot = mqtt_metrics.snapshot()
+    for topic, t in sorted(snapshot["topics"].items()):
+        values = (
+            f"{t['publish_rate']:.1f}", f"{t['receive_rate']:.1f}", t["acked"], t["in_flight"],
+            f"{t['ack_latency']['p50_ms']:.1f}", f"{t['ack_latency']['p95_ms']:.1f}",
+            t["retries"], t["dropped"], f"{t['handler_time']['p95_ms']:.2f}",
+        )
+        if diagnostics_tree.exists(topic):
+            diagnostics_tree.item(topic, values=values)
+        else:
+            diagnostics_tree.insert("", tk.END, iid=topic, text=topic, values=values)
+
+def refresh_diagnostics():
+    diagnostics_summary.config(text=mqtt_metrics.summary())
+    if diagnostics_frame.winfo_ismapped():
+        refresh_diagnostics_table()
+    root.after(DIAGNOSTICS_REFRESH_MS, refresh_diagnostics)
+
+# Watchdog Window: loop lag, slowest callbacks and the stacks of recent stalls
+watchdog_window = None
+
+def show_watchdog():
+    global watchdog_window
+    if watchdog_window is not None and watchdog_window.winfo_exists():
+        watchdog_window.lift()
+        return
+    watchdog_window = tk.Toplevel(root)
+    watchdog_window.title("Main Loop Watchdog")
+    watchdog_window.configure(bg=BG_COLOR)
+    buttons = ttk.Frame(watchdog_window, padding=5)
+    buttons.pack(side=tk.BOTTOM, fill=tk.X)
+    saved_label = ttk.Label(buttons, text="", font=SMALL_FONT)
+    saved_label.pack(side=tk.LEFT)
+    ttk.Button(buttons, text="Dump Profile", command=lambda: saved_label.config(
+        text=f"Saved {watchdog.dump(args.watchdog_file)}")).pack(side=tk.RIGHT)
+    report_text = tk.Text(watchdog_window, width=90, height=30, bg=BG_COLOR, fg=FG_COLOR,
+                          font=MONO_FONT, wrap=tk.NONE)
+    report_text.pack(fill=tk.BOTH, expand=True)
+    refresh_watchdog(watchdog_window, report_text)
+
+def refresh_watchdog(window, report_text):
+    if not window.winfo_exists():
+        return
+    report_text.delete("1.0", tk.END)
+    report_text.insert(tk.END, watchdog.report())
+    root.after(WATCHDOG_REFRESH_MS, refresh_watchdog, window, report_text)
 
 # ========== START APPLICATION ==========
-mqtt_thread = threading.Thread(target=connect_to_mqtt, daemon=True)
-mqtt_thread.start()
+ui_queue.start()
+watchdog.start()
+root.after(STALE_CHECK_MS, refresh_staleness)
+lag_probe = LoopLagProbe(root)
+if args.replay:
+    root.after(REPLAY_DELAY_MS, start_replay)
+voice_events = EventServer(lambda event: ui_queue.call(handle_voice_event, event))
+connect_to_mqtt()
+root.after(CONNECTION_CHECK_MS, watch_connection)
+root.after(DIAGNOSTICS_REFRESH_MS, refresh_diagnostics)
+if args.metrics_file:
+    mqtt_metrics.start_export(args.metrics_file, args.metrics_interval)
 
 def on_closing():
     stop_voice_control()
-    client.disconnect()
+    voice_events.close()
+    watchdog.stop()
+    print(f"Watchdog profile written to {watchdog.dump(args.watchdog_file)}")
+    hub.stop()  # Sends pending fan updates, flushes sensor history, disconnects
+    if message_log:
+        message_log.close()  # After hub.stop(): no more messages arrive to record
+    stats = publisher.stats()
+    print(f"Fan updates sent: {stats['sent']}, suppressed: {stats['suppressed']}")
+    print(f"Widget updates applied: {view.applied_count}, skipped as unchanged: {view.skipped_count}")
+    print(session.report())
+    mqtt_metrics.stop_export(args.metrics_file)
+    if local_broker:
+        local_broker.stop()
     root.destroy()
 
 root.protocol("WM_DELETE_WINDOW", on_closing)
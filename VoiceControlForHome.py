@@ -1,26 +1,25 @@
-from gtts import gTTS
-import speech_recognition as sr
+from startup_profile import profiler  # First import: starts the startup clock
 import time
 import os
-import paho.mqtt.client as mqtt
-from pydub import AudioSegment
-from pydub.playback import play
-import arabic_reshaper
-from bidi.algorithm import get_display
-import pygetwindow as gw
-import pyautogui
-import cv2
-import numpy as np
-from PIL import Image
-from datetime import datetime
-import subprocess  # To run Mosquitto commands
 import sys
 import io
+import argparse
+import threading
+from tts_cache import TtsCache
+from tts_stream import StreamingSpeaker
+from arabic_intents import IntentEngine
+from voice_capture import ContinuousCapture
+from voice_pipeline import VoicePipeline
+from recognizers import GoogleRecognizer, NotUnderstood, create_recognizer
+from voice_events import EventEmitter
+from device_registry import load_registry
+from device_state import DeviceStateCache
+from sensor_codec import advertise, decode_batch, format_value, is_batch, message_content_type
 # Fix encoding issues
 if sys.stdout.encoding != 'UTF-8':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
 if sys.stderr.encoding != 'UTF-8':
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', line_buffering=True)
 
 # For Windows specifically
 if os.name == 'nt':
@@ -28,146 +27,377 @@ if os.name == 'nt':
 
 
 
-# Global MQTT client (broker)
-client = mqtt.Client()
-MQTT_BROKER = "broker.emqx.io"  # Global MQTT Broker
-MQTT_PORT = 1883  # Default port for EMQX broker
-LED_TOPIC = "home/led"
-FAN_TOPIC = "home/fan"
-TEMP_TOPIC = "home/temp"
+# Global MQTT session (broker) and its per-topic metrics, created by start_mqtt()
+session = None
+mqtt_metrics = None
+# Broker and topics come from devices.json, shared with the dashboard
+registry = load_registry()
+device_state = DeviceStateCache(registry)  # Last-known device values, filled by on_message
+MQTT_BROKER = registry.broker.get("host", "broker.emqx.io")
+MQTT_PORT = registry.broker.get("port", 1883)
+LED_TOPIC = registry.devices["led"].topic
+FAN_TOPIC = registry.devices["fan"].topic
 
-def on_connect(client, userdata, flags, rc):
-    """Callback when the client connects to the broker."""
-    print(f"Connected with result code {rc}")
-    # You can subscribe to topics here if needed
-    # client.subscribe("home/#")  # Example subscription
+def scene_intents():
+    """An intent named scene:<id> for every scene in devices.json that has phrases."""
+    return [{"name": f"scene:{scene_id}", "phrases": scene["phrases"]}
+            for scene_id, scene in registry.scenes.items() if scene.get("phrases")]
+
+def room_device(device_type, room=None):
+    """Device of a type in a room (from a /rooms/+/... pattern), else the whole-home device."""
+    device = registry.room_device(device_type, room) if room else None
+    return device or registry.devices[device_type]
+
+def device_topic(device_type, room=None):
+    """Topic of a device type in a room, else the whole-home device's."""
+    return room_device(device_type, room).topic
+
+# Heavy modules are imported on first use (see startup_profile for timings)
+sr = None  # speech_recognition
+_bidi = None  # (arabic_reshaper.reshape, bidi get_display)
+_bidi_lock = threading.Lock()  # Console output comes from several threads
+
+def load_speech_recognition():
+    """Import speech_recognition on first use."""
+    global sr
+    if sr is None:
+        sr = profiler.import_module("speech_recognition")
+    return sr
+
+def shape_arabic(text):
+    """Reshape and reorder Arabic text for console display, importing the shapers on first use."""
+    global _bidi
+    if _bidi is None:
+        with _bidi_lock:
+            if _bidi is None:
+                reshaper = profiler.import_module("arabic_reshaper")
+                bidi = profiler.import_module("bidi.algorithm")
+                _bidi = (reshaper.reshape, bidi.get_display)
+    reshape, get_display = _bidi
+    return get_display(reshape(text))
+
+def on_connect(client, userdata, flags, reason_code, properties=None):
+    """Callback when the client (re)connects to the broker."""
+    print(f"Connected with result code {reason_code}")
+    if reason_code == 0:
+        client.subscribe(registry.subscriptions())  # Retained values fill the state cache right away
+        advertise(session, "voice")  # Batched sensor frames are understood too
 
 def on_message(client, userdata, msg):
-    """Callback when a message is received."""
-    print(f"Message received: {msg.topic} -> {msg.payload.decode()}")
+    """Callback when a message is received: keep the latest value for voice queries."""
+    started = time.perf_counter()
+    if is_batch(msg.payload, message_content_type(msg)):
+        try:
+            timestamp, value = decode_batch(msg.payload)[-1]  # Only the newest reading matters here
+        except ValueError as e:
+            print(f"Bad sensor batch on {msg.topic}: {e}")
+            return
+        device_state.update(msg.topic, format_value(value), timestamp)
+    else:
+        device_state.update(msg.topic, msg.payload.decode(errors="replace"))
 
-# Set MQTT callbacks
-client.on_connect = on_connect
-client.on_message = on_message
+    mqtt_metrics.handled(msg.topic, time.perf_counter() - started)
 
-# Connect to the global broker
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-client.loop_start()  # Start the MQTT client loop
+def serve_control_channel(processor, stream=None):
+    """Apply pause/resume/quit commands read one per line (from the GUI over stdin)."""
+    stream = stream or sys.stdin
+    commands = {"pause": processor.pause, "resume": processor.resume}
+    for line in stream:
+        command = line.strip().lower()
+        if command == "quit":
+            break
+        action = commands.get(command)
+        if action:
+            try:
+                action()
+            except Exception as e:
+                print(f"Control command '{command}' failed: {e}")
+        elif command:
+            print(f"Unknown control command: {command}")
+    processor.running = False  # "quit" or the GUI went away
+
+def start_mqtt(broker=MQTT_BROKER, port=MQTT_PORT):
+    """Start the MQTT session; it connects (and reconnects) in the background without blocking startup."""
+    global session, mqtt_metrics
+    mqtt_metrics = profiler.import_module("mqtt_metrics").MqttMetrics()
+    session = profiler.import_module("mqtt_session").MqttSession(broker, port, metrics=mqtt_metrics)
+    session.on_connect = on_connect
+    session.on_message = on_message
+    session.start()  # Commands spoken while offline wait in the outbox
+    return session
 
 class ArabicSpeechProcessor:
-    def __init__(self):
-        """Initialize the speech processor."""
-        self.recognizer = sr.Recognizer()
+    # Fixed spoken responses, synthesized ahead of time at startup
+    GREETING_RESPONSE = "مرحبًا! كيف يمكنني مساعدتك؟"  # "Hello! How can I help you?"
+    LED_ON_RESPONSE = "تم تشغيل الأضواء."
+    LED_OFF_RESPONSE = "تم إيقاف الأضواء."
+    FAN_ON_RESPONSE = "تم تشغيل المروحة."
+    FAN_OFF_RESPONSE = "تم إيقاف المروحة."
+    SCENE_RESPONSE = "تم تطبيق المشهد."  # "Scene applied."
+    FIXED_RESPONSES = [GREETING_RESPONSE, LED_ON_RESPONSE, LED_OFF_RESPONSE, FAN_ON_RESPONSE, FAN_OFF_RESPONSE,
+                       SCENE_RESPONSE]
+
+    def __init__(self, tts_backend=None, recognizer_backend=None, recognition_workers=2, use_vad=True,
+                 audio_source=None, calibration_seconds=1.0, prewarm=True, defer_vad=False, events=None,
+                 rooms=None):
+        """Initialize the speech processor; rooms (a RoomVoicePool) replaces the local microphone."""
+        self.events = events or EventEmitter()  # Structured events for the dashboard (no-op standalone)
+        self.recognizer = load_speech_recognition().Recognizer()
         self.running = True  # Flag to control the main loop
         self.voiceover_enabled = True  # Voiceover enabled by default
-        self.greetings = ["مرحبا", "السلام عليكم", "اهلا", "صباح الخير", "مساء الخير"]  # List of greetings
-        self.window_name = "Smart Home Dashboard"  # The window name to focus on
-        self.captured_image = None
+        self.intents = IntentEngine.load(extra=scene_intents())  # intents.json, then scenes from devices.json
+        self.tts_cache = TtsCache(tts_backend)
+        self.speaker = StreamingSpeaker(self.tts_cache)  # Loads pydub on first playback
+        self.capture = ContinuousCapture(self.recognizer, source=audio_source, calibration_seconds=calibration_seconds)
+        self.recognizer_backend = recognizer_backend or GoogleRecognizer(self.recognizer, language='ar-AR')
+        self.rooms = rooms  # Multi-room mode: each room captures and recognizes in its own process
+        if rooms is not None:
+            rooms.on_result = self._on_room_result
+        self.vad = None  # Drops silence/noise before it reaches the recognizer
+        if use_vad and not defer_vad:
+            self.vad = profiler.import_module("vad").EnergyVAD()  # Pulls in NumPy
+        self.pipeline = VoicePipeline(
+            self.capture.phrases,
+            self._recognize,
+            self.intents.match,
+            self._act,
+            self._speak,
+            workers=recognition_workers,
+            on_error=self._on_pipeline_error,
+            preprocess=self.vad.process if self.vad else None,
+        )
+        if use_vad and defer_vad:
+            # Load NumPy off the startup path; segments pass unfiltered until it's ready
+            threading.Thread(target=self._load_vad, name="VadLoader", daemon=True).start()
+        if self.voiceover_enabled and prewarm:
+            self.prewarm_responses()
+
+    def _load_vad(self):
+        """Import the VAD in the background and plug it into the pipeline."""
+        self.vad = profiler.import_module("vad").EnergyVAD()
+        self.pipeline.preprocess = self.vad.process
+
+    def prewarm_responses(self):
+        """Synthesize the fixed replies in the background."""
+        self.tts_cache.prewarm(self.FIXED_RESPONSES)
+
+    def start_listening(self):
+        """Start the pipeline, calibrate the microphone once and capture in the background."""
+        self.pipeline.start()
+        if self.rooms is not None:
+            self.rooms.start()  # The pipeline only speaks; rooms send recognized text
+        else:
+            self.capture.start()
+        self.events.emit("listening", active=True)
+        self._print_arabic("جاري الاستماع... قل شيئًا!")  # "Listening... Say something!"
 
-    def listen_and_process(self):
-        """Listen for speech, recognize it, and execute commands."""
+    def stop_listening(self):
+        """Stop the background capture and the pipeline."""
+        if self.rooms is not None:
+            self.rooms.stop()
+        else:
+            self.capture.stop()
+        self.pipeline.stop()
+        self.events.emit("listening", active=False)
+
+    def pause(self):
+        """Release the microphone but keep the broker, recognizer and TTS state warm."""
+        if self.rooms is not None and not self.rooms.paused:
+            self.rooms.pause()  # Workers keep their inputs and calibration; phrases are discarded
+            self.events.emit("listening", active=False)
+            self._print_arabic("تم إيقاف الاستماع مؤقتًا.")  # "Listening paused."
+        elif self.rooms is None and self.capture.running:
+            self.capture.stop()
+            self.events.emit("listening", active=False)
+            self._print_arabic("تم إيقاف الاستماع مؤقتًا.")  # "Listening paused."
+
+    def resume(self):
+        """Start capturing again with the calibration from the first start."""
+        if self.rooms is not None and self.rooms.paused:
+            self.rooms.resume()
+            self.events.emit("listening", active=True)
+            self._print_arabic("جاري الاستماع... قل شيئًا!")  # "Listening... Say something!"
+        elif self.rooms is None and not self.capture.running:
+            self.capture.start()
+            self.events.emit("listening", active=True)
+            self._print_arabic("جاري الاستماع... قل شيئًا!")  # "Listening... Say something!"
+
+    def run(self):
+        """Listen and process commands until a stop command or Ctrl+C."""
+        self.start_listening()
         try:
-            with sr.Microphone() as source:
-                self._print_arabic("جاري الاستماع... قل شيئًا!")  # "Listening... Say something!"
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)  # Adjust for ambient noise
-                audio = self.recognizer.listen(source)  # Capture the audio
-                self._print_arabic("تم تسجيل الصوت.")  # "Audio captured."
-
-            # Recognize the speech using Google's API
-            self._print_arabic("جاري التعرف على الكلام...")  # "Recognizing speech..."
-            recognized_text = self.recognizer.recognize_google(audio, language='ar-AR')
-            self._print_arabic(f"تم التعرف على النص: {recognized_text}")  # "Recognized text:"
-
-            # Check if the recognized text contains a greeting
-            if self._is_greeting(recognized_text):
-                self._respond_to_greeting()
-            else:
-                # Execute commands based on recognized text
-                self._execute_command(recognized_text)
-
-            # Small delay before listening again
-            self._print_arabic("جاهز للاستماع إلى المدخل التالي...\n")  # "Ready for the next input..."
-            time.sleep(1)  # Add a delay to prevent rapid repeated calls
-
-        except sr.UnknownValueError:
-            self._print_arabic("خطأ: لا يمكن فهم الصوت.")  # "Error: Could not understand the audio."
-            time.sleep(1)  # Small delay before retrying
-        except sr.RequestError as e:
-            self._print_arabic(f"خطأ في طلب النتائج من جوجل: {e}")  # "Error with the request to the API."
+            while self.running and (self.rooms is None or self.rooms.running):  # File inputs end
+                time.sleep(0.2)
         except KeyboardInterrupt:
             self._print_arabic("\nتم إنهاء البرنامج...")  # "Exiting the program..."
             self.running = False
-        except Exception as e:
-            self._print_arabic(f"حدث خطأ غير متوقع: {e}")  # "Unexpected error occurred."
-            self.running = False
+        finally:
+            self.stop_listening()
+            print(self.pipeline.report())
+            if self.rooms is not None:
+                print(self.rooms.report())
+            if self.vad:
+                stats = self.vad.stats()
+                print(f"VAD: forwarded {stats['forwarded']} segments, dropped {stats['dropped']} "
+                      f"(recognizer calls saved)")
+
+    def _recognize(self, audio):
+        """Pipeline recognize stage: audio to text with the configured backend."""
+        self._print_arabic("جاري التعرف على الكلام...")  # "Recognizing speech..."
+        started = time.perf_counter()
+        text = self.recognizer_backend.recognize(audio)
+        self.events.emit("utterance", text=text, recognize_ms=(time.perf_counter() - started) * 1000)
+        return text
+
+    def _act(self, text, match, room=None):
+        """Pipeline act stage: greet or execute the matched command."""
+        self._print_arabic(f"تم التعرف على النص: {text}")  # "Recognized text:"
+        self.events.emit("intent", text=text, name=match.name if match else None,
+                         params=match.params if match else {}, room=room)
+        if match is not None and match.name == "greeting":
+            self._respond_to_greeting()
+        else:
+            self._execute_command(text, match, room)
+        self._print_arabic("جاهز للاستماع إلى المدخل التالي...\n")  # "Ready for the next input..."
 
-    def _is_greeting(self, text):
-        """Check if the recognized text contains a greeting."""
-        for greeting in self.greetings:
-            if greeting in text:
-                return True
-        return False
+    def _on_room_result(self, result):
+        """RoomVoicePool callback, on its collector thread: act on one room's recognized text."""
+        room = result["room"]
+        if result["event"] == "result":
+            print(f"[{room}] recognized in {result['recognize_ms']:.0f} ms")
+            self.events.emit("utterance", text=result["text"], recognize_ms=result["recognize_ms"], room=room)
+            self._act(result["text"], self.intents.match(result["text"]), room)
+        elif result["event"] == "error":
+            error = NotUnderstood() if result.get("not_understood") else RuntimeError(result["message"])
+            print(f"[{room}] {result['stage']} failed")
+            self._on_pipeline_error(result["stage"], error, room)
+        elif result["event"] == "ended":
+            print(f"[{room}] audio input ended: {result['phrases']} phrase(s), {result['filtered']} filtered")
+
+    def _on_pipeline_error(self, stage, error, room=None):
+        """Report a failure from any pipeline stage."""
+        self.events.emit("error", stage=stage, message=str(error), room=room)
+        if isinstance(error, NotUnderstood):
+            self._print_arabic("خطأ: لا يمكن فهم الصوت.")  # "Error: Could not understand the audio."
+        elif isinstance(error, sr.RequestError):
+            self._print_arabic(f"خطأ في طلب النتائج من جوجل: {error}")  # "Error with the request to the API."
+        else:
+            self._print_arabic(f"حدث خطأ غير متوقع: {error}")  # "Unexpected error occurred."
 
     def _respond_to_greeting(self):
         """Respond to a greeting with a friendly message."""
-        response = "مرحبًا! كيف يمكنني مساعدتك؟"  # "Hello! How can I help you?"
+        self._respond(self.GREETING_RESPONSE)
+
+    def _respond(self, response):
+        """Print a response and speak it if voiceover is enabled."""
         self._print_arabic(response)
         if self.voiceover_enabled:
-            audio_file = self._text_to_speech(response)
-            if audio_file:
-                self._play_audio(audio_file)
-
-    def _execute_command(self, text):
-        """Execute commands based on recognized text."""
-        stop_commands = ["توقف", "خروج", "إغلاق", "إنهاء"]
-        if any(command in text for command in stop_commands):  # Check if any stop command is in the text
+            self._say(response)
+
+    def _say(self, text):
+        """Hand text to the speak stage, or speak it right away if the pipeline isn't running."""
+        if self.pipeline.running:
+            self.pipeline.say(text)
+        else:
+            self._speak(text)
+
+    def _execute_command(self, text, match=None, room=None):
+        """Execute commands based on recognized text, on the room's devices if it has its own."""
+        if match is None:
+            match = self.intents.match(text)  # Normalized, single-pass match over intents.json
+        intent = match.name if match else None
+        if intent == "stop":
             self._print_arabic("تم استلام أمر التوقف.")  # "Stop command received."
             self.running = False
-        elif "تشغيل الاضواء" in text:  # LED ON command
-            self.control_led_on()
-        elif "فصل الاضواء" in text:    # LED OFF command
-            self.control_led_off()
-        elif "تشغيل المروحه" in text:  # Fan ON command
-            self.control_fan_on()
-        elif "إيقاف المروحة" in text:  # Fan OFF command
-            self.control_fan_off()
-        elif "درجة الحراره" in text:  # Temperature reading command
-            self.get_temperature()
+        elif intent == "led_on":  # LED ON command
+            self.control_led_on(room)
+        elif intent == "led_off":  # LED OFF command
+            self.control_led_off(room)
+        elif intent == "fan_on":  # Fan ON command
+            self.control_fan_on(room)
+        elif intent == "fan_off":  # Fan OFF command
+            self.control_fan_off(room)
+        elif intent == "fan_set":  # Fan speed command, e.g. "اضبط المروحة على 120"
+            self.control_fan_set(match.params["number"], room)
+        elif intent == "temperature":  # Temperature reading command
+            self.get_temperature(room)
+        elif intent and intent.startswith("scene:"):  # Scene from devices.json, e.g. "أطفئ كل شيء"
+            self.control_scene(intent[len("scene:"):])
+        elif intent == "greeting":
+            self._respond_to_greeting()
 
         else:
             # Save recognized text to a file and convert to speech if voiceover is enabled
             self._save_text_to_file(text)
             if self.voiceover_enabled:
-                audio_file = self._text_to_speech(text)
-                if audio_file:
-                    self._play_audio(audio_file)
+                self._say(text)
+
+    def _publish(self, device, topic, payload, room=None):
+        """Publish a device command and report it on the event channel."""
+        session.publish(topic, payload, qos=1)  # Not retained, like the dashboard's commands
+        self.events.emit("device_command", device=device, topic=topic, payload=payload, room=room)
 
-    def control_led_on(self):
+    def control_led_on(self, room=None):
         """Control LEDs (on)."""
-        self._print_arabic("تم تشغيل الأضواء.")
-        client.publish(LED_TOPIC, "ON")
+        self._publish("led", device_topic("led", room), "ON", room)
+        self._respond(self.LED_ON_RESPONSE)
 
-    def control_led_off(self):
+    def control_led_off(self, room=None):
         """Control LEDs (off)."""
-        self._print_arabic("تم إيقاف الأضواء.")
-        client.publish(LED_TOPIC, "OFF")
-
-    def control_fan_on(self):
-        """Control Fan (on)."""
-        self._print_arabic("تم تشغيل المروحة.")
-        client.publish(FAN_TOPIC, "1024")
-
-    def control_fan_off(self):
-        """Control Fan (off)."""
-        self._print_arabic("تم إيقاف المروحة.")
-        client.publish(FAN_TOPIC, "OFF")
-
-    def get_temperature(self):
-        """Fetch temperature."""
-        # For now, let's simulate a static temperature reading (you can integrate real sensor here).
-        temperature = 22.5  # Example temperature
-        self._print_arabic(f"درجة الحرارة الحالية هي {temperature} درجة مئوية.")  # "Current temperature is..."
-        client.publish(TEMP_TOPIC, str(temperature))
+        self._publish("led", device_topic("led", room), "OFF", room)
+        self._respond(self.LED_OFF_RESPONSE)
+
+    def control_fan_on(self, room=None):
+        """Control Fan (on): full speed, the fan's configured max."""
+        fan = room_device("fan", room)
+        self._publish("fan", fan.topic, str(fan.options.get("max", 255)), room)
+        self._respond(self.FAN_ON_RESPONSE)
+
+    def control_fan_off(self, room=None):
+        """Control Fan (off): speed 0, the bottom of the fan's 0..max range."""
+        self._publish("fan", device_topic("fan", room), "0", room)
+        self._respond(self.FAN_OFF_RESPONSE)
+
+    def control_fan_set(self, speed, room=None):
+        """Control Fan (set speed); a speed outside the fan's 0..max range is refused."""
+        max_speed = room_device("fan", room).options.get("max", 255)
+        if not 0 <= speed <= max_speed:
+            self._respond(f"سرعة المروحة يجب أن تكون بين 0 و {max_speed}.")  # "Fan speed must be between 0 and ..."
+            return
+        self._publish("fan", device_topic("fan", room), str(speed), room)
+        self._respond(f"تم ضبط سرعة المروحة على {speed}.")  # "Fan speed set to ..."
+
+    def control_scene(self, scene_id):
+        """Apply a scene: every device state in one publish batch, acks tracked together."""
+        states = registry.scene_states(scene_id)
+        session.publish_batch([(device.topic, payload) for device, payload in states], qos=1,
+                              name=scene_id, on_complete=self._scene_applied)
+        for device, payload in states:
+            self.events.emit("device_command", device=device.id, topic=device.topic, payload=payload,
+                             scene=scene_id)
+        self._respond(self.SCENE_RESPONSE)
+
+    def _scene_applied(self, batch):
+        """Report a scene once the broker has acknowledged all of it."""
+        print(f"Scene {batch.name}: {len(batch.topics)} device(s) acknowledged in {batch.elapsed * 1000:.0f} ms"
+              + (f", {len(batch.failed)} failed" if batch.failed else ""))
+        self.events.emit("scene_applied", scene=batch.name, devices=len(batch.topics), failed=len(batch.failed),
+                         elapsed_ms=batch.elapsed * 1000)
+
+    def get_temperature(self, room=None):
+        """Answer with the last temperature reading from the state cache (no network wait)."""
+        device = registry.room_device("temperature", room) if room else None
+        state = device_state.get(device.topic) if device else None
+        if state is None:
+            device, state = device_state.latest("temperature")  # No reading for the room: newest anywhere
+        if state is None:
+            self._respond("لا توجد قراءة لدرجة الحرارة بعد.")  # "No temperature reading yet."
+            return
+        response = f"درجة الحرارة الحالية هي {state.value} درجة مئوية."  # "Current temperature is..."
+        if device_state.is_stale(state):
+            minutes = int(state.age() // 60)
+            response += f" آخر قراءة قبل {minutes} دقيقة."  # "Last reading N minutes ago."
+        self._respond(response)
 
     def _save_text_to_file(self, text):
         """Save recognized text to a file."""
@@ -178,51 +408,109 @@ class ArabicSpeechProcessor:
     def _print_arabic(self, text):
         """Print Arabic text with error handling for TTS."""
         try:
-            reshaped_text = arabic_reshaper.reshape(text)  # Reshape the Arabic text
-            bidi_text = get_display(reshaped_text)  # Correct the bidirectional display of Arabic text
+            bidi_text = shape_arabic(text)  # Reshape and correct the bidirectional display of Arabic text
             
             # Print the reshaped and bidi-corrected text to the console
             print(bidi_text)
-            
-            # Only convert to speech and play the audio if it's enabled and hasn't been done before
-            #if self.voiceover_enabled:
-            #    audio_file = self._text_to_speech(text)  # Convert to speech
-            #    if audio_file:
-            #        self._play_audio(audio_file)  # Play the audio file
         except Exception as e:
             print(f"خطأ في طباعة النص العربي: {e}")  # Print an error message in Arabic if something goes wrong
 
-
-    def _text_to_speech(self, text):
-        """Convert text to speech and save it as an MP3 file."""
-        try:
-            audio_filename = 'greeting.mp3' if text == "مرحبًا! كيف يمكنني مساعدتك؟" else 'text.mp3'
-            
-            # Generate the speech using gTTS
-            tts = gTTS(text=text, lang='ar', slow=False)
-            tts.save(audio_filename)  # Save the speech as an MP3 file
-            self._print_arabic(f"تم تحويل النص إلى كلام وحفظه كملف MP3: {audio_filename}")  # Confirm MP3 creation
-            return audio_filename
-        except Exception as e:
-            print(f"خطأ في تحويل النص إلى كلام: {e}")  # Print any error in Arabic
-            return None  # Return None if there's an error
-
-
-    def _play_audio(self, file_path):
-        """Play audio using pydub and simpleaudio."""
+    def _speak(self, text):
+        """Play text from the TTS cache, or stream it while it is being synthesized."""
+        self.capture.muted = True  # Don't capture our own voice as a command
+        if self.rooms is not None:
+            self.rooms.mute()  # Every room's worker may hear the speaker
+        self.events.emit("tts_started", text=text)
         try:
-            audio = AudioSegment.from_mp3(file_path)  # Load the MP3 file
-            play(audio)  # Play the audio
+            metrics = self.speaker.speak(text, lang='ar')
+            self.events.emit("tts_finished", text=text, cached=metrics['cached'],
+                             first_audio_ms=metrics['time_to_first_audio'] * 1000,
+                             synthesis_ms=metrics['synthesis_time'] * 1000,
+                             total_ms=metrics['total_time'] * 1000)
+            print(f"TTS: first audio {metrics['time_to_first_audio'] * 1000:.0f} ms, "
+                  f"synthesis {metrics['synthesis_time'] * 1000:.0f} ms, "
+                  f"{metrics['chunks']} chunk(s){' (cached)' if metrics['cached'] else ''}")
         except Exception as e:
+            self.events.emit("tts_finished", text=text, error=str(e))
             print(f"حدث خطأ أثناء تشغيل الصوت: {e}")  # Print error if something goes wrong with playback
+        finally:
+            self.capture.muted = False
+            if self.rooms is not None:
+                self.rooms.unmute()
 
 # Main program
 if __name__ == "__main__":
-    processor = ArabicSpeechProcessor()
-    processor._respond_to_greeting()
+    parser = argparse.ArgumentParser(description="Arabic voice control for the smart home")
+    parser.add_argument("--recognizer", default="google", choices=["google", "vosk"],
+                        help="speech recognizer backend (vosk works offline)")
+    parser.add_argument("--vosk-model", default="vosk-model-ar", help="path to a local Vosk model")
+    parser.add_argument("--workers", type=int, default=2, help="recognition worker threads")
+    parser.add_argument("--no-vad", action="store_true", help="send every captured segment to the recognizer")
+    parser.add_argument("--broker", default=MQTT_BROKER, help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=MQTT_PORT, help="MQTT broker port")
+    parser.add_argument("--fast-start", action="store_true",
+                        help="short calibration, TTS prewarm deferred until listening")
+    parser.add_argument("--audio-file", help="read speech from a WAV file instead of the microphone")
+    parser.add_argument("--profile-startup", action="store_true", help="print per-import and per-phase timings")
+    parser.add_argument("--exit-after-startup", action="store_true", help="stop once listening has started")
+    parser.add_argument("--control-stdin", action="store_true",
+                        help="stay running and accept pause/resume/quit commands on stdin")
+    parser.add_argument("--events", metavar="HOST:PORT",
+                        help="send JSON-lines events (utterances, intents, commands, TTS) to this local socket")
+    parser.add_argument("--metrics-file", metavar="PATH", help="write MQTT publish/ack metrics (JSON) here on exit")
+    parser.add_argument("--rooms", metavar="PATH",
+                        help="multi-room mode: one capture process per audio input in this config (see voice_rooms.py)")
+    args = parser.parse_args()
+
+    with profiler.phase("mqtt_connect"):
+        start_mqtt(args.broker, args.port)
+
+    with profiler.phase("processor_init"):
+        recognizer_backend = None
+        rooms = None
+        if args.rooms:
+            # Every room worker builds its own recognizer; the model isn't loaded here
+            voice_rooms = profiler.import_module("voice_rooms")
+            room_recognizer = (("vosk", {"model_path": args.vosk_model}) if args.recognizer == "vosk"
+                               else ("google", {"language": "ar-AR"}))
+            rooms = voice_rooms.RoomVoicePool(voice_rooms.load_rooms(args.rooms), recognizer=room_recognizer,
+                                              use_vad=not args.no_vad,
+                                              calibration_seconds=0.3 if args.fast_start else 1.0)
+        elif args.recognizer == "vosk":
+            recognizer_backend = create_recognizer("vosk", model_path=args.vosk_model)
+        audio_source = load_speech_recognition().AudioFile(args.audio_file) if args.audio_file else None
+        processor = ArabicSpeechProcessor(
+            recognizer_backend=recognizer_backend,
+            recognition_workers=args.workers,
+            use_vad=not args.no_vad and rooms is None,  # Room workers run their own VAD
+            audio_source=audio_source,
+            calibration_seconds=0.3 if args.fast_start else 1.0,
+            prewarm=not args.fast_start,
+            defer_vad=args.fast_start,
+            events=EventEmitter(args.events),
+            rooms=rooms,
+        )
+
+    with profiler.phase("calibrate_and_listen"):
+        processor.start_listening()
+    profiler.mark("time-to-first-listen")
+    if args.profile_startup:
+        print(profiler.report())
+
+    processor._respond_to_greeting()  # Spoken by the pipeline while capture keeps running
+    if args.fast_start:
+        processor.prewarm_responses()  # The greeting is synthesized on demand, the other replies meanwhile
     processor._print_arabic("بدء معالجة الكلام باللغة العربية...")  # "Starting Arabic speech processing..."
-    
-    while processor.running:
-        processor.listen_and_process()
+    if args.exit_after_startup:
+        processor.running = False
+    if args.control_stdin:
+        threading.Thread(target=serve_control_channel, args=(processor,), name="ControlChannel", daemon=True).start()
+    processor.run()
     
     processor._print_arabic("تم إنهاء البرنامج بنجاح.")  # "Program terminated successfully."
+    processor.events.close()
+    print(session.report())
+    print(f"MQTT metrics: {mqtt_metrics.summary()}")
+    session.stop()
+    if args.metrics_file:
+        mqtt_metrics.write_snapshot(args.metrics_file)
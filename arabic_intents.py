@@ -0,0 +1,151 @@
+import collections
+import json
+import os
+import re
+
+DEFAULT_INTENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+_TATWEEL = "ـ"
+_CHAR_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي",
+    "ؤ": "و",
+    "ة": "ه",
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+})
+_SLOT = re.compile(r"\{(\w+)\}")
+_SLOT_PATTERNS = {"number": r"\d+"}
+
+
+def normalize_arabic(text):
+    """Fold spelling variants so recognizer output and phrases compare equal."""
+    text = _DIACRITICS.sub("", text).replace(_TATWEEL, "")
+    text = text.translate(_CHAR_MAP).lower()
+    return " ".join(text.split())
+
+
+class IntentMatch:
+    """Result of matching an utterance against the intent table."""
+
+    def __init__(self, name, phrase, params=None):
+        self.name = name
+        self.phrase = phrase
+        self.params = params or {}
+
+    def __repr__(self):
+        return f"IntentMatch({self.name!r}, {self.params!r})"
+
+
+class _AhoCorasick:
+    """Multi-pattern substring matcher; finds every pattern in one pass over the text."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(index)
+
+        pending = collections.deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, target in self.goto[state].items():
+                pending.append(target)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[target] = self.goto[fallback].get(char, 0)
+                self.output[target] = self.output[target] + self.output[self.fail[target]]
+
+    def search(self, text):
+        """Yield (end_index, pattern_index) for every occurrence."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for index in self.output[state]:
+                yield position, index
+
+
+class IntentEngine:
+    """Compiled intent matcher over normalized Arabic text.
+
+    Every phrase in the table is normalized and its leading literal text is
+    indexed in a single Aho-Corasick automaton. Phrases with slots such as
+    "اضبط المروحة على {number}" are confirmed with a regex only when their
+    literal prefix is found. When several intents match, the one listed
+    first in the table wins.
+    """
+
+    def __init__(self, intents):
+        self.intents = intents
+        literals = []
+        self._entries = []  # (priority, intent name, phrase, slot regex or None)
+        for priority, intent in enumerate(intents):
+            for phrase in intent["phrases"]:
+                normalized = normalize_arabic(phrase)
+                literal = _SLOT.split(normalized)[0].strip()
+                if not literal:
+                    raise ValueError(f"Intent phrase must start with literal text: {phrase!r}")
+                regex = None
+                if _SLOT.search(normalized):
+                    regex = re.compile(self._slot_regex(normalized))
+                literals.append(literal)
+                self._entries.append((priority, intent["name"], phrase, regex))
+        self._automaton = _AhoCorasick(literals)
+        self._literal_lengths = [len(literal) for literal in literals]
+
+    @classmethod
+    def load(cls, path=DEFAULT_INTENTS, extra=()):
+        """Build an engine from a JSON intent table, plus extra intents ranked after it."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["intents"] + list(extra))
+
+    def match(self, text):
+        """Return the highest-priority IntentMatch in text, or None."""
+        normalized = normalize_arabic(text)
+        best = None
+        for end, index in self._automaton.search(normalized):
+            priority, name, phrase, regex = self._entries[index]
+            if best is not None and priority >= best[0]:
+                continue
+            params = {}
+            if regex is not None:
+                start = end - self._literal_lengths[index] + 1
+                found = regex.match(normalized, start)
+                if not found:
+                    continue
+                params = {key: _convert(value) for key, value in found.groupdict().items()}
+            best = (priority, IntentMatch(name, phrase, params))
+        return best[1] if best else None
+
+    @staticmethod
+    def _slot_regex(phrase):
+        def literal(segment):
+            return r"\s*".join(re.escape(word) for word in segment.split(" "))
+
+        parts = []
+        position = 0
+        for slot in _SLOT.finditer(phrase):
+            parts.append(literal(phrase[position:slot.start()]))
+            name = slot.group(1)
+            pattern = _SLOT_PATTERNS.get(name, r"\S+")
+            parts.append(f"(?P<{name}>{pattern})")
+            position = slot.end()
+        parts.append(literal(phrase[position:]))
+        return "".join(parts)
+
+
+def _convert(value):
+    return int(value) if value.isdigit() else value
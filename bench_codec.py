@@ -0,0 +1,83 @@
+"""Benchmark for sensor payload encodings: bytes on the wire and decode cost per reading.
+
+Compares one decimal string per message (today's devices) against
+sensor_codec batch frames, with and without MQTT v5 topic aliases.
+Wire bytes are whole MQTT v5 PUBLISH packets (QoS 0): fixed header,
+topic, properties and payload. Decode cost is what a reader spends
+turning a payload into (timestamp, value) readings.
+
+Run with: python bench_codec.py [readings]
+"""
+import random
+import sys
+import time
+
+from sensor_codec import CONTENT_TYPE, decode_batch, encode_batch
+
+TOPICS = ("/home/humidity", "/rooms/living/humidity")
+BATCH_SIZES = (1, 10, 50, 250)
+
+
+def varint_size(value):
+    size = 1
+    while value >= 128:
+        value //= 128
+        size += 1
+    return size
+
+
+def publish_size(topic, payload_len, alias=False, content_type=None):
+    """Bytes of a QoS 0 MQTT v5 PUBLISH packet."""
+    properties = 0
+    if alias:
+        properties += 3  # Topic Alias: id + uint16
+    if content_type:
+        properties += 3 + len(content_type.encode())  # Content Type: id + length-prefixed string
+    topic_len = 0 if alias else len(topic.encode())  # An established alias sends an empty topic
+    remaining = 2 + topic_len + varint_size(properties) + properties + payload_len
+    return 1 + varint_size(remaining) + remaining
+
+
+def readings(count, rate=10.0):
+    rng = random.Random(1)
+    start = time.time()
+    return [(start + i / rate, round(45 + 5 * rng.random(), 1)) for i in range(count)]
+
+
+def per_reading_ns(func, payloads, readings_each):
+    started = time.perf_counter()
+    for payload in payloads:
+        func(payload)
+    return (time.perf_counter() - started) * 1e9 / (len(payloads) * readings_each)
+
+
+def decode_text(payload):
+    return [(time.time(), float(payload.decode()))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = readings(count)
+    texts = [f"{value}".encode() for _, value in data]
+
+    print(f"Bytes on the wire per reading ({count} readings, QoS 0 PUBLISH packets):")
+    for topic in TOPICS:
+        text_full = sum(publish_size(topic, len(t)) for t in texts) / count
+        text_alias = sum(publish_size(topic, len(t), alias=True) for t in texts) / count
+        print(f"  {topic}")
+        print(f"    text, full topic      {text_full:7.2f} B")
+        print(f"    text, topic alias     {text_alias:7.2f} B")
+        for size in BATCH_SIZES:
+            frames = [encode_batch(data[i:i + size]) for i in range(0, count, size)]
+            wire = sum(publish_size(topic, len(f), alias=True, content_type=CONTENT_TYPE) for f in frames)
+            print(f"    batch of {size:<4} + alias {wire / count:7.2f} B")
+
+    print("\nDecode cost per reading:")
+    print(f"  text float()          {per_reading_ns(decode_text, texts, 1):7.0f} ns")
+    for size in BATCH_SIZES:
+        frames = [encode_batch(data[i:i + size]) for i in range(0, count - count % size, size)]
+        print(f"  batch of {size:<4}         {per_reading_ns(decode_batch, frames, size):7.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Capacity benchmark for the headless home controller core.
+
+Builds a home_daemon.HomeDaemon with an increasing number of homes (the
+devices.json layout, three rooms each, so 16 devices per home) and
+measures two things:
+
+  core      messages fed straight into HomeHub.on_message: routing by
+            prefix, decoding, the state cache and registry dispatch
+  broker    the same messages published through a LocalBroker to the
+            daemon's single pooled connection, until all have arrived
+
+Run with: python bench_hub.py [--homes 10,100,1000] [--messages 50000]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import paho.mqtt.client as mqtt
+
+from home_daemon import HomeDaemon, synthetic_homes
+from local_broker import LocalBroker
+from mqtt_replay import RecordedMessage
+from mqtt_session import MqttSession
+
+ROOMS = ("kitchen", "living", "bedroom")
+SUFFIXES = ["/home/temp", "/home/humidity", "/home/led", "/home/fan"] + [
+    f"/rooms/{room}/{kind}" for room in ROOMS for kind in ("temp", "humidity", "led", "fan")]
+
+
+def traffic(homes, count):
+    rng = random.Random(1)
+    messages = []
+    for _ in range(count):
+        topic = f"/homes/home{rng.randrange(homes)}{rng.choice(SUFFIXES)}"
+        if topic.endswith("led"):
+            payload = rng.choice((b"ON", b"OFF"))
+        elif topic.endswith("fan"):
+            payload = str(rng.randrange(256)).encode()
+        else:
+            payload = f"{20 + 10 * rng.random():.1f}".encode()
+        messages.append((topic, payload))
+    return messages
+
+
+def bench_core(homes, messages):
+    session = MqttSession("127.0.0.1", 1, client_id="bench")  # Never started: commands queue in the outbox
+    daemon = HomeDaemon(synthetic_homes(homes), session)
+    recorded = [RecordedMessage(topic, payload) for topic, payload in messages]
+    for msg in recorded[:len(recorded) // 10]:  # Warm up: resolve wildcard devices
+        daemon.hub.on_message(None, None, msg)
+    started = time.perf_counter()
+    for msg in recorded:
+        daemon.hub.on_message(None, None, msg)
+    elapsed = time.perf_counter() - started
+    daemon.publisher.stop(flush=False)
+    return len(recorded) / elapsed, daemon.hub.stats()["devices"]
+
+
+def bench_broker(homes, messages):
+    broker = LocalBroker().start()
+    session = MqttSession(broker.host, broker.port, client_id="bench-daemon")
+    with contextlib.redirect_stdout(io.StringIO()):
+        daemon = HomeDaemon(synthetic_homes(homes), session)
+        daemon.start()
+    deadline = time.time() + 5
+    while not session.connected and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)  # Subscriptions in place
+    sender = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="bench-devices",
+                         protocol=mqtt.MQTTv5)
+    sender.connect(broker.host, broker.port)
+    sender.loop_start()
+    baseline = daemon.hub.stats()["received"]
+    started = time.perf_counter()
+    for topic, payload in messages:
+        sender.publish(topic, payload)
+    deadline = time.time() + 60
+    while daemon.hub.stats()["received"] - baseline < len(messages) and time.time() < deadline:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    received = daemon.hub.stats()["received"] - baseline
+    sender.loop_stop()
+    sender.disconnect()
+    with contextlib.redirect_stdout(io.StringIO()):
+        daemon.stop()
+    broker.stop()
+    return received / elapsed, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Home controller capacity benchmark")
+    parser.add_argument("--homes", default="10,100,1000", help="comma-separated home counts")
+    parser.add_argument("--messages", type=int, default=50000, help="messages per run")
+    args = parser.parse_args()
+
+    print(f"{'homes':>6} {'devices':>8} {'core msg/s':>12} {'broker msg/s':>13} {'delivered':>10}")
+    for homes in (int(h) for h in args.homes.split(",")):
+        messages = traffic(homes, args.messages)
+        core_rate, devices = bench_core(homes, messages)
+        broker_rate, received = bench_broker(homes, messages)
+        print(f"{homes:>6} {devices:>8} {core_rate:>12,.0f} {broker_rate:>13,.0f} {received:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark the compiled intent engine against the old substring chain.
+
+Run with: python bench_intents.py [iterations]
+"""
+import sys
+import time
+
+from arabic_intents import IntentEngine
+
+# (utterance as a recognizer might return it, expected intent or None)
+CORPUS = [
+    ("تشغيل الاضواء", "led_on"),
+    ("تشغيل الأضواء", "led_on"),
+    ("من فضلك شغل الاضواء", "led_on"),
+    ("شغّل النور", "led_on"),
+    ("فصل الاضواء", "led_off"),
+    ("إيقاف الأضواء", "led_off"),
+    ("اطفي النور لو سمحت", "led_off"),
+    ("تشغيل المروحه", "fan_on"),
+    ("تشغيل المروحة", "fan_on"),
+    ("شغل المروحة", "fan_on"),
+    ("إيقاف المروحة", "fan_off"),
+    ("ايقاف المروحه", "fan_off"),
+    ("أطفئ المروحة", "fan_off"),
+    ("اضبط المروحة على 120", "fan_set"),
+    ("اضبط المروحه على ١٢٠", "fan_set"),
+    ("سرعة المروحة 200", "fan_set"),
+    ("set fan to 80", "fan_set"),
+    ("درجة الحراره", "temperature"),
+    ("ما هي درجة الحرارة الآن", "temperature"),
+    ("كم الحرارة", "temperature"),
+    ("مرحبا", "greeting"),
+    ("السلام عليكم", "greeting"),
+    ("أهلا", "greeting"),
+    ("صباح الخير", "greeting"),
+    ("توقف", "stop"),
+    ("إنهاء", "stop"),
+    ("انهاء البرنامج", "stop"),
+    ("اكتب ملاحظة عن الاجتماع", None),
+    ("ما هو الطقس غدا", None),
+    ("ذكرني بشراء الخبز", None),
+]
+
+
+def legacy_match(text):
+    """The original if/elif substring chain from VoiceControlForHome.py."""
+    if any(greeting in text for greeting in ["مرحبا", "السلام عليكم", "اهلا", "صباح الخير", "مساء الخير"]):
+        return "greeting"
+    if any(command in text for command in ["توقف", "خروج", "إغلاق", "إنهاء"]):
+        return "stop"
+    if "تشغيل الاضواء" in text:
+        return "led_on"
+    if "فصل الاضواء" in text:
+        return "led_off"
+    if "تشغيل المروحه" in text:
+        return "fan_on"
+    if "إيقاف المروحة" in text:
+        return "fan_off"
+    if "درجة الحراره" in text:
+        return "temperature"
+    return None
+
+
+def run(name, matcher, iterations):
+    correct = sum(matcher(text) == expected for text, expected in CORPUS)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text, _ in CORPUS:
+            matcher(text)
+    elapsed = time.perf_counter() - start
+    rate = iterations * len(CORPUS) / elapsed
+    print(f"{name:<10} accuracy {correct}/{len(CORPUS)} ({100 * correct / len(CORPUS):.0f}%)  "
+          f"{rate:,.0f} matches/s")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    engine = IntentEngine.load()
+
+    def compiled_match(text):
+        match = engine.match(text)
+        return match.name if match else None
+
+    for text, expected in CORPUS:
+        got = compiled_match(text)
+        if got != expected:
+            print(f"MISS: {text!r} expected {expected}, got {got}")
+
+    run("legacy", legacy_match, iterations)
+    run("compiled", compiled_match, iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""End-to-end command latency benchmark against an in-process broker.
+
+Runs a LocalBroker on loopback, a farm of simulated devices that echo
+every command back as their new state, and the dashboard's message path
+(HomeHub -> HomeController.receive -> UiUpdateQueue -> HomeController.apply
+-> registry handlers) on a headless frame loop standing in for Tk.
+Commands go through the same calls the dashboard and voice control make:
+
+  toggle_led     HomeController.toggle_led, as GUI.toggle_led
+  set_fan_speed  HomeController.set_fan_speed(immediate=True), as GUI's Set button
+  voice intent   ArabicSpeechProcessor._execute_command on recognized text
+
+command-to-ack is the time until the simulated device has received the
+command and published its state; command-to-render is the time until
+the UI handler has applied a matching value. A sweep then raises the
+device count and offered command rate to find the throughput ceiling.
+
+Run with: python bench_latency.py [--quick] [--skip-voice]
+"""
+import argparse
+import contextlib
+import heapq
+import io
+import itertools
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.subscribeoptions import SubscribeOptions
+
+from device_registry import DeviceRegistry, load_registry
+from home_controller import HomeController, HomeHub
+from local_broker import LocalBroker
+from mqtt_metrics import percentiles
+from mqtt_session import MqttSession
+from ui_queue import UiUpdateQueue
+
+BENCH_PREFIX = "/bench"
+CEILING_P95_MS = 100  # A rate counts as sustained if p95 render latency stays under this
+
+
+class FrameLoop:
+    """Headless stand-in for the Tk main loop: runs after() callbacks on one thread."""
+
+    def __init__(self):
+        self._timers = []
+        self._ids = itertools.count()
+        self._cancelled = set()
+        self._cond = threading.Condition()
+        self._running = True
+        threading.Thread(target=self._run, name="FrameLoop", daemon=True).start()
+
+    def after(self, ms, func, *args):
+        timer_id = next(self._ids)
+        with self._cond:
+            heapq.heappush(self._timers, (time.perf_counter() + ms / 1000, timer_id, func, args))
+            self._cond.notify()
+        return timer_id
+
+    def after_cancel(self, timer_id):
+        self._cancelled.add(timer_id)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._timers or self._timers[0][0] > time.perf_counter()):
+                    self._cond.wait(self._timers[0][0] - time.perf_counter() if self._timers else None)
+                if not self._running:
+                    return
+                _, timer_id, func, args = heapq.heappop(self._timers)
+            if timer_id not in self._cancelled:
+                func(*args)
+
+
+class Tracker:
+    """Command, ack and render times per topic and payload.
+
+    When the UI coalesces several values for one topic into a frame, only
+    the newest renders; the older commands count as superseded.
+    """
+
+    def __init__(self):
+        self.sent = {}  # topic -> {payload: [sent time, acked]}, oldest first
+        self.ack = []
+        self.render = []
+        self.superseded = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.sent = {}
+            self.ack, self.render, self.superseded = [], [], 0
+
+    def command(self, topic, payload):
+        with self._lock:
+            pending = self.sent.setdefault(topic, {})
+            pending.pop(payload, None)
+            pending[payload] = [time.perf_counter(), False]
+
+    def acked(self, topic, payload):
+        with self._lock:
+            entry = self.sent.get(topic, {}).get(payload)
+            if entry and not entry[1]:
+                entry[1] = True
+                self.ack.append(time.perf_counter() - entry[0])
+
+    def rendered(self, topic, payload):
+        with self._lock:
+            pending = self.sent.get(topic)
+            if not pending or payload not in pending:
+                return
+            for older in list(pending):
+                entry = pending.pop(older)
+                if older == payload:
+                    self.render.append(time.perf_counter() - entry[0])
+                    break
+                self.superseded += 1
+
+    def outstanding(self):
+        with self._lock:
+            return sum(len(pending) for pending in self.sent.values())
+
+
+class DeviceFarm:
+    """Simulated devices: every command on a device topic is echoed back as state."""
+
+    def __init__(self, port, tracker, topics):
+        self.tracker = tracker
+        self.client = _client("device-farm", port)
+        self.client.on_message = self._on_message
+        # no-local: the farm must not hear its own echoes
+        self.client.subscribe([(t, SubscribeOptions(qos=1, noLocal=True)) for t in topics])
+
+    def _on_message(self, client, userdata, msg):
+        payload = msg.payload.decode()
+        self.tracker.acked(msg.topic, payload)
+        client.publish(msg.topic, payload, qos=1)
+
+
+class Dashboard:
+    """The dashboard's HomeHub and HomeController, wired as GUI.py does but without widgets."""
+
+    def __init__(self, port, tracker, registry):
+        self.tracker = tracker
+        self.registry = registry
+        self.loop = FrameLoop()
+        self.ui_queue = UiUpdateQueue(self.loop)
+        self.session = MqttSession("127.0.0.1", port, client_id="dashboard")
+        self.hub = HomeHub(self.session, reader_id="dashboard")
+        self.controller = self.hub.add_home(HomeController(registry, self.session, fan_rate=10))
+        self.controller.on_receive = self._on_receive
+        registry.register_handler("led", self._render)
+        registry.register_handler("fan", self._render)
+        self.hub.start()
+        deadline = time.time() + 5
+        while not self.session.connected and time.time() < deadline:
+            time.sleep(0.01)
+        self.ui_queue.start()
+
+    def _on_receive(self, topic, payload, received, older):
+        self.ui_queue.post(topic, self.controller.apply, topic, payload)  # As GUI.show_message
+
+    def _render(self, device, payload):
+        self.tracker.rendered(device.topic, payload)
+
+    def toggle_led(self, device):
+        payload = "OFF" if self.controller.device_state.value(device.topic, "OFF") == "ON" else "ON"
+        self.tracker.command(device.topic, payload)  # Before publishing: the echo may beat the return
+        self.controller.toggle_led(device)
+
+    def set_fan_speed(self, device, value):
+        self.tracker.command(device.topic, str(value))
+        self.controller.set_fan_speed(device, value, immediate=True)
+
+    def close(self):
+        self.ui_queue.stop()
+        self.loop.stop()
+        self.hub.stop()  # Stops the controller's publisher and the session
+
+
+def _client(client_id, port):
+    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id=client_id,
+                         protocol=mqtt.MQTTv5)
+    client.connect("127.0.0.1", port)
+    client.loop_start()
+    deadline = time.time() + 5
+    while not client.is_connected() and time.time() < deadline:
+        time.sleep(0.01)
+    return client
+
+
+def bench_registry(device_count):
+    """devices.json plus device_count LEDs and fans under /bench."""
+    config = {"devices": [
+        {"id": d.id, "type": d.type, "name": d.name, "topic": d.topic, **d.options}
+        for d in load_registry().devices.values()
+    ]}
+    for i in range(device_count):
+        config["devices"].append({"id": f"bench-led{i}", "type": "led", "topic": f"{BENCH_PREFIX}/led{i}"})
+        # No practical speed limit: the sweep sends a fresh value with every command
+        config["devices"].append({"id": f"bench-fan{i}", "type": "fan", "topic": f"{BENCH_PREFIX}/fan{i}",
+                                  "max": 1 << 30})
+    return DeviceRegistry(config)
+
+
+def drive(tracker, commands, rate, settle=2.0):
+    """Issue commands (callables) open-loop at rate per second, then wait for renders."""
+    tracker.reset()
+    started = time.perf_counter()
+    for i, command in enumerate(commands):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        command()
+    issued = time.perf_counter() - started
+    deadline = time.perf_counter() + settle
+    while tracker.outstanding() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return issued
+
+
+def report(label, tracker, count):
+    ack = percentiles(tracker.ack)
+    render = percentiles(tracker.render)
+    print(f"{label:<14} n={count:<5} ack p50 {ack['p50']:6.2f}  p95 {ack['p95']:6.2f}  p99 {ack['p99']:6.2f} ms | "
+          f"render p50 {render['p50']:6.2f}  p95 {render['p95']:6.2f}  p99 {render['p99']:6.2f} ms | "
+          f"lost {count - len(tracker.render)}")
+
+
+def bench_entry_points(port, tracker, dashboard, count, skip_voice):
+    print("Command latency (loopback broker, echo devices):")
+    led = dashboard.registry.devices["bench-led0"]
+    drive(tracker, [lambda: dashboard.toggle_led(led)] * count, rate=20)
+    report("toggle_led", tracker, count)
+
+    fan = dashboard.registry.devices["bench-fan0"]
+    values = [i % 256 for i in range(count)]
+    drive(tracker, [lambda v=v: dashboard.set_fan_speed(fan, v) for v in values], rate=20)
+    report("set_fan_speed", tracker, count)
+
+    if skip_voice:
+        return
+    import VoiceControlForHome as voice
+    from tts_cache import ToneBackend
+    voice.start_mqtt("127.0.0.1", port)
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor = voice.ArabicSpeechProcessor(tts_backend=ToneBackend(), prewarm=False, use_vad=False)
+    processor.voiceover_enabled = False
+    commands = []
+    for i in range(count):
+        text, payload = ("شغل النور", "ON") if i % 2 == 0 else ("اطفئ النور", "OFF")
+        commands.append(lambda text=text, payload=payload: (
+            tracker.command(voice.LED_TOPIC, payload), processor._execute_command(text)))
+    with contextlib.redirect_stdout(io.StringIO()):
+        drive(tracker, commands, rate=10)
+    report("voice intent", tracker, count)
+    voice.session.stop()
+
+
+def bench_ceiling(tracker, dashboard, device_counts, step_seconds):
+    print(f"\nThroughput ceiling (set_fan_speed round-robin, sustained = all rendered and p95 < {CEILING_P95_MS} ms):")
+    fans = [d for d in dashboard.registry.devices.values() if d.id.startswith("bench-fan")]
+    value = itertools.count(1000)
+    for device_count in device_counts:
+        targets = fans[:device_count]
+        rate, ceiling = 50, 0
+        while rate <= 20000:
+            count = int(rate * step_seconds)
+            commands = [lambda d=targets[i % device_count]: dashboard.set_fan_speed(d, next(value))
+                        for i in range(count)]
+            issued = drive(tracker, commands, rate)
+            offered = count / issued
+            rendered = len(tracker.render) + tracker.superseded
+            p95 = percentiles(tracker.render)["p95"]
+            ok = rendered >= count * 0.99 and p95 < CEILING_P95_MS and offered >= rate * 0.9
+            print(f"  devices={device_count:<4} offered {offered:7.0f}/s  rendered {len(tracker.render):6} "
+                  f"+ superseded {tracker.superseded:6} of {count:<6} render p95 {p95:7.2f} ms "
+                  f"{'ok' if ok else 'SATURATED'}")
+            if not ok:
+                break
+            ceiling = rate
+            rate *= 2
+        print(f"  -> ceiling with {device_count} device(s): ~{ceiling}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer commands and shorter sweep steps")
+    parser.add_argument("--skip-voice", action="store_true", help="skip the voice intent entry point")
+    args = parser.parse_args()
+    count = 50 if args.quick else 200
+    device_counts = (1, 10, 100)
+
+    broker = LocalBroker().start()
+    tracker = Tracker()
+    registry = bench_registry(max(device_counts))
+    farm = DeviceFarm(broker.port, tracker, [f"{BENCH_PREFIX}/#"] + [d.topic for d in load_registry().devices.values()
+                                                                    if d.type in ("led", "fan")])
+    dashboard = Dashboard(broker.port, tracker, registry)
+    time.sleep(0.3)  # Subscriptions in place
+    try:
+        bench_entry_points(broker.port, tracker, dashboard, count, args.skip_voice)
+        bench_ceiling(tracker, dashboard, device_counts, 0.5 if args.quick else 2.0)
+    finally:
+        dashboard.close()
+        farm.client.loop_stop()
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
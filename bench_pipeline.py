@@ -0,0 +1,63 @@
+"""Benchmark the voice pipeline offline with a scripted recognizer.
+
+Run with: python bench_pipeline.py [phrases] [recognizer_latency_ms] [workers]
+"""
+import queue
+import sys
+import time
+
+from arabic_intents import IntentEngine
+from recognizers import ScriptedRecognizer
+from voice_pipeline import VoicePipeline
+
+TRANSCRIPTS = [
+    "تشغيل الاضواء",
+    "اضبط المروحة على 120",
+    "ايقاف المروحه",
+    "درجة الحراره",
+    "فصل الاضواء",
+]
+
+
+class FakeAudio:
+    def __init__(self, transcript):
+        self.transcript = transcript
+
+
+def main():
+    phrases = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50.0) / 1000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    engine = IntentEngine.load()
+    recognizer = ScriptedRecognizer(latency=latency)
+    source = queue.Queue(maxsize=phrases)
+    acted = []
+    pipeline = VoicePipeline(
+        source,
+        recognizer.recognize,
+        engine.match,
+        act=lambda text, intent: acted.append(intent.name if intent else None),
+        speak=lambda text: None,
+        workers=workers,
+        queue_size=phrases,  # Measure throughput, not the drop policy
+    )
+
+    pipeline.start()
+    start = time.perf_counter()
+    for i in range(phrases):
+        source.put(FakeAudio(TRANSCRIPTS[i % len(TRANSCRIPTS)]))
+    while len(acted) < phrases - pipeline.dropped_count:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+
+    expected = [engine.match(TRANSCRIPTS[i % len(TRANSCRIPTS)]).name for i in range(phrases)]
+    in_order = acted == expected if not pipeline.dropped_count else "n/a (phrases dropped)"
+    print(f"{phrases} phrases, recognizer latency {latency * 1000:.0f} ms, {workers} workers")
+    print(f"throughput {len(acted) / elapsed:.1f} phrases/s, in order: {in_order}, dropped: {pipeline.dropped_count}")
+    print(pipeline.report())
+
+
+if __name__ == "__main__":
+    main()
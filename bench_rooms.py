@@ -0,0 +1,86 @@
+"""Benchmark multi-room voice capture as rooms are added.
+
+Writes one synthetic WAV per room (a second of room noise, then voiced
+bursts separated by pauses) and runs a RoomVoicePool over them with a
+scripted recognizer in every worker. Realtime mode plays the files at
+speaking pace, so latency (end of phrase to result handled) should stay
+flat as rooms are added; --fast reads them as fast as possible to show
+how capture and VAD throughput scale with worker processes and cores.
+
+Run with: python bench_rooms.py [--rooms 1,2,4,8] [--phrases 10] [--latency-ms 50] [--fast]
+"""
+import argparse
+import os
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from voice_pipeline import StageMetrics
+from voice_rooms import RoomVoicePool
+
+SAMPLE_RATE = 16000
+TRANSCRIPTS = ["تشغيل الاضواء", "اضبط المروحة على 120", "درجة الحراره"]
+
+
+def write_phrases(path, phrases, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(0.6 * SAMPLE_RATE)) / SAMPLE_RATE
+    voiced = 8000 * np.sin(2 * np.pi * 220 * t) * (1 + 0.3 * np.sin(2 * np.pi * 5 * t))
+    parts = [rng.normal(0, 30, SAMPLE_RATE)]
+    for _ in range(phrases):
+        parts.append(voiced + rng.normal(0, 30, len(voiced)))
+        parts.append(rng.normal(0, 30, int(1.2 * SAMPLE_RATE)))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(np.clip(np.concatenate(parts), -32768, 32767).astype("<i2").tobytes())
+
+
+def run(directory, rooms, phrases, latency, realtime):
+    specs = []
+    for i in range(rooms):
+        path = os.path.join(directory, f"room{i}.wav")
+        if not os.path.exists(path):
+            write_phrases(path, phrases, i)
+        specs.append({"room": f"room{i}", "source": "wav", "path": path, "realtime": realtime})
+    results = []
+    pool = RoomVoicePool(specs, results.append, recognizer=("scripted", {"transcripts": TRANSCRIPTS,
+                                                                          "latency": latency}),
+                         calibration_seconds=0.5)
+    started = time.perf_counter()
+    pool.start()
+    while pool.running:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    pool.stop()
+    overall = StageMetrics("all")
+    for metrics in pool.room_metrics.values():
+        for sample in metrics.samples:
+            overall.record(sample)
+    recognized = sum(1 for r in results if r["event"] == "result")
+    return recognized, elapsed, overall.snapshot(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-room voice capture benchmark")
+    parser.add_argument("--rooms", default="1,2,4,8", help="comma-separated room counts")
+    parser.add_argument("--phrases", type=int, default=10, help="phrases per room")
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated recognizer latency")
+    parser.add_argument("--fast", action="store_true", help="read the WAV files as fast as possible")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.phrases} phrases per room, recognizer {args.latency_ms:.0f} ms, "
+          f"{'as fast as possible' if args.fast else 'realtime'}")
+    print(f"{'rooms':>5} {'recognized':>10} {'phrases/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rooms in (int(r) for r in args.rooms.split(",")):
+            recognized, elapsed, stats = run(directory, rooms, args.phrases, args.latency_ms / 1000, not args.fast)
+            print(f"{rooms:>5} {recognized:>10} {recognized / elapsed:>10.1f} {stats['p50_ms']:>8.1f} "
+                  f"{stats['p95_ms']:>8.1f} {stats['max_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Benchmark applying a scene: one publish batch against one command at a time.
+
+Runs a LocalBroker behind a proxy that adds a fixed network delay, then
+sets N QoS 1 device states three ways:
+
+  sequential     publish one state, wait for its ack, then the next
+  batch, 20      MqttSession.publish_batch with paho's default in-flight window
+  batch          MqttSession.publish_batch with the session's window (100)
+
+and reports the time until every state is acknowledged, in round trips.
+
+Run with: python bench_scenes.py [--devices 10,50,100] [--rtt-ms 20]
+"""
+import argparse
+import collections
+import socket
+import threading
+import time
+
+from local_broker import LocalBroker
+from mqtt_session import MqttSession
+
+
+class DelayProxy:
+    """TCP proxy that delays everything it forwards by rtt / 2 in each direction."""
+
+    def __init__(self, target_port, rtt):
+        self.target_port = target_port
+        self.delay = rtt / 2
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(8)
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, name="DelayProxy", daemon=True).start()
+
+    def close(self):
+        self._server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(("127.0.0.1", self.target_port))
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream)
+            self._pipe(upstream, client)
+
+    def _pipe(self, source, destination):
+        pending = collections.deque()  # (due time, data); constant delay keeps it in order
+        ready = threading.Condition()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                with ready:
+                    pending.append((time.perf_counter() + self.delay, data))
+                    ready.notify()
+                if not data:
+                    return
+
+        def write():
+            while True:
+                with ready:
+                    while not pending:
+                        ready.wait()
+                    due, data = pending.popleft()
+                time.sleep(max(0.0, due - time.perf_counter()))
+                if not data:
+                    destination.close()
+                    return
+                try:
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def connect(port, max_inflight):
+    session = MqttSession("127.0.0.1", port, client_id=f"bench-scenes-{max_inflight}", max_inflight=max_inflight)
+    session.start()
+    deadline = time.time() + 5
+    while not session.connected and time.time() < deadline:
+        time.sleep(0.01)
+    return session
+
+
+def states(count, round_number):
+    return [(f"/bench/scene/device{i}", str((i + round_number) % 256)) for i in range(count)]
+
+
+def sequential(session, messages):
+    started = time.perf_counter()
+    for topic, payload in messages:
+        session.publish_batch([(topic, payload)], qos=1).wait(10)
+    return time.perf_counter() - started
+
+
+def batched(session, messages):
+    batch = session.publish_batch(messages, qos=1, name="scene")
+    batch.wait(30)
+    return batch.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene publish benchmark")
+    parser.add_argument("--devices", default="10,50,100", help="comma-separated scene sizes")
+    parser.add_argument("--rtt-ms", type=float, default=20, help="simulated network round trip")
+    parser.add_argument("--rounds", type=int, default=5, help="runs per measurement (median is shown)")
+    args = parser.parse_args()
+
+    rtt = args.rtt_ms / 1000
+    broker = LocalBroker().start()
+    proxy = DelayProxy(broker.port, rtt)
+    sessions = {20: connect(proxy.port, 20), 100: connect(proxy.port, 100)}
+    runs = (("sequential", sessions[100], sequential), ("batch, 20", sessions[20], batched),
+            ("batch", sessions[100], batched))
+
+    print(f"Simulated RTT {args.rtt_ms:.0f} ms; time until every state is acked (median of {args.rounds})")
+    print(f"{'devices':>7} " + " ".join(f"{name:>20}" for name, _, _ in runs))
+    round_number = 0
+    for count in (int(n) for n in args.devices.split(",")):
+        cells = []
+        for name, session, run in runs:
+            times = []
+            for _ in range(args.rounds):
+                round_number += 1  # New values each time, so nothing is skipped as unchanged
+                times.append(run(session, states(count, round_number)))
+            median = sorted(times)[len(times) // 2]
+            cells.append(f"{median * 1000:8.1f} ms {median / rtt:5.1f} RTT")
+        print(f"{count:>7} " + " ".join(f"{cell:>20}" for cell in cells))
+
+    for session in sessions.values():
+        session.stop()
+    proxy.close()
+    broker.stop()
+
+
+if __name__ == "__main__":
+    main()
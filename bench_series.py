@@ -0,0 +1,61 @@
+"""Benchmark for the sensor time-series store behind the dashboard chart.
+
+Fills a memory-mapped series with a week of 1 Hz readings, then times the
+window query + decimation the chart runs on every redraw: live views of
+1 h, 24 h and 7 d, and a scroll through the whole week with a 24 h window.
+Also reports how long reopening the persisted history takes.
+
+Run with: python bench_series.py [chart width in px]
+"""
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from sensor_series import SensorSeries
+
+WEEK = 7 * 24 * 3600
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    t0 = time.time() - WEEK
+    times = (t0 + np.arange(WEEK)).tolist()
+    values = (22 + 4 * np.sin(np.arange(WEEK) * 2 * np.pi / 86400)
+              + np.random.default_rng(0).normal(0, 0.2, WEEK)).tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        series = SensorSeries(tmp, "temp")
+        started = time.perf_counter()
+        for t, v in zip(times, values):
+            series.append(t, v)
+        elapsed = time.perf_counter() - started
+        print(f"append: {WEEK} readings in {elapsed:.2f} s ({WEEK / elapsed:,.0f}/s)")
+        series.flush()
+
+        end = times[-1]
+        for label, span in (("1 h", 3600), ("24 h", 86400), ("7 d", WEEK)):
+            samples = [timed(series.window, end - span, end, width) for _ in range(50)]
+            points = len(samples[-1][1][0])
+            print(f"live {label:<5} window: median {statistics.median(s[0] for s in samples):.3f} ms, "
+                  f"{points} points drawn")
+
+        steps = [timed(series.window, end - 86400 - back, end - back, width)[0]
+                 for back in np.linspace(0, WEEK - 86400, 500)]
+        print(f"scroll 24 h over a week: median {statistics.median(steps):.3f} ms, "
+              f"max {max(steps):.3f} ms per redraw ({len(steps)} steps)")
+
+        reopen_ms, reopened = timed(SensorSeries, tmp, "temp")
+        print(f"reopen persisted history: {reopen_ms:.2f} ms, {reopened.levels[0][2].total} raw rows")
+
+
+if __name__ == "__main__":
+    main()
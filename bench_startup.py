@@ -0,0 +1,73 @@
+"""Regression benchmark for voice control time-to-first-listen.
+
+Starts VoiceControlForHome.py repeatedly against a silent WAV file (so no
+microphone is needed) and reports wall-clock and self-reported time until
+the background listener is running, with and without --fast-start.
+
+Run with: python bench_startup.py [runs]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "VoiceControlForHome.py")
+MARK = re.compile(r"time-to-first-listen: ([\d.]+) ms")
+
+
+def silent_wav(path, seconds=2, sample_rate=16000):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\0\0" * int(seconds * sample_rate))
+
+
+def run_once(wav_path, extra_args):
+    command = [sys.executable, SCRIPT, "--audio-file", wav_path, "--profile-startup",
+               "--exit-after-startup", "--broker", "127.0.0.1"] + extra_args
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               universal_newlines=True, encoding="utf-8",
+                               env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    wall = None
+    reported = None
+    output = []
+    for line in process.stdout:
+        output.append(line)
+        found = MARK.search(line)
+        if found:
+            wall = time.perf_counter() - started
+            reported = float(found.group(1)) / 1000
+    process.wait()
+    if wall is None:
+        raise RuntimeError("Voice control did not reach first listen:\n" + "".join(output[-20:]))
+    return wall, reported, "".join(output)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, "silence.wav")
+        silent_wav(wav_path)
+        for label, extra in (("default", []), ("fast-start", ["--fast-start"])):
+            walls, reported = [], []
+            profile = ""
+            for _ in range(runs):
+                wall, inside, output = run_once(wav_path, extra)
+                walls.append(wall)
+                reported.append(inside)
+                profile = output
+            print(f"{label:<11} time-to-first-listen: wall median {statistics.median(walls) * 1000:.0f} ms, "
+                  f"in-process median {statistics.median(reported) * 1000:.0f} ms over {runs} runs")
+            for line in profile.splitlines():
+                if line.startswith(("  phase", "  import", "  time-to")):
+                    print(f"    {line.strip()}")
+
+
+if __name__ == "__main__":
+    main()
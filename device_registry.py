@@ -0,0 +1,209 @@
+import json
+import os
+
+DEFAULT_CONFIG = "devices.json"
+
+
+class TopicTrie:
+    """MQTT topic filter trie supporting the + and # wildcards."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, topic_filter, value):
+        """Store value under a topic filter such as /+/temp or /home/#."""
+        node = self.root
+        for level in topic_filter.split("/"):
+            node = node.setdefault(level, {})
+        node.setdefault(None, []).append(value)
+
+    def match(self, topic):
+        """Return every value whose filter matches the concrete topic."""
+        levels = topic.split("/")
+        found = []
+        self._walk(self.root, levels, 0, found, topic.startswith("$"))
+        return found
+
+    def _walk(self, node, levels, index, found, system_topic):
+        # Wildcards never match the first level of $SYS-style topics
+        wildcards_ok = not (system_topic and index == 0)
+        if wildcards_ok and "#" in node:
+            found.extend(node["#"].get(None, []))
+        if index == len(levels):
+            found.extend(node.get(None, []))
+            return
+        level = levels[index]
+        if level in node:
+            self._walk(node[level], levels, index + 1, found, system_topic)
+        if wildcards_ok and "+" in node:
+            self._walk(node["+"], levels, index + 1, found, system_topic)
+
+
+class Device:
+    """A concrete device bound to one MQTT topic."""
+
+    def __init__(self, device_id, device_type, name, topic, options=None):
+        self.id = device_id
+        self.type = device_type
+        self.name = name
+        self.topic = topic
+        self.options = options or {}
+
+    def __repr__(self):
+        return f"Device({self.id!r}, {self.type!r}, {self.topic!r})"
+
+
+class DeviceRegistry:
+    """Maps topic patterns from the device config to devices and type handlers."""
+
+    def __init__(self, config):
+        self.broker = config.get("broker", {})
+        self.devices = {}
+        self.handlers = {}
+        self.scenes = {entry["id"]: entry for entry in config.get("scenes", [])}
+        self.on_new_device = None
+        self._patterns = []
+        self._trie = TopicTrie()
+        self._by_topic = {}
+        self._resolved = {}  # dispatch cache: concrete topic -> Device or None
+        self._subscriptions = config.get("subscriptions")
+
+        for entry in config.get("devices", []):
+            self._patterns.append(entry)
+            self._trie.insert(entry["topic"], entry)
+            if not _has_wildcard(entry["topic"]):
+                self._add_device(entry, entry["topic"])
+
+    @classmethod
+    def load(cls, path=DEFAULT_CONFIG):
+        """Build a registry from a JSON device config file."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def register_handler(self, device_type, handler):
+        """Call handler(device, payload) for messages on devices of this type."""
+        self.handlers[device_type] = handler
+
+    def subscriptions(self, qos=0):
+        """Topic filters to subscribe to, as (filter, qos) pairs."""
+        filters = self._subscriptions or [entry["topic"] for entry in self._patterns]
+        return [(topic_filter, qos) for topic_filter in dict.fromkeys(filters)]
+
+    def by_type(self, device_type):
+        """All known devices of a given type, in registration order."""
+        return [d for d in self.devices.values() if d.type == device_type]
+
+    def room_device(self, device_type, room):
+        """The device of a type in a room, from a pattern like /rooms/+/led; None if there is none."""
+        for entry in self._patterns:
+            if entry["type"] == device_type and entry["topic"].count("+") == 1 and "#" not in entry["topic"]:
+                return self.resolve(entry["topic"].replace("+", room))
+        return None
+
+    def scene_states(self, scene_id):
+        """[(device, payload), ...] for a scene; states are keyed by device id or topic.
+
+        KeyError if the scene or one of its devices is unknown.
+        """
+        states = []
+        for key, payload in self.scenes[scene_id]["states"].items():
+            device = self.resolve(key) if key.startswith("/") else self.devices.get(key)
+            if device is None:
+                raise KeyError(f"Scene {scene_id!r} names an unknown device: {key}")
+            states.append((device, str(payload)))
+        return states
+
+    def identify(self, topic):
+        """(device id, type) for a topic without creating the device; None if nothing matches.
+
+        Unlike resolve() this never changes the registry, so any thread may call it.
+        """
+        device = self._by_topic.get(topic)
+        if device is not None:
+            return device.id, device.type
+        matches = self._trie.match(topic)
+        if not matches:
+            return None
+        entry = _best_entry(matches, topic)
+        return _device_id(entry, _wildcard_values(entry["topic"], topic)), entry["type"]
+
+    def resolve(self, topic):
+        """Return the device for a topic, creating it if a wildcard pattern matches."""
+        try:
+            return self._resolved[topic]
+        except KeyError:
+            pass
+
+        device = None
+        matches = self._trie.match(topic)
+        if matches:
+            entry = _best_entry(matches, topic)
+            device = self._add_device(entry, topic)
+            if _has_wildcard(entry["topic"]) and self.on_new_device:
+                self.on_new_device(device)
+        if len(self._resolved) > 10000:
+            self._resolved.clear()
+        self._resolved[topic] = device
+        return device
+
+    def dispatch(self, topic, payload):
+        """Route a message to its device type handler; returns the device or None."""
+        device = self.resolve(topic)
+        if device is None:
+            return None
+        handler = self.handlers.get(device.type)
+        if handler:
+            handler(device, payload)
+        return device
+
+    def _add_device(self, entry, topic):
+        if topic in self._by_topic:
+            return self._by_topic[topic]
+
+        wildcard_values = _wildcard_values(entry["topic"], topic)
+        device_id = _device_id(entry, wildcard_values)
+        name = entry.get("name", entry["type"].title())
+        if wildcard_values:
+            name = f"{name} ({' '.join(wildcard_values)})"
+
+        options = {k: v for k, v in entry.items() if k not in ("id", "type", "name", "topic")}
+        device = Device(device_id, entry["type"], name, topic, options)
+        self.devices[device_id] = device
+        self._by_topic[topic] = device
+        return device
+
+
+def _best_entry(matches, topic):
+    # Prefer an exact entry over a wildcard one
+    return next((m for m in matches if m["topic"] == topic), matches[0])
+
+
+def _device_id(entry, wildcard_values):
+    device_id = entry.get("id", entry["type"])
+    return f"{device_id}:{'/'.join(wildcard_values)}" if wildcard_values else device_id
+
+
+def _has_wildcard(topic_filter):
+    return "+" in topic_filter or "#" in topic_filter
+
+
+def _wildcard_values(topic_filter, topic):
+    """Topic levels captured by + and # in the filter."""
+    values = []
+    levels = topic.split("/")
+    for i, level in enumerate(topic_filter.split("/")):
+        if level == "+":
+            values.append(levels[i])
+        elif level == "#":
+            values.extend(levels[i:])
+            break
+    return values
+
+
+def load_registry(path=None):
+    """Load the device registry, falling back to the config next to this module."""
+    if path is None:
+        path = DEFAULT_CONFIG
+        if not os.path.exists(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_CONFIG)
+    return DeviceRegistry.load(path)
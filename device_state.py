@@ -0,0 +1,80 @@
+import threading
+import time
+
+DEFAULT_MAX_AGE = 300  # Seconds before a reading counts as stale
+
+
+class DeviceState:
+    """Last-known payload of one topic and when it arrived."""
+
+    def __init__(self, topic, value, timestamp):
+        self.topic = topic
+        self.value = value
+        self.timestamp = timestamp
+
+    def age(self, now=None):
+        """Seconds since the value was received."""
+        return (now or time.time()) - self.timestamp
+
+    def __repr__(self):
+        return f"DeviceState({self.topic!r}, {self.value!r}, age={self.age():.1f}s)"
+
+
+class DeviceStateCache:
+    """Last value, timestamp and staleness for every device in the registry.
+
+    update() is cheap and safe to call from the MQTT network thread; it
+    only records the payload by topic. Queries map topics to devices through
+    the registry, so they should run on the thread that owns it (the Tk
+    thread in the dashboard). A device's "max_age" option in devices.json
+    overrides the default staleness limit.
+    """
+
+    def __init__(self, registry, max_age=DEFAULT_MAX_AGE):
+        self.registry = registry
+        self.max_age = max_age
+        self._states = {}  # topic -> DeviceState
+        self._lock = threading.Lock()
+
+    def update(self, topic, value, timestamp=None):
+        """Record a received payload; returns its DeviceState."""
+        state = DeviceState(topic, value, timestamp or time.time())
+        with self._lock:
+            self._states[topic] = state
+        return state
+
+    def get(self, topic):
+        """DeviceState for a topic, or None if nothing has arrived yet."""
+        with self._lock:
+            return self._states.get(topic)
+
+    def value(self, topic, default=None):
+        state = self.get(topic)
+        return state.value if state else default
+
+    def is_stale(self, state, now=None):
+        """True if the reading is older than its device's max_age (or missing)."""
+        if state is None:
+            return True
+        device = self.registry.resolve(state.topic)
+        max_age = device.options.get("max_age", self.max_age) if device else self.max_age
+        return state.age(now) > max_age
+
+    def latest(self, device_type):
+        """Most recent (device, state) of a device type, or (None, None)."""
+        with self._lock:
+            states = list(self._states.values())
+        best = (None, None)
+        for state in states:
+            device = self.registry.resolve(state.topic)
+            if device is not None and device.type == device_type:
+                if best[1] is None or state.timestamp > best[1].timestamp:
+                    best = (device, state)
+        return best
+
+    def snapshot(self):
+        """{topic: (value, age seconds, stale)} for every topic seen so far."""
+        now = time.time()
+        with self._lock:
+            states = list(self._states.values())
+        return {s.topic: (s.value, s.age(now), self.is_stale(s, now)) for s in states}
@@ -0,0 +1,286 @@
+"""Headless smart-home core: device state, message handling and commands, without Tk.
+
+A HomeController owns one home's registry, state cache and command
+publisher. A HomeHub routes one pooled MqttSession to any number of
+homes by topic prefix. The dashboard runs a hub with a single home and
+renders from it; home_daemon.py runs many homes in one process.
+"""
+import time
+
+from paho.mqtt.subscribeoptions import SubscribeOptions
+
+from device_registry import DeviceRegistry
+from device_state import DeviceStateCache
+from mqtt_publisher import CoalescingPublisher
+from sensor_codec import SENSOR_TYPES, advertise, decode_batch, format_value, is_batch, message_content_type
+
+SUBSCRIBE_CHUNK = 100  # Topic filters per SUBSCRIBE packet
+
+
+def home_registry(config, prefix=""):
+    """DeviceRegistry for one home, with every device topic moved under prefix."""
+    config = dict(config)
+    config["devices"] = [dict(entry, topic=prefix + entry["topic"]) for entry in config.get("devices", [])]
+    if config.get("subscriptions"):
+        config["subscriptions"] = [prefix + topic_filter for topic_filter in config["subscriptions"]]
+    if config.get("scenes"):
+        # Scene states keyed by topic move too; ones keyed by device id already follow the device
+        config["scenes"] = [dict(scene, states={(prefix + key if key.startswith("/") else key): payload
+                                                for key, payload in scene["states"].items()})
+                            for scene in config["scenes"]]
+    return DeviceRegistry(config)
+
+
+class HomeController:
+    """Device state and commands for one home.
+
+    Messages are handled in two steps. receive() runs on the MQTT network
+    thread: it decodes text or batched payloads, drops retained values that
+    are already known, updates the state cache and records every sensor
+    reading, then hands the message to on_receive(topic, payload, received,
+    older_readings). apply() runs on the thread that owns the registry: it
+    resolves the device and calls the registry's type handlers (the
+    dashboard's widgets). By default on_receive calls apply() straight
+    away, which is what a headless process wants; the dashboard posts it to
+    the Tk loop, where only the newest message per topic is rendered.
+
+    Commands are published at QoS 1, not retained, and applied locally at
+    once, since subscriptions are no-local and the broker never echoes
+    them. A retained command would be replayed to every device and reader
+    that subscribes later, long after it was given; only state the hub
+    owns (status and availability) is retained.
+    A scene goes out as one publish batch whose acks are tracked together.
+    """
+
+    def __init__(self, registry, session, home_id="home", prefix="", history=None, publisher=None, fan_rate=10):
+        self.id = home_id
+        self.prefix = prefix
+        self.registry = registry
+        self.session = session
+        self.history = history  # Optional SensorHistory
+        self.device_state = DeviceStateCache(registry)
+        # Homes in one process share a publisher (and its thread) when one is passed in
+        self._owns_publisher = publisher is None
+        self.publisher = publisher or CoalescingPublisher(session, max_rate=fan_rate, qos=1)
+        self.on_receive = lambda topic, payload, received, older: self.apply(topic, payload, older)
+        self.received_count = 0
+        self.duplicate_count = 0  # Retained values we already had
+        self.error_count = 0
+
+    # ---------- incoming ----------
+    def receive(self, topic, raw, retain=False, content_type=None, received=None):
+        """Decode and cache one message; safe on the network thread."""
+        received = received or time.perf_counter()
+        self.received_count += 1
+        timestamp = None
+        older = ()
+        try:
+            if is_batch(raw, content_type):
+                readings = decode_batch(raw)
+                older = readings[:-1]
+                timestamp, value = readings[-1]
+                payload = format_value(value)
+            else:
+                payload = raw.decode() if isinstance(raw, bytes) else raw  # Plain text from legacy devices
+        except ValueError as e:
+            self.error_count += 1
+            print(f"Bad payload on {topic}: {e}")
+            return
+        if retain and self.device_state.value(topic) == payload:
+            self.duplicate_count += 1
+            return  # Retained snapshot of a value we already have, e.g. after a reconnect
+        state = self.device_state.update(topic, payload, timestamp)
+        if self.history is not None:
+            self._record(topic, payload, older, state.timestamp)
+        self.on_receive(topic, payload, received, older)
+
+    def apply(self, topic, payload, older=()):
+        """Route a cached message to its device; returns the device or None."""
+        device = self.registry.resolve(topic)
+        if device is None:
+            return None
+        if device.type == "fan":
+            self.publisher.observe(topic, payload)  # Identical fan publishes are skipped
+        self.registry.dispatch(topic, payload)
+        return device
+
+    def _record(self, topic, payload, older, timestamp):
+        # identify(), not resolve(): new devices are created on the registry's own thread
+        found = self.registry.identify(topic)
+        if found is None or found[1] not in SENSOR_TYPES:
+            return
+        device_id = found[0]
+        for reading_time, value in older:
+            self.history.record(device_id, value, reading_time)
+        try:
+            value = float(payload)
+        except ValueError:
+            return
+        self.history.record(device_id, value, timestamp)
+
+    # ---------- commands ----------
+    def command(self, device, payload):
+        """Publish a device command and apply it locally."""
+        payload = str(payload)
+        self.session.publish(device.topic, payload, qos=1)
+        self.device_state.update(device.topic, payload)
+        self.apply(device.topic, payload)
+
+    def toggle_led(self, device):
+        """Flip an LED; returns the new state."""
+        state = "OFF" if self.device_state.value(device.topic, "OFF") == "ON" else "ON"
+        self.command(device, state)
+        return state
+
+    def set_fan_speed(self, device, value, immediate=False):
+        """Rate-limited fan speed; immediate sends it now. ValueError if out of range."""
+        max_speed = device.options.get("max", 255)
+        if not 0 <= value <= max_speed:
+            raise ValueError(f"Fan speed must be between 0-{max_speed}")
+        self.publisher.publish(device.topic, str(value))
+        if immediate:
+            self.publisher.flush(device.topic)
+        self.device_state.update(device.topic, str(value))
+
+    # ---------- scenes ----------
+    def apply_scene(self, scene_id, on_complete=None):
+        """Publish every state of a scene back to back and apply them locally.
+
+        Returns the PublishBatch; on_complete(batch) runs once the broker has
+        acknowledged them all. KeyError for an unknown scene or device.
+        """
+        states = self.registry.scene_states(scene_id)
+        for device, payload in states:
+            self.publisher.discard(device.topic)  # An unsent slider value must not land after the scene
+        batch = self.session.publish_batch([(device.topic, payload) for device, payload in states],
+                                           qos=1, name=scene_id, on_complete=on_complete)
+        for device, payload in states:
+            self.device_state.update(device.topic, payload)
+            self.apply(device.topic, payload)
+        return batch
+
+    # ---------- connection ----------
+    def subscriptions(self):
+        """No-local subscriptions for this home's topic filters."""
+        return [(topic_filter, SubscribeOptions(qos=qos, noLocal=True))
+                for topic_filter, qos in self.registry.subscriptions()]
+
+    def availability_topics(self):
+        """<topic>/availability for every device with the "availability" option."""
+        return [f"{d.topic}/availability" for d in self.registry.devices.values() if d.options.get("availability")]
+
+    def stop(self):
+        if self._owns_publisher:
+            self.publisher.stop()
+        if self.history is not None:
+            self.history.flush()
+
+    def stats(self):
+        return {
+            "devices": len(self.registry.devices),
+            "received": self.received_count,
+            "duplicates": self.duplicate_count,
+            "errors": self.error_count,
+            "out_of_order": self.history.out_of_order() if self.history is not None else 0,
+        }
+
+
+class HomeHub:
+    """Many homes over one MqttSession, routed by topic prefix.
+
+    Set on_connect / on_disconnect for connection status; they are called
+    with the session's paho arguments after the hub has subscribed.
+    subscriptions overrides the per-home topic filters, e.g. ["/homes/#"]
+    when thousands of homes share one topic layout.
+
+    status_topic, when given, reads "online" (retained) while the hub is
+    connected and "offline" after it stops or drops off (the session's
+    will). Devices with the "availability" option get the same on
+    <topic>/availability, without a will of their own.
+    """
+
+    def __init__(self, session, reader_id="controller", subscriptions=None, metrics=None, status_topic=None):
+        self.session = session
+        self.reader_id = reader_id
+        self.status_topic = status_topic
+        self.metrics = metrics  # Optional MqttMetrics, told the handling time of every message
+        self.homes = {}  # prefix -> HomeController
+        self.on_connect = None
+        self.on_disconnect = None
+        self.unrouted_count = 0
+        self._subscriptions = subscriptions
+        self._depths = []  # Distinct prefix depths, in topic levels
+
+    def add_home(self, controller):
+        self.homes[controller.prefix] = controller
+        self._depths = sorted({len(prefix.split("/")) for prefix in self.homes if prefix}, reverse=True)
+        return controller
+
+    def home_for(self, topic):
+        """The home whose prefix the topic is under, or None."""
+        if self._depths:
+            levels = topic.split("/")
+            for depth in self._depths:
+                home = self.homes.get("/".join(levels[:depth]))
+                if home is not None:
+                    return home
+        return self.homes.get("")
+
+    def start(self):
+        """Connect the session, announcing the hub and its devices as available."""
+        if self.status_topic:
+            self.session.set_will(self.status_topic, "offline", qos=1, retain=True)
+            self.session.add_availability(self.status_topic)
+        for home in self.homes.values():
+            for topic in home.availability_topics():
+                self.session.add_availability(topic)
+        self.session.on_connect = self._on_connect
+        self.session.on_disconnect = self._on_disconnect
+        if self.session.on_message is None:  # Callers that log raw traffic forward to on_message()
+            self.session.on_message = self.on_message
+        self.session.start()  # Connects and reconnects in the background
+
+    def stop(self):
+        for home in self.homes.values():
+            home.stop()
+        self.session.stop()
+
+    def on_message(self, client, userdata, msg):
+        """paho on_message: hand the message to its home."""
+        started = time.perf_counter()
+        home = self.home_for(msg.topic)
+        if home is None:
+            self.unrouted_count += 1
+            return
+        home.receive(msg.topic, msg.payload, msg.retain, message_content_type(msg), started)
+        if self.metrics:
+            self.metrics.handled(msg.topic, time.perf_counter() - started)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code == 0:
+            if self._subscriptions:
+                filters = [(f, SubscribeOptions(qos=1, noLocal=True)) for f in self._subscriptions]
+            else:
+                filters = [s for home in self.homes.values() for s in home.subscriptions()]
+            for i in range(0, len(filters), SUBSCRIBE_CHUNK):
+                client.subscribe(filters[i:i + SUBSCRIBE_CHUNK])
+            advertise(self.session, self.reader_id)  # Sensors may send batched frames
+        if self.on_connect:
+            self.on_connect(client, userdata, flags, reason_code, properties)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None):
+        if self.on_disconnect:
+            self.on_disconnect(client, userdata, flags, reason_code, properties)
+
+    def stats(self):
+        homes = [home.stats() for home in self.homes.values()]
+        return {
+            "homes": len(homes),
+            "devices": sum(h["devices"] for h in homes),
+            "received": sum(h["received"] for h in homes),
+            "duplicates": sum(h["duplicates"] for h in homes),
+            "errors": sum(h["errors"] for h in homes),
+            "out_of_order": sum(h["out_of_order"] for h in homes),
+            "unrouted": self.unrouted_count,
+            "session": self.session.stats(),
+        }
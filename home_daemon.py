@@ -0,0 +1,195 @@
+"""Run many homes from one process over one pooled MQTT connection.
+
+Every home is the shared device layout (devices.json, or a home's own
+"devices" list) under its own topic prefix. homes.json:
+
+    {"broker": {"host": "broker.emqx.io", "port": 1883},
+     "devices": "devices.json",
+     "subscriptions": ["/homes/#"],
+     "homes": [{"id": "flat-1", "prefix": "/homes/flat-1"}, ...]}
+
+Commands arrive as JSON lines on --control-port (voice_events.EventEmitter
+can send them), e.g. {"event": "command", "home": "flat-1",
+"device": "led", "action": "toggle"}, "action": "set", "value": 120, or
+{"event": "command", "home": "flat-1", "action": "scene", "scene": "all_off"}.
+
+Usage:
+    python home_daemon.py [--homes homes.json] [--status-file status.json]
+    python home_daemon.py --synthetic 1000 --local-broker
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from home_controller import HomeController, HomeHub, home_registry
+from local_broker import LocalBroker
+from mqtt_metrics import MqttMetrics
+from mqtt_publisher import CoalescingPublisher
+from mqtt_session import MqttSession
+from sensor_series import SensorHistory
+from voice_events import EventServer
+
+STATUS_TOPIC = "/controller/status"
+FAN_PUBLISH_RATE = 10
+DEVICES_CONFIG = "devices.json"
+
+
+def load_homes(path):
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    devices = config.get("devices", DEVICES_CONFIG)
+    if isinstance(devices, str):
+        with open(os.path.join(os.path.dirname(os.path.abspath(path)), devices), encoding="utf-8") as f:
+            device_config = json.load(f)
+        config["devices"] = device_config["devices"]
+        config.setdefault("scenes", device_config.get("scenes", []))
+    return config
+
+
+def synthetic_homes(count, path=DEVICES_CONFIG):
+    """count homes with the devices.json layout under /homes/home<n>."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return {
+        "broker": config.get("broker", {}),
+        "devices": config["devices"],
+        "scenes": config.get("scenes", []),
+        "subscriptions": ["/homes/#"],
+        "homes": [{"id": f"home{i}", "prefix": f"/homes/home{i}"} for i in range(count)],
+    }
+
+
+class HomeDaemon:
+    """A HomeHub with one HomeController per configured home, sharing one publisher.
+
+    Messages (network thread) and commands (control socket threads) both
+    reach the registries, so apply() and commands run under one lock.
+    """
+
+    def __init__(self, config, session, history_dir=None, metrics=None):
+        self.session = session
+        self.hub = HomeHub(session, reader_id="daemon", subscriptions=config.get("subscriptions"), metrics=metrics,
+                           status_topic=STATUS_TOPIC)
+        self.publisher = CoalescingPublisher(session, max_rate=FAN_PUBLISH_RATE, qos=1)
+        self.homes = {}  # home id -> HomeController
+        self._lock = threading.Lock()
+        for home in config["homes"]:
+            registry = home_registry({"devices": home.get("devices", config["devices"]),
+                                      "scenes": home.get("scenes", config.get("scenes", []))}, home["prefix"])
+            history = SensorHistory(os.path.join(history_dir, home["id"])) if history_dir else None
+            controller = HomeController(registry, session, home["id"], home["prefix"], history, self.publisher)
+            controller.on_receive = self._locked_apply(controller)
+            self.homes[home["id"]] = self.hub.add_home(controller)
+
+    def _locked_apply(self, controller):
+        def on_receive(topic, payload, received, older):
+            with self._lock:
+                controller.apply(topic, payload, older)
+        return on_receive
+
+    def start(self):
+        self.hub.start()
+
+    def stop(self):
+        self.publisher.stop()
+        self.hub.stop()  # Publishes "offline" on STATUS_TOPIC and every availability topic
+
+    def _scene_applied(self, batch):
+        failed = f", {len(batch.failed)} failed" if batch.failed else ""
+        print(f"Scene {batch.name}: {len(batch.topics)} device(s) acknowledged in {batch.elapsed * 1000:.0f} ms{failed}")
+
+    def on_event(self, event):
+        """EventServer callback: apply one command event."""
+        if event.get("event") != "command":
+            return
+        home = self.homes.get(event.get("home"))
+        if home is not None and event.get("action") == "scene":
+            try:
+                with self._lock:
+                    home.apply_scene(event["scene"], on_complete=self._scene_applied)
+            except KeyError as e:
+                print(f"Bad scene command {event}: {e}")
+            return
+        device = home.registry.devices.get(event.get("device")) if home else None
+        if device is None:
+            print(f"Unknown home/device in command: {event}")
+            return
+        try:
+            with self._lock:
+                if event.get("action") == "toggle":
+                    home.toggle_led(device)
+                elif event.get("action") == "set":
+                    home.set_fan_speed(device, int(event["value"]), immediate=True)
+                else:
+                    home.command(device, event["value"])
+        except (KeyError, ValueError) as e:
+            print(f"Bad command {event}: {e}")
+
+
+def write_status(daemon, path, rate):
+    """Hub and per-home counters as JSON, replaced atomically."""
+    status = daemon.hub.stats()
+    status["time"] = time.time()
+    status["message_rate"] = rate
+    status["per_home"] = {home_id: home.stats() for home_id, home in daemon.homes.items()}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=1)
+    os.replace(temp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-home smart home controller")
+    parser.add_argument("--homes", default="homes.json", help="homes config (see module docstring)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="ignore --homes and run N generated homes")
+    parser.add_argument("--broker", help="MQTT broker host (default: homes config)")
+    parser.add_argument("--port", type=int, help="MQTT broker port (default: homes config)")
+    parser.add_argument("--local-broker", action="store_true", help="start an in-process broker and use it")
+    parser.add_argument("--history", metavar="DIR", help="keep sensor history per home under DIR")
+    parser.add_argument("--control-port", type=int, default=0, help="port for JSON-lines commands (0 = any)")
+    parser.add_argument("--status-file", metavar="PATH", help="write hub status (JSON) here every interval")
+    parser.add_argument("--metrics-file", metavar="PATH", help="write MQTT metrics (JSON) here every interval")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between status lines/files")
+    args = parser.parse_args()
+
+    config = synthetic_homes(args.synthetic) if args.synthetic else load_homes(args.homes)
+    broker = LocalBroker().start() if args.local_broker else None
+    host = broker.host if broker else args.broker or config.get("broker", {}).get("host", "broker.emqx.io")
+    port = broker.port if broker else args.port or config.get("broker", {}).get("port", 1883)
+
+    metrics = MqttMetrics()
+    session = MqttSession(host, port, client_id=f"home-daemon-{os.getpid()}", metrics=metrics, topic_aliases=True)
+    daemon = HomeDaemon(config, session, args.history, metrics)
+    daemon.start()
+    control = EventServer(daemon.on_event, port=args.control_port)
+    if args.metrics_file:
+        metrics.start_export(args.metrics_file, args.interval)
+
+    print(f"Managing {len(daemon.homes)} home(s) on {host}:{port}; "
+          f"commands on {control.address}")
+    last_received, last_time = 0, time.time()
+    try:
+        while True:
+            time.sleep(args.interval)
+            stats = daemon.hub.stats()
+            now = time.time()
+            rate = (stats["received"] - last_received) / (now - last_time)
+            last_received, last_time = stats["received"], now
+            print(f"{stats['devices']} devices, {rate:,.0f} msg/s, {stats['received']} received, "
+                  f"{stats['unrouted']} unrouted, connected={stats['session']['connected']}")
+            if args.status_file:
+                write_status(daemon, args.status_file, rate)
+    except KeyboardInterrupt:
+        pass
+    control.close()
+    daemon.stop()
+    metrics.stop_export(args.metrics_file)
+    print(session.report())
+    if broker:
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+import socket
+import struct
+import threading
+from functools import lru_cache
+
+# MQTT v5 property id -> value type, enough to skip or read any property
+_PROPERTY_TYPES = {
+    0x01: "byte", 0x02: "int4", 0x03: "str", 0x08: "str", 0x09: "bin", 0x0B: "varint",
+    0x11: "int4", 0x12: "str", 0x13: "int2", 0x15: "str", 0x16: "bin", 0x17: "byte",
+    0x18: "int4", 0x19: "byte", 0x1A: "str", 0x1C: "str", 0x1F: "str", 0x21: "int2",
+    0x22: "int2", 0x23: "int2", 0x24: "byte", 0x25: "byte", 0x26: "pair", 0x27: "int4",
+    0x28: "byte", 0x29: "byte", 0x2A: "byte",
+}
+SUBSCRIPTION_IDENTIFIER = 0x0B
+WILL_DELAY_INTERVAL = 0x18
+TOPIC_ALIAS = 0x23
+TOPIC_ALIAS_MAXIMUM = 0x22
+BROKER_ALIAS_MAXIMUM = 64
+
+
+class LocalBroker:
+    """Small in-process MQTT broker for benchmarks, replay and offline runs.
+
+    Speaks MQTT 3.1.1 and 5 over TCP on localhost: QoS 0/1 (QoS 2 is
+    acknowledged and delivered as QoS 1), retained messages, last wills,
+    v5 no-local subscriptions and client-to-broker topic aliases. v5
+    message properties (content type, user properties, ...) are passed on
+    to v5 subscribers. It keeps no sessions across connections and is not
+    meant for production use.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.received_count = 0
+        self.delivered_count = 0
+        self.retained = {}  # topic -> (payload, qos, encoded v5 properties)
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """Listen and accept clients on a background thread; returns self."""
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(16)
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, name="LocalBroker", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Close the listener and every client connection."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        self.drop_connections()
+
+    def drop_connections(self):
+        """Cut every client off without a DISCONNECT, as a network outage would (wills fire)."""
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+
+    @property
+    def client_count(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """Publish from the broker itself, as if a client had sent it."""
+        self._route(None, topic, _to_bytes(payload), qos, retain)
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except (OSError, AttributeError):
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=_Session(self, sock).run, daemon=True).start()
+
+    def _route(self, sender, topic, payload, qos, retain, properties=b""):
+        with self._lock:
+            self.received_count += 1
+            if retain:
+                if payload:
+                    self.retained[topic] = (payload, qos, properties)
+                else:
+                    self.retained.pop(topic, None)
+            sessions = list(self._sessions)
+        for session in sessions:
+            granted = session.match(topic, sender)
+            if granted is not None:
+                if session.send_publish(topic, payload, min(qos, granted, 1), False, properties):
+                    self.delivered_count += 1
+
+
+class _Session:
+    """One connected client."""
+
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.client_id = ""
+        self.version = 4
+        self.subscriptions = {}  # filter -> (qos, no_local)
+        self.will = None
+        self._aliases = {}  # topic alias -> topic, set by this client's publishes
+        self._send_lock = threading.Lock()
+        self._packet_id = 0
+        self._closed = False
+
+    # ---------- connection ----------
+    def run(self):
+        reader = self.sock.makefile("rb")
+        try:
+            while True:
+                header = reader.read(1)
+                if not header:
+                    break
+                body = reader.read(_read_varint(reader))
+                if not self._handle(header[0] >> 4, header[0] & 0x0F, body):
+                    self.will = None  # DISCONNECT: no will
+                    break
+        except (OSError, ValueError, IndexError, struct.error):
+            pass
+        finally:
+            self.close()
+            with self.broker._lock:
+                self.broker._sessions.discard(self)
+            if self.will is not None:
+                self.broker._route(None, *self.will)
+
+    def close(self):
+        self._closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def match(self, topic, sender):
+        """Highest granted QoS over this client's matching subscriptions, or None."""
+        best = None
+        for topic_filter, (qos, no_local) in list(self.subscriptions.items()):
+            if no_local and sender is self:
+                continue
+            if topic_matches(topic_filter, topic):
+                best = qos if best is None else max(best, qos)
+        return best
+
+    # ---------- packets ----------
+    def _handle(self, kind, flags, body):
+        if kind == 1:
+            self._on_connect(body)
+        elif kind == 3:
+            self._on_publish(flags, body)
+        elif kind == 6:  # PUBREL for an inbound QoS 2 message
+            self._send(0x70, body[:2] + (b"\x00\x00" if self.version == 5 else b""))
+        elif kind == 8:
+            self._on_subscribe(body)
+        elif kind == 10:
+            self._on_unsubscribe(body)
+        elif kind == 12:
+            self._send(0xD0, b"")
+        elif kind == 14:
+            return False
+        return True  # PUBACK/PUBREC/PUBCOMP from the client need nothing
+
+    def _on_connect(self, body):
+        pos = 2 + struct.unpack_from("!H", body)[0]  # Protocol name
+        self.version = body[pos]
+        flags = body[pos + 1]
+        pos += 4  # Level, flags, keep alive
+        if self.version == 5:
+            _, pos = _read_properties(body, pos)
+        self.client_id, pos = _read_str(body, pos)
+        if flags & 0x04:
+            will_properties = b""
+            if self.version == 5:
+                will_properties, pos = _forwarded_properties(body, pos)
+            will_topic, pos = _read_str(body, pos)
+            will_payload, pos = _read_bin(body, pos)
+            self.will = (will_topic, will_payload, (flags >> 3) & 0x03, bool(flags & 0x20), will_properties)
+        if self.version == 5:
+            props = bytes([TOPIC_ALIAS_MAXIMUM]) + struct.pack("!H", BROKER_ALIAS_MAXIMUM)
+            self._send(0x20, b"\x00\x00" + _varint(len(props)) + props)
+        else:
+            self._send(0x20, b"\x00\x00")
+        with self.broker._lock:
+            self.broker._sessions.add(self)
+
+    def _on_publish(self, flags, body):
+        qos = (flags >> 1) & 0x03
+        topic, pos = _read_str(body, 0)
+        packet_id = None
+        if qos:
+            packet_id = body[pos:pos + 2]
+            pos += 2
+        properties = b""
+        if self.version == 5:
+            props, _ = _read_properties(body, pos)
+            alias = props.get(TOPIC_ALIAS)
+            if alias is not None:
+                if not 0 < alias <= BROKER_ALIAS_MAXIMUM or not (topic or alias in self._aliases):
+                    self._send(0xE0, b"\x94\x00")  # DISCONNECT: Topic Alias invalid
+                    raise ValueError(f"Unknown topic alias {alias} from {self.client_id!r}")
+                if topic:
+                    self._aliases[alias] = topic
+                else:
+                    topic = self._aliases[alias]
+            properties, pos = _forwarded_properties(body, pos)
+        payload = body[pos:]
+        if qos == 1:
+            self._send(0x40, packet_id)
+        elif qos == 2:
+            self._send(0x50, packet_id)
+        self.broker._route(self, topic, payload, qos, bool(flags & 0x01), properties)
+
+    def _on_subscribe(self, body):
+        packet_id = body[:2]
+        pos = 2
+        if self.version == 5:
+            _, pos = _read_properties(body, pos)
+        granted = []
+        new_filters = []
+        while pos < len(body):
+            topic_filter, pos = _read_str(body, pos)
+            options = body[pos]
+            pos += 1
+            qos = min(options & 0x03, 1)
+            is_new = topic_filter not in self.subscriptions
+            self.subscriptions[topic_filter] = (qos, bool(options & 0x04) and self.version == 5)
+            granted.append(qos)
+            retain_handling = (options >> 4) & 0x03 if self.version == 5 else 0
+            if retain_handling == 0 or (retain_handling == 1 and is_new):
+                new_filters.append((topic_filter, qos))
+        props = b"\x00" if self.version == 5 else b""
+        self._send(0x90, packet_id + props + bytes(granted))
+        with self.broker._lock:
+            retained = list(self.broker.retained.items())
+        for topic_filter, qos in new_filters:
+            for topic, (payload, retained_qos, properties) in retained:
+                if topic_matches(topic_filter, topic):
+                    self.send_publish(topic, payload, min(qos, retained_qos), True, properties)
+
+    def _on_unsubscribe(self, body):
+        packet_id = body[:2]
+        pos = 2
+        if self.version == 5:
+            _, pos = _read_properties(body, pos)
+        count = 0
+        while pos < len(body):
+            topic_filter, pos = _read_str(body, pos)
+            self.subscriptions.pop(topic_filter, None)
+            count += 1
+        extra = b"\x00" + b"\x00" * count if self.version == 5 else b""
+        self._send(0xB0, packet_id + extra)
+
+    def send_publish(self, topic, payload, qos, retain, properties=b""):
+        """Deliver a message to this client; returns False if the connection is gone.
+
+        properties is an encoded v5 property list without its length; v3 clients get none.
+        """
+        encoded = topic.encode("utf-8")
+        variable = struct.pack("!H", len(encoded)) + encoded
+        if qos:
+            with self._send_lock:
+                self._packet_id = self._packet_id % 65535 + 1
+                variable += struct.pack("!H", self._packet_id)
+        if self.version == 5:
+            variable += _varint(len(properties)) + properties
+        return self._send(0x30 | (qos << 1) | int(retain), variable + payload)
+
+    def _send(self, first_byte, body):
+        if self._closed:
+            return False
+        packet = bytes([first_byte]) + _varint(len(body)) + body
+        try:
+            with self._send_lock:
+                self.sock.sendall(packet)
+            return True
+        except OSError:
+            return False
+
+
+@lru_cache(maxsize=4096)
+def topic_matches(topic_filter, topic):
+    """True if a concrete topic matches an MQTT topic filter."""
+    if topic.startswith("$") and topic_filter[:1] in ("+", "#"):
+        return False
+    filter_levels = topic_filter.split("/")
+    levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(levels) or (level != "+" and level != levels[i]):
+            return False
+    return len(levels) == len(filter_levels)
+
+
+def _to_bytes(payload):
+    if isinstance(payload, bytes):
+        return payload
+    return str(payload).encode("utf-8")
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value % 128
+        value //= 128
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+def _read_varint(reader):
+    value, shift = 0, 0
+    while True:
+        byte = reader.read(1)
+        if not byte:
+            raise ValueError("Connection closed mid-packet")
+        value |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
+
+
+def _decode_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _read_str(data, pos):
+    raw, pos = _read_bin(data, pos)
+    return raw.decode("utf-8"), pos
+
+
+def _read_bin(data, pos):
+    length = struct.unpack_from("!H", data, pos)[0]
+    return bytes(data[pos + 2:pos + 2 + length]), pos + 2 + length
+
+
+def _read_properties(data, pos):
+    """Parse a v5 property block; returns ({id: value}, position after it)."""
+    length, pos = _decode_varint(data, pos)
+    end = pos + length
+    props = {}
+    for prop_id, value, _, _ in _iter_properties(data, pos, end):
+        props[prop_id] = value
+    return props, end
+
+
+def _forwarded_properties(data, pos):
+    """The properties a broker passes on, encoded without their length; and the position after the block.
+
+    Topic aliases belong to one connection, subscription identifiers are
+    set per subscriber and a will's delay only matters to the broker, so
+    none of them is forwarded.
+    """
+    length, pos = _decode_varint(data, pos)
+    end = pos + length
+    kept = [data[start:stop] for prop_id, _, start, stop in _iter_properties(data, pos, end)
+            if prop_id not in (TOPIC_ALIAS, SUBSCRIPTION_IDENTIFIER, WILL_DELAY_INTERVAL)]
+    return b"".join(kept), end
+
+
+def _iter_properties(data, pos, end):
+    """Yield (id, value, start, stop) for each property in data[pos:end]."""
+    while pos < end:
+        start = pos
+        prop_id, pos = _decode_varint(data, pos)
+        kind = _PROPERTY_TYPES.get(prop_id)
+        if kind == "byte":
+            value, pos = data[pos], pos + 1
+        elif kind == "int2":
+            value, pos = struct.unpack_from("!H", data, pos)[0], pos + 2
+        elif kind == "int4":
+            value, pos = struct.unpack_from("!I", data, pos)[0], pos + 4
+        elif kind == "varint":
+            value, pos = _decode_varint(data, pos)
+        elif kind == "str":
+            value, pos = _read_str(data, pos)
+        elif kind == "bin":
+            value, pos = _read_bin(data, pos)
+        elif kind == "pair":
+            key, pos = _read_str(data, pos)
+            value, pos = _read_str(data, pos)
+            value = (key, value)
+        else:
+            raise ValueError(f"Unknown MQTT property 0x{prop_id:02x}")
+        yield prop_id, value, start, pos
@@ -0,0 +1,236 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds, milliseconds
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, math.inf)
+RATE_WINDOW = 10.0  # Seconds of history behind the per-topic rates
+
+
+class Histogram:
+    """Fixed log-spaced latency buckets; percentiles are bucket upper bounds."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, point):
+        if not self.total:
+            return 0.0
+        target = self.total * point / 100
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ms,
+            "buckets": {str(bound): count for bound, count in zip(BUCKETS_MS, self.counts) if count},
+        }
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """{"p50": ..., ...} in milliseconds for samples in seconds, plus max."""
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, int(len(ordered) * point / 100)) if ordered else 0
+        result[f"p{point}"] = ordered[index] * 1000 if ordered else 0.0
+    result["max"] = ordered[-1] * 1000 if ordered else 0.0
+    return result
+
+
+class Rate:
+    """Exponentially decaying events-per-second estimate."""
+
+    def __init__(self):
+        self.value = 0.0
+        self.updated = time.monotonic()
+
+    def tick(self, now):
+        self.value = self.current(now) + 1.0 / RATE_WINDOW
+        self.updated = now
+
+    def current(self, now):
+        return self.value * math.exp(-(now - self.updated) / RATE_WINDOW)
+
+
+class TopicMetrics:
+    """Publish and receive counters for one topic."""
+
+    def __init__(self):
+        self.published = 0
+        self.acked = 0
+        self.queued = 0    # Held in the offline outbox
+        self.dropped = 0   # Refused by paho or pushed out of the outbox
+        self.retries = 0   # In flight when the connection dropped, resent on reconnect
+        self.received = 0
+        self.ack_latency = Histogram()
+        self.handler_time = Histogram()
+        self.publish_rate = Rate()
+        self.receive_rate = Rate()
+
+
+class MqttMetrics:
+    """Publish -> PUBACK latency, in-flight window, retries, rates and handler time per topic.
+
+    MqttSession reports every publish, ack, queue and drop through the
+    hooks below; the dashboard reports handler time per received message.
+    QoS 0 publishes are "acked" when paho has written them to the socket.
+    """
+
+    def __init__(self):
+        self.topics = {}
+        self.started = time.time()
+        self._in_flight = {}  # mid -> (topic, qos, sent perf_counter)
+        self._early = {}      # mid -> ack time, for acks that beat published()
+        self._lock = threading.Lock()
+        self._export_stop = None
+
+    def _topic(self, topic):
+        metrics = self.topics.get(topic)
+        if metrics is None:
+            metrics = self.topics[topic] = TopicMetrics()
+        return metrics
+
+    # ---------- hooks ----------
+    def published(self, topic, qos, mid, sent):
+        with self._lock:
+            metrics = self._topic(topic)
+            metrics.published += 1
+            metrics.publish_rate.tick(time.monotonic())
+            acked_at = self._early.pop(mid, None)
+            if acked_at is not None:
+                metrics.acked += 1
+                metrics.ack_latency.add(acked_at - sent)
+            else:
+                self._in_flight[mid] = (topic, qos, sent)
+
+    def acked(self, mid):
+        now = time.perf_counter()
+        with self._lock:
+            entry = self._in_flight.pop(mid, None)
+            if entry is None:
+                self._early[mid] = now
+                return
+            metrics = self.topics[entry[0]]
+            metrics.acked += 1
+            metrics.ack_latency.add(now - entry[2])
+
+    def queued(self, topic):
+        with self._lock:
+            self._topic(topic).queued += 1
+
+    def dropped(self, topic):
+        with self._lock:
+            self._topic(topic).dropped += 1
+
+    def connection_lost(self):
+        """QoS 0 messages in flight are gone; QoS 1+ ones will be resent."""
+        with self._lock:
+            for mid, (topic, qos, sent) in list(self._in_flight.items()):
+                if qos:
+                    self.topics[topic].retries += 1
+                else:
+                    del self._in_flight[mid]
+                    self.topics[topic].dropped += 1
+            self._early.clear()
+
+    def handled(self, topic, seconds):
+        with self._lock:
+            metrics = self._topic(topic)
+            metrics.received += 1
+            metrics.receive_rate.tick(time.monotonic())
+            metrics.handler_time.add(seconds)
+
+    # ---------- reporting ----------
+    @property
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def snapshot(self):
+        """All counters as a JSON-ready dict."""
+        now = time.monotonic()
+        with self._lock:
+            in_flight = {}
+            for topic, _, _ in self._in_flight.values():
+                in_flight[topic] = in_flight.get(topic, 0) + 1
+            topics = {
+                topic: {
+                    "published": m.published,
+                    "acked": m.acked,
+                    "in_flight": in_flight.get(topic, 0),
+                    "queued": m.queued,
+                    "dropped": m.dropped,
+                    "retries": m.retries,
+                    "received": m.received,
+                    "publish_rate": m.publish_rate.current(now),
+                    "receive_rate": m.receive_rate.current(now),
+                    "ack_latency": m.ack_latency.snapshot(),
+                    "handler_time": m.handler_time.snapshot(),
+                }
+                for topic, m in self.topics.items()
+            }
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.started,
+            "in_flight": sum(in_flight.values()),
+            "publish_rate": sum(t["publish_rate"] for t in topics.values()),
+            "receive_rate": sum(t["receive_rate"] for t in topics.values()),
+            "topics": topics,
+        }
+
+    def summary(self):
+        """One line for the status area."""
+        snapshot = self.snapshot()
+        acks = [t["ack_latency"]["p95_ms"] for t in snapshot["topics"].values() if t["ack_latency"]["count"]]
+        return (f"in-flight {snapshot['in_flight']} | ack p95 {max(acks, default=0):.0f} ms | "
+                f"out {snapshot['publish_rate']:.1f}/s in {snapshot['receive_rate']:.1f}/s")
+
+    def write_snapshot(self, path):
+        """Write snapshot() as JSON, replacing the file atomically."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(temp_path, path)
+
+    def start_export(self, path, interval=10.0):
+        """Write a snapshot to path every interval seconds until stop_export()."""
+        self._export_stop = threading.Event()
+
+        def export(stop):
+            while not stop.wait(interval):
+                try:
+                    self.write_snapshot(path)
+                except OSError as e:
+                    print(f"Metrics export to {path} failed: {e}")
+
+        threading.Thread(target=export, args=(self._export_stop,), name="MetricsExport", daemon=True).start()
+
+    def stop_export(self, path=None):
+        """Stop periodic export, writing one final snapshot if path is given."""
+        if self._export_stop is not None:
+            self._export_stop.set()
+        if path:
+            self.write_snapshot(path)
@@ -0,0 +1,113 @@
+import threading
+import time
+
+
+class CoalescingPublisher:
+    """Rate-limited MQTT publisher that only sends the newest value per topic."""
+
+    def __init__(self, client, max_rate=10.0, qos=0, retain=False):
+        """Wrap a paho client; max_rate is the per-topic limit in messages/second."""
+        self.client = client
+        self.min_interval = 1.0 / max_rate if max_rate and max_rate > 0 else 0.0
+        self.qos = qos
+        self.retain = retain
+        self.sent_count = 0
+        self.suppressed_count = 0
+        self._pending = {}       # topic -> (payload, qos, retain)
+        self._last_sent = {}     # topic -> monotonic time of the last publish
+        self._last_payload = {}  # topic -> last payload known to be on the broker
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="CoalescingPublisher", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic, payload, qos=None, retain=None):
+        """Queue a value; a newer value for the same topic replaces an unsent one."""
+        payload = str(payload)
+        qos = self.qos if qos is None else qos
+        retain = self.retain if retain is None else retain
+        with self._cond:
+            if self._last_payload.get(topic) == payload:
+                # Broker already holds this value, drop any unsent change
+                self._pending.pop(topic, None)
+                self.suppressed_count += 1
+                return
+            self.suppressed_count += topic in self._pending
+            self._pending[topic] = (payload, qos, retain)
+            self._cond.notify()
+
+    def observe(self, topic, payload):
+        """Record a value seen on the broker so identical publishes are skipped."""
+        with self._cond:
+            self._last_payload[topic] = str(payload)
+
+    def discard(self, topic):
+        """Drop an unsent value, e.g. when the topic was just published some other way."""
+        with self._cond:
+            self._pending.pop(topic, None)
+
+    def flush(self, topic=None):
+        """Send pending values now, ignoring the rate limit."""
+        with self._cond:
+            topics = [topic] if topic is not None else list(self._pending)
+            due = [(t, self._pending.pop(t)) for t in topics if t in self._pending]
+            self._mark_sent(due)
+            self._send(due)
+
+    def stats(self):
+        """Return counters for sent and suppressed messages."""
+        with self._cond:
+            return {
+                "sent": self.sent_count,
+                "suppressed": self.suppressed_count,
+                "pending": len(self._pending),
+            }
+
+    def stop(self, flush=True):
+        """Stop the worker thread, optionally sending whatever is still pending."""
+        if flush:
+            self.flush()
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1)
+
+    def _mark_sent(self, due):
+        now = time.monotonic()
+        for topic, (payload, _, _) in due:
+            self._last_sent[topic] = now
+            self._last_payload[topic] = payload
+        self.sent_count += len(due)
+
+    def _send(self, due):
+        # Called with the lock held: a value popped later must never reach the client first
+        for topic, (payload, qos, retain) in due:
+            try:
+                self.client.publish(topic, payload, qos=qos, retain=retain)
+            except Exception as e:
+                print(f"Publish error on {topic}: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+
+                now = time.monotonic()
+                due = []
+                next_wake = None
+                for topic in list(self._pending):
+                    ready_at = self._last_sent.get(topic, float("-inf")) + self.min_interval
+                    if ready_at <= now:
+                        due.append((topic, self._pending.pop(topic)))
+                    elif next_wake is None or ready_at < next_wake:
+                        next_wake = ready_at
+
+                if not due:
+                    # Trailing edge: sleep until the next topic is allowed to send
+                    self._cond.wait(next_wake - now)
+                    continue
+                self._mark_sent(due)
+                self._send(due)
@@ -0,0 +1,369 @@
+"""Record MQTT traffic to a compact binary log and replay it for load tests.
+
+Log format: a magic header, then append-only records. A topic record
+(kind 1) assigns a 16-bit id to a topic the first time it is seen; a
+message record (kind 2) is a float64 timestamp, a topic id and the
+payload. A busy sensor stream costs about 15 bytes plus payload per
+message. A log holds at most 65,536 distinct topics; messages on any
+further topic are counted but not recorded. A record cut short by a
+crash ends the log and is trimmed off when the log is opened to append.
+
+Usage:
+    python mqtt_replay.py record evening.mqlog [--broker HOST] [--port N]
+    python mqtt_replay.py synth evening.mqlog [--minutes 60] [--rate 50]
+    python mqtt_replay.py info evening.mqlog
+    python mqtt_replay.py publish evening.mqlog --broker HOST [--speed 10] [--batch 50]
+
+To load test the dashboard, run it with --replay (see GUI.py).
+"""
+import argparse
+import math
+import os
+import random
+import struct
+import threading
+import time
+
+from mqtt_metrics import percentiles
+
+MAGIC = b"MQLOG1\n"
+TOPIC_RECORD = struct.Struct("<BHH")   # kind, topic id, topic length
+MESSAGE_RECORD = struct.Struct("<BdHI")  # kind, timestamp, topic id, payload length
+MAX_TOPICS = 1 << 16  # Topic ids are 16-bit
+
+
+class MessageLog:
+    """Append-only writer for the binary message log.
+
+    Each record is flushed to the OS as it is written, so a crash loses at
+    most the record in progress; autoflush=False leaves it to close().
+    """
+
+    def __init__(self, path, autoflush=True):
+        self.path = path
+        self.autoflush = autoflush
+        self.topics = {}
+        self.count = 0
+        self.skipped_count = 0  # Messages on topics past MAX_TOPICS
+        self._lock = threading.Lock()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        end = len(MAGIC)
+        if exists:
+            for kind, topic_id, topic, _, end in _records(path):
+                if kind == 1:
+                    self.topics[topic] = topic_id
+        self._file = open(path, "r+b" if exists else "wb")
+        if exists:
+            self._file.truncate(end)  # Drop a record torn by a crash
+            self._file.seek(end)
+        else:
+            self._file.write(MAGIC)
+
+    def record(self, topic, payload, timestamp=None):
+        """Append one message; safe to call from the MQTT network thread."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self._lock:
+            if self._file.closed:
+                return  # Messages still arriving during shutdown
+            topic_id = self.topics.get(topic)
+            if topic_id is None:
+                if len(self.topics) >= MAX_TOPICS:
+                    if not self.skipped_count:
+                        print(f"{self.path}: more than {MAX_TOPICS} topics, not recording {topic} and later ones")
+                    self.skipped_count += 1
+                    return
+                topic_id = self.topics[topic] = len(self.topics)
+                encoded = topic.encode("utf-8")
+                self._file.write(TOPIC_RECORD.pack(1, topic_id, len(encoded)) + encoded)
+            self._file.write(MESSAGE_RECORD.pack(2, timestamp or time.time(), topic_id, len(payload)) + payload)
+            if self.autoflush:
+                self._file.flush()
+            self.count += 1
+
+    def on_message(self, client, userdata, msg):
+        """paho on_message callback that records everything received."""
+        self.record(msg.topic, msg.payload)
+
+    def close(self):
+        """Flush and close; later record() calls are ignored."""
+        with self._lock:
+            self._file.close()
+
+
+def read_log(path):
+    """Yield (timestamp, topic, payload bytes) for every message in a log."""
+    for kind, timestamp, topic, payload, _ in _records(path):
+        if kind == 2:
+            yield timestamp, topic, payload
+
+
+def _records(path):
+    """Yield (kind, ..., offset after the record); stops at a truncated last record."""
+    topics = {}
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an MQTT message log")
+        while True:
+            kind = f.read(1)
+            if not kind:
+                return
+            if kind[0] == 1:
+                header = kind + f.read(TOPIC_RECORD.size - 1)
+                if len(header) < TOPIC_RECORD.size:
+                    return
+                _, topic_id, length = TOPIC_RECORD.unpack(header)
+                topic = f.read(length)
+                if len(topic) < length:
+                    return
+                topics[topic_id] = topic.decode("utf-8")
+                yield 1, topic_id, topics[topic_id], None, f.tell()
+            elif kind[0] == 2:
+                header = kind + f.read(MESSAGE_RECORD.size - 1)
+                if len(header) < MESSAGE_RECORD.size:
+                    return
+                _, timestamp, topic_id, length = MESSAGE_RECORD.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield 2, timestamp, topics[topic_id], payload, f.tell()
+            else:
+                raise ValueError(f"Corrupt record in {path}")
+
+
+class RecordedMessage:
+    """Stands in for a paho MQTTMessage when replaying straight into on_message."""
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 0
+        self.retain = False
+
+
+class Replayer:
+    """Feeds a recorded log to deliver(topic, payload) at a given speed.
+
+    speed is a multiple of real time (1, 10, ...); 0 replays as fast as
+    possible. Gaps in the recording are compressed by the same factor.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.sent_count = 0
+        self.max_behind = 0.0  # Worst lag behind the replay schedule, seconds
+        self.duration = 0.0
+        self._stop = threading.Event()
+
+    def run(self, deliver):
+        """Replay the whole log on the calling thread; returns summary stats."""
+        started = time.perf_counter()
+        first = None
+        for timestamp, topic, payload in read_log(self.path):
+            if self._stop.is_set():
+                break
+            if first is None:
+                first = timestamp
+            if self.speed:
+                due = started + (timestamp - first) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_behind = max(self.max_behind, -delay)
+            deliver(topic, payload)
+            self.sent_count += 1
+        self.duration = time.perf_counter() - started
+        return self.stats()
+
+    def start(self, deliver, on_done=None):
+        """Replay on a background thread, then call on_done(stats)."""
+        def replay():
+            stats = self.run(deliver)
+            if on_done:
+                on_done(stats)
+        thread = threading.Thread(target=replay, name="Replayer", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "sent": self.sent_count,
+            "duration": self.duration,
+            "rate": self.sent_count / self.duration if self.duration else 0.0,
+            "max_behind_ms": self.max_behind * 1000,
+        }
+
+
+class LoopLagProbe:
+    """Measures Tk main-loop lag: how late a root.after() callback fires."""
+
+    def __init__(self, root, interval_ms=20):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.samples = []
+        self._after_id = None
+        self._due = 0.0
+
+    def start(self):
+        self._schedule()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _schedule(self):
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.samples.append(max(0.0, time.perf_counter() - self._due))
+        self._schedule()
+
+
+def format_report(replay_stats, handler_samples, lag_samples, delivered):
+    """Text summary of a replay run."""
+    handler = percentiles(handler_samples)
+    lag = percentiles(lag_samples)
+    handled = len(handler_samples)
+    return "\n".join([
+        f"Replay: {replay_stats['sent']} messages in {replay_stats['duration']:.2f} s "
+        f"({replay_stats['rate']:,.0f} msg/s), max {replay_stats['max_behind_ms']:.1f} ms behind schedule",
+        f"Handled: {handled} of {delivered} received "
+        f"({delivered - handled} coalesced into newer values before rendering)",
+        f"Handler latency: p50 {handler['p50']:.2f} ms, p95 {handler['p95']:.2f} ms, "
+        f"p99 {handler['p99']:.2f} ms, max {handler['max']:.2f} ms",
+        f"Tk loop lag: p50 {lag['p50']:.2f} ms, p95 {lag['p95']:.2f} ms, max {lag['max']:.2f} ms",
+    ])
+
+
+# ========== COMMAND LINE ==========
+def _connect(broker, port, on_message=None):
+    import paho.mqtt.client as mqtt
+    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+    client.on_message = on_message
+    client.connect(broker, port, 60)
+    client.loop_start()
+    return client
+
+
+def record_command(args, registry):
+    log = MessageLog(args.log)
+    client = _connect(args.broker, args.port, log.on_message)
+    client.subscribe(registry.subscriptions())
+    print(f"Recording {', '.join(f for f, _ in registry.subscriptions())} to {args.log} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    client.loop_stop()
+    log.close()
+    print(f"Recorded {log.count} messages")
+
+
+def synth_command(args, registry):
+    """Generate a plausible evening of sensor and device traffic."""
+    rng = random.Random(args.seed)
+    rooms = ["living", "kitchen", "bedroom", "office", "hall"]
+    topics = ["/home/temp", "/home/humidity"] + [f"/rooms/{r}/temp" for r in rooms] \
+        + [f"/rooms/{r}/humidity" for r in rooms]
+    devices = ["/home/led", "/home/fan"] + [f"/rooms/{r}/led" for r in rooms] + [f"/rooms/{r}/fan" for r in rooms]
+    log = MessageLog(args.log, autoflush=False)
+    start = time.time() - args.minutes * 60
+    count = int(args.minutes * 60 * args.rate)
+    for i in range(count):
+        timestamp = start + i / args.rate
+        if rng.random() < 0.05:
+            topic = rng.choice(devices)
+            payload = rng.choice(["ON", "OFF"]) if topic.endswith("led") else str(rng.randrange(0, 256))
+        else:
+            topic = rng.choice(topics)
+            base = 22 if topic.endswith("temp") else 45
+            payload = f"{base + 3 * math.sin(timestamp / 900) + rng.gauss(0, 0.3):.1f}"
+        log.record(topic, payload, timestamp)
+    log.close()
+    print(f"Wrote {count} messages over {args.minutes} min to {args.log} ({os.path.getsize(args.log):,} bytes)")
+
+
+def info_command(args, registry):
+    count, first, last, per_topic = 0, None, None, {}
+    for timestamp, topic, _ in read_log(args.log):
+        count += 1
+        first = timestamp if first is None else first
+        last = timestamp
+        per_topic[topic] = per_topic.get(topic, 0) + 1
+    span = (last - first) if count else 0.0
+    print(f"{count} messages over {span:.0f} s ({count / span if span else 0:.1f} msg/s), "
+          f"{len(per_topic)} topics, {os.path.getsize(args.log):,} bytes")
+    for topic, n in sorted(per_topic.items(), key=lambda item: -item[1])[:15]:
+        print(f"  {topic:<30} {n}")
+
+
+def publish_command(args, registry):
+    if args.batch:
+        return publish_batched(args, registry)
+    client = _connect(args.broker, args.port)
+    replayer = Replayer(args.log, args.speed)
+    stats = replayer.run(lambda topic, payload: client.publish(topic, payload))
+    client.loop_stop()
+    print(f"Published {stats['sent']} messages in {stats['duration']:.2f} s ({stats['rate']:,.0f} msg/s)")
+
+
+def publish_batched(args, registry):
+    """Replay with sensor readings batched (once readers accept it) and topic aliases."""
+    from mqtt_session import MqttSession
+    from sensor_codec import SENSOR_TYPES, SensorBatcher
+    session = MqttSession(args.broker, args.port, topic_aliases=True)
+    batcher = SensorBatcher(session, max_batch=args.batch)
+    session.on_connect = lambda client, *rest: client.subscribe(batcher.subscription())
+    session.on_message = batcher.on_message
+    session.start()
+    time.sleep(1)  # Connect and collect the readers' retained format adverts
+    print(f"Readers: {batcher.readers or 'none advertised'}; "
+          f"sensor readings go out {'batched' if batcher.batching else 'as text'}")
+
+    def deliver(topic, payload):
+        device = registry.resolve(topic)
+        if device is not None and device.type in SENSOR_TYPES:
+            try:
+                batcher.add(topic, float(payload))
+                return
+            except ValueError:
+                pass
+        session.publish(topic, payload)
+
+    stats = Replayer(args.log, args.speed).run(deliver)
+    batcher.flush()
+    time.sleep(0.5)
+    session.stop()
+    print(f"Replayed {stats['sent']} messages in {stats['duration']:.2f} s: "
+          f"{batcher.batch_count} sensor batches, {batcher.text_count} text readings")
+
+
+def main():
+    from device_registry import load_registry
+    registry = load_registry()
+    parser = argparse.ArgumentParser(description="Record and replay MQTT traffic")
+    parser.add_argument("command", choices=["record", "synth", "info", "publish"])
+    parser.add_argument("log", help="message log file")
+    parser.add_argument("--broker", default=registry.broker.get("host", "broker.emqx.io"))
+    parser.add_argument("--port", type=int, default=registry.broker.get("port", 1883))
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiple, 0 = as fast as possible")
+    parser.add_argument("--minutes", type=float, default=60, help="synth: length of the generated log")
+    parser.add_argument("--rate", type=float, default=50, help="synth: messages per second")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=0,
+                        help="publish: batch up to N sensor readings per message (0 = one text reading each)")
+    args = parser.parse_args()
+    commands = {"record": record_command, "synth": synth_command, "info": info_command, "publish": publish_command}
+    commands[args.command](args, registry)
+
+
+if __name__ == "__main__":
+    main()
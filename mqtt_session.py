@@ -0,0 +1,453 @@
+import collections
+import random
+import socket
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+
+class PublishBatch:
+    """Completion tracking for messages published together, such as a scene.
+
+    A topic is done once the broker has acknowledged it (QoS 0: once it is
+    written). on_complete(batch) is called once, when the last topic is
+    done, on whichever thread settled it (usually the network thread);
+    wait() blocks until then. Topics the broker refused or the outbox
+    dropped end up in failed.
+    """
+
+    def __init__(self, name, topics, on_complete=None):
+        self.name = name
+        self.topics = list(dict.fromkeys(topics))
+        self.pending = set(self.topics)
+        self.failed = []
+        self.on_complete = on_complete
+        self.started = time.perf_counter()
+        self.finished = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self.pending:
+            self.finished = self.started
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def elapsed(self):
+        """Seconds from publishing to the last ack (so far, if not done)."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    def wait(self, timeout=None):
+        """Block until every topic is done; False on timeout."""
+        return self._done.wait(timeout)
+
+    def _settle(self, topic, failed=False):
+        with self._lock:
+            if topic not in self.pending:
+                return
+            self.pending.discard(topic)
+            if failed:
+                self.failed.append(topic)
+            if self.pending:
+                return
+            self.finished = time.perf_counter()
+        self._done.set()
+        if self.on_complete:
+            self.on_complete(self)
+
+
+class MqttSession:
+    """A paho client that keeps itself connected and holds publishes while offline.
+
+    The session runs its own network loop: a failed connect or a dropped
+    connection is retried after a jittered exponential backoff, so many
+    clients don't hammer a recovering broker in lockstep. While offline,
+    publish() puts values in a bounded outbox that keeps only the newest
+    value per topic and sends them once the connection is back, instead of
+    letting them pile up inside paho.
+
+    MQTT allows one will per connection, so the session has one (set_will()).
+    Topics registered with add_availability() are published retained as
+    online on every connect and as offline on stop(); an unexpected drop
+    is left to the will, which subscribers read alongside them.
+
+    Set on_connect / on_disconnect / on_message as on a paho client
+    (callback API version 2). The outbox is flushed before on_connect runs,
+    so commands given while offline go out before anything subscribed
+    there starts arriving.
+    An optional MqttMetrics is told about every publish, ack and drop.
+
+    publish_batch() hands a group of messages to paho back to back and
+    tracks their acks together, so a group takes about one round trip.
+    Up to max_inflight QoS 1 messages are in flight at once (paho's own
+    default is 20). paho only takes a new limit while disconnected, so a
+    lower Receive Maximum from the broker applies from the next reconnect.
+
+    With topic_aliases on an MQTT v5 connection, each topic is given a
+    numeric alias (up to the broker's Topic Alias Maximum) the first time
+    it is published on a connection; later publishes send an empty topic
+    and the two-byte alias instead.
+    """
+
+    def __init__(self, host, port=1883, client_id="", protocol=mqtt.MQTTv5, keepalive=60,
+                 outbox_size=200, min_backoff=0.5, max_backoff=60.0, metrics=None, topic_aliases=False,
+                 max_inflight=100):
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.protocol = protocol
+        self.keepalive = keepalive
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.outbox_size = outbox_size
+        self.metrics = metrics
+        self.topic_aliases = topic_aliases and protocol == mqtt.MQTTv5
+        self.max_inflight = max_inflight
+        self.client = self._new_client(client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.max_queued_messages_set(outbox_size)
+        self.client.max_inflight_messages_set(max_inflight)
+        self.on_connect = None
+        self.on_disconnect = None
+
+        self.connected = False
+        self.connect_count = 0
+        self.attempt = 0  # Failed attempts since the last successful connect
+        self.next_retry = None  # time.time() of the next attempt while offline
+        self.outages = collections.deque(maxlen=100)  # Durations of past outages, seconds
+        self.outage_started = None
+        self.queued_count = 0
+        self.coalesced_count = 0
+        self.dropped_count = 0
+        self.flushed_count = 0
+
+        self._outbox = collections.OrderedDict()  # topic -> (payload, qos, retain, content_type)
+        self._alias_maximum = 0  # From the broker's CONNACK
+        self._receive_maximum = None  # Likewise
+        self._aliases = {}       # topic -> alias, kept across reconnects
+        self._announced = set()  # Aliases the broker has seen with their topic on this connection
+        self._aliased = {}       # mid -> (topic, payload, qos, retain, content_type), alias-only and unacked
+        self._batch_mids = {}     # mid -> (PublishBatch, topic) awaiting an ack
+        self._early_acks = {}     # mid -> failed, for acks that beat _send() registering the mid
+        self._registering = False
+        # Guards _aliased, _batch_mids and _early_acks. _on_publish runs with paho's message
+        # lock held and publish() takes that lock too, so this one is never held across paho calls.
+        self._ack_lock = threading.Lock()
+        self._outbox_batches = {}  # topic -> PublishBatch waiting for the outbox to flush
+        self._will = None
+        self._availability = []  # (topic, online, offline)
+        self._lock = threading.RLock()  # Re-entered when a batch completes inside publish_batch()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def on_message(self):
+        return self.client.on_message
+
+    @on_message.setter
+    def on_message(self, callback):
+        self.client.on_message = callback
+
+    def set_will(self, topic, payload, qos=1, retain=True):
+        """Set the session's last will; call before start()."""
+        self._will = (topic, payload, qos, retain)
+
+    def add_availability(self, topic, online="online", offline="offline"):
+        """Publish online (retained) on every connect and offline on stop(); call before start()."""
+        self._availability.append((topic, online, offline))
+
+    def start(self):
+        """Connect in the background and keep reconnecting until stop()."""
+        if self._thread is not None:
+            return
+        if self._will is not None:
+            self.client.will_set(*self._will)
+        self.outage_started = time.time()
+        self._thread = threading.Thread(target=self._run, name="MqttSession", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Publish offline availability, disconnect cleanly (the will is not sent) and stop reconnecting."""
+        if self._availability and self.connected:
+            batch = self.publish_batch([(topic, offline) for topic, _, offline in self._availability],
+                                       qos=1, retain=True, name="availability")
+            batch.wait(timeout)
+        self._stop.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def publish(self, topic, payload, qos=0, retain=False, content_type=None):
+        """Publish now if connected, else keep the newest value per topic in the outbox.
+
+        content_type is sent as the MQTT v5 Content Type property.
+        Returns True if the message was handed to paho. paho keeps QoS 1+
+        messages that hit a connection it has already lost and resends them
+        itself on reconnect, so those never go to the outbox as well.
+        """
+        with self._lock:
+            if self.connected and self._send(topic, payload, qos, retain, content_type) is not None:
+                return True
+            self._queue(topic, (payload, qos, retain, content_type))
+            return False
+
+    def publish_batch(self, messages, qos=1, retain=False, name="batch", on_complete=None):
+        """Publish [(topic, payload), ...] without waiting between them; returns a PublishBatch.
+
+        Messages published while offline wait in the outbox like publish()
+        and are tracked from when it is flushed.
+        """
+        batch = PublishBatch(name, [topic for topic, _ in messages], on_complete)
+        with self._lock:
+            for topic, payload in messages:
+                if self.connected and self._send(topic, payload, qos, retain, batch=batch) is not None:
+                    continue
+                self._queue(topic, (payload, qos, retain, None))
+                previous = self._outbox_batches.get(topic)
+                if previous is not None and previous is not batch:
+                    previous._settle(topic)  # Superseded before it was sent
+                self._outbox_batches[topic] = batch
+        return batch
+
+    def stats(self):
+        """Connection and outbox counters."""
+        with self._lock:
+            outbox = len(self._outbox)
+        outages = list(self.outages)
+        current = time.time() - self.outage_started if self.outage_started and not self.connected else 0.0
+        return {
+            "connected": self.connected,
+            "connects": self.connect_count,
+            "reconnects": max(0, self.connect_count - 1),
+            "outages": len(outages),
+            "longest_outage": max(outages, default=0.0),
+            "total_outage": sum(outages),
+            "current_outage": current,
+            "outbox": outbox,
+            "queued": self.queued_count,
+            "coalesced": self.coalesced_count,
+            "dropped": self.dropped_count,
+            "flushed": self.flushed_count,
+        }
+
+    def report(self):
+        """One-line summary of stats()."""
+        s = self.stats()
+        return (f"MQTT: {s['connects']} connect(s), {s['reconnects']} reconnect(s), {s['outages']} outage(s) "
+                f"(longest {s['longest_outage']:.1f} s, total {s['total_outage']:.1f} s); "
+                f"outbox queued {s['queued']}, coalesced {s['coalesced']}, dropped {s['dropped']}, "
+                f"flushed {s['flushed']}")
+
+    # ---------- internals ----------
+    def _new_client(self, client_id):
+        return mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id=client_id,
+                           protocol=self.protocol)
+
+    def _send(self, topic, payload, qos, retain, content_type=None, batch=None):
+        # Called with self._lock held
+        sent = time.perf_counter()
+        properties = None
+        wire_topic = topic
+        if content_type is not None and self.protocol == mqtt.MQTTv5:
+            properties = Properties(PacketTypes.PUBLISH)
+            properties.ContentType = content_type
+        alias = self._alias(topic)
+        if alias is not None:
+            properties = properties or Properties(PacketTypes.PUBLISH)
+            properties.TopicAlias = alias
+            if alias in self._announced:
+                wire_topic = ""
+        with self._ack_lock:
+            self._registering = True
+        info = self.client.publish(wire_topic, payload, qos=qos, retain=retain, properties=properties)
+        with self._ack_lock:
+            # paho may call on_publish (QoS 0 written, or the ack already in) before
+            # publish() returns, and so before the mid is known here
+            self._registering = False
+            early = self._early_acks.pop(info.mid, None)
+            self._early_acks.clear()
+            # QoS 1+ messages paho keeps (sent, queued, or held while its socket
+            # is down) go out from paho; only refused ones belong in the outbox
+            if info.rc != mqtt.MQTT_ERR_SUCCESS and (qos == 0 or info.rc == mqtt.MQTT_ERR_QUEUE_SIZE):
+                return None
+            if alias is not None and wire_topic and info.rc == mqtt.MQTT_ERR_SUCCESS:
+                self._announced.add(alias)  # Only once the broker is sure to see the topic with it
+            if early is None:
+                if not wire_topic:
+                    self._aliased[info.mid] = (topic, payload, qos, retain, content_type)
+                if batch is not None:
+                    self._batch_mids[info.mid] = (batch, topic)
+        if early is not None and batch is not None:
+            batch._settle(topic, failed=early)
+        if self.metrics:
+            self.metrics.published(topic, qos, info.mid, sent)
+        return info
+
+    def _alias(self, topic):
+        if not self.topic_aliases:
+            return None
+        alias = self._aliases.get(topic)
+        if alias is None and len(self._aliases) < self._alias_maximum:
+            alias = self._aliases[topic] = len(self._aliases) + 1
+        if alias is None or alias > self._alias_maximum:
+            return None
+        return alias
+
+    def _announce_resent_aliases(self):
+        """Map the aliases of alias-only messages paho resends after a reconnect.
+
+        paho resends unacknowledged messages as they were built, right after
+        on_connect, but the broker forgets aliases when a connection ends.
+        Sending the newest of them per topic again, with its topic, first
+        gives the resent copies a known alias.
+        """
+        with self._ack_lock:
+            newest = {topic: message for topic, *message in self._aliased.values()}
+        for topic, (payload, qos, retain, content_type) in newest.items():
+            self._send(topic, payload, qos, retain, content_type)
+
+    def _queue(self, topic, message):
+        if topic in self._outbox:
+            self._outbox.move_to_end(topic)
+            self.coalesced_count += 1
+        elif len(self._outbox) >= self.outbox_size:
+            oldest, _ = self._outbox.popitem(last=False)  # Oldest topic goes first
+            self.dropped_count += 1
+            batch = self._outbox_batches.pop(oldest, None)
+            if batch is not None:
+                batch._settle(oldest, failed=True)
+            if self.metrics:
+                self.metrics.dropped(oldest)
+        self._outbox[topic] = message
+        self.queued_count += 1
+        if self.metrics:
+            self.metrics.queued(topic)
+
+    def _disable_nagle(self):
+        """Send each packet as soon as paho writes it.
+
+        paho leaves Nagle's algorithm on, which holds the second and later
+        packets of a burst until the first is acknowledged at the TCP level,
+        often a delayed ACK later. Batches would then take two round trips.
+        """
+        sock = self.client.socket()
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass  # Not a TCP socket (e.g. a WebSocket wrapper)
+
+    def _limit_inflight(self):
+        """Never more in flight than the broker accepted last time (paho ignores Receive Maximum)."""
+        try:
+            self.client.max_inflight_messages_set(min(self.max_inflight, self._receive_maximum or self.max_inflight))
+        except RuntimeError:
+            pass  # paho still has the old socket open; keep the current limit
+
+    def _backoff(self):
+        """Full-jitter exponential backoff for the current attempt."""
+        ceiling = min(self.max_backoff, self.min_backoff * 2 ** min(self.attempt, 16))
+        return random.uniform(self.min_backoff, max(self.min_backoff, ceiling))
+
+    def _wait_before_retry(self):
+        self.attempt += 1
+        delay = self._backoff()
+        self.next_retry = time.time() + delay
+        self._stop.wait(delay)
+
+    def _run(self):
+        socket_open = False
+        first = True
+        while not self._stop.is_set():
+            if not socket_open:
+                try:
+                    if first:
+                        if self.protocol == mqtt.MQTTv5:
+                            self.client.connect(self.host, self.port, self.keepalive, clean_start=True)
+                        else:
+                            self.client.connect(self.host, self.port, self.keepalive)
+                        first = False
+                    else:
+                        self._limit_inflight()
+                        self.client.reconnect()
+                    socket_open = True
+                    self._disable_nagle()
+                except (OSError, ValueError) as e:
+                    print(f"MQTT connect to {self.host}:{self.port} failed: {e}")
+                    self._wait_before_retry()
+                    continue
+            rc = self.client.loop(timeout=1.0)
+            if rc != mqtt.MQTT_ERR_SUCCESS:
+                socket_open = False
+                if self.connected:  # Lost without paho calling on_disconnect
+                    self._on_disconnect(self.client, None, None, rc, None)
+                if not self._stop.is_set():
+                    self._wait_before_retry()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code == 0:
+            with self._lock:
+                self.connected = True
+                self._announced.clear()
+                self._alias_maximum = getattr(properties, "TopicAliasMaximum", 0) if self.topic_aliases else 0
+                self._receive_maximum = getattr(properties, "ReceiveMaximum", None)
+                self._announce_resent_aliases()
+            self.connect_count += 1
+            self.attempt = 0
+            self.next_retry = None
+            if self.outage_started is not None and self.connect_count > 1:
+                self.outages.append(time.time() - self.outage_started)
+            self.outage_started = None
+            self._flush_outbox()
+            if self._availability:
+                self.publish_batch([(topic, online) for topic, online, _ in self._availability],
+                                   qos=1, retain=True, name="availability")
+        if self.on_connect:
+            self.on_connect(client, userdata, flags, reason_code, properties)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None):
+        with self._lock:
+            was_connected = self.connected
+            self.connected = False
+        if was_connected:
+            self.outage_started = time.time()
+            if self.metrics:
+                self.metrics.connection_lost()
+            if self.on_disconnect:
+                self.on_disconnect(client, userdata, flags, reason_code, properties)
+
+    def _flush_outbox(self):
+        with self._lock:
+            pending = list(self._outbox.items())
+            self._outbox.clear()
+            for topic, (payload, qos, retain, content_type) in pending:
+                batch = self._outbox_batches.pop(topic, None)
+                if self._send(topic, payload, qos, retain, content_type, batch) is None:
+                    if self.metrics:
+                        self.metrics.dropped(topic)
+                    if batch is not None:
+                        batch._settle(topic, failed=True)
+        self.flushed_count += len(pending)
+
+    def _on_publish(self, client, userdata, mid, reason_code=None, properties=None):
+        failed = bool(reason_code is not None and reason_code.is_failure)
+        with self._ack_lock:
+            self._aliased.pop(mid, None)
+            tracked = self._batch_mids.pop(mid, None)
+            if tracked is None and self._registering:
+                self._early_acks[mid] = failed
+        if tracked is not None:
+            batch, topic = tracked
+            batch._settle(topic, failed=failed)
+        if self.metrics:
+            self.metrics.acked(mid)
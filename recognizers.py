@@ -0,0 +1,91 @@
+import itertools
+import json
+import threading
+import time
+
+
+class NotUnderstood(Exception):
+    """The recognizer heard audio but could not turn it into text."""
+
+
+class GoogleRecognizer:
+    """Google Web Speech API through speech_recognition (needs network access)."""
+
+    name = "google"
+
+    def __init__(self, recognizer=None, language="ar-AR"):
+        import speech_recognition as sr
+
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+
+    def recognize(self, audio):
+        import speech_recognition as sr
+
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            raise NotUnderstood()
+
+
+class VoskRecognizer:
+    """Offline recognition with a local Vosk model (e.g. vosk-model-ar-mgb2)."""
+
+    name = "vosk"
+
+    def __init__(self, model_path, sample_rate=16000):
+        from vosk import Model
+
+        self.model = Model(model_path)  # Shared by all workers; recognizers are per call
+        self.sample_rate = sample_rate
+
+    def recognize(self, audio):
+        from vosk import KaldiRecognizer
+
+        recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise NotUnderstood()
+        return text
+
+
+class ScriptedRecognizer:
+    """Offline stand-in that returns canned transcripts; for tests and benchmarks.
+
+    If the audio object carries a ``transcript`` attribute it is returned,
+    otherwise the transcripts are handed out in turn. ``latency`` simulates
+    the time a real recognizer would take.
+    """
+
+    name = "scripted"
+
+    def __init__(self, transcripts=(), latency=0.0):
+        self._transcripts = itertools.cycle(transcripts) if transcripts else None
+        self._lock = threading.Lock()
+        self.latency = latency
+
+    def recognize(self, audio):
+        if self.latency:
+            time.sleep(self.latency)
+        text = getattr(audio, "transcript", None)
+        if text is None and self._transcripts is not None:
+            with self._lock:
+                text = next(self._transcripts)
+        if not text:
+            raise NotUnderstood()
+        return text
+
+
+def create_recognizer(name, **options):
+    """Build a recognizer backend by name: google, vosk or scripted."""
+    backends = {
+        "google": GoogleRecognizer,
+        "vosk": VoskRecognizer,
+        "scripted": ScriptedRecognizer,
+    }
+    try:
+        backend = backends[name]
+    except KeyError:
+        raise ValueError(f"Unknown recognizer backend: {name}")
+    return backend(**options)
@@ -0,0 +1,140 @@
+"""Compact batched sensor payloads, negotiated with readers, with plain text as the fallback.
+
+A batch frame is a 12-byte header (magic, reading count, base timestamp)
+followed by 8 bytes per reading (milliseconds after the base as uint32,
+value as float32). Frames are published with an MQTT v5 content type;
+readers also recognise them by the magic bytes, which can never start a
+UTF-8 text reading, so a broker that drops properties still works.
+
+Readers that understand batches say so in a retained JSON message on
+READERS_TOPIC/<reader id>. A SensorBatcher only switches to batches once
+every reader it has heard from accepts them, so legacy consumers keep
+getting one decimal string per message.
+"""
+import json
+import struct
+import threading
+import time
+
+MAGIC = b"\xb5\x01"
+HEADER = struct.Struct("<2sHd")  # magic, reading count, base timestamp
+READING = struct.Struct("<If")   # milliseconds after base, value
+CONTENT_TYPE = "application/vnd.home.sensor-batch"
+FORMAT_TEXT = "text"
+FORMAT_BATCH = "sensor-batch/1"
+READERS_TOPIC = "/home/readers"
+MAX_BATCH = 65535
+SENSOR_TYPES = ("temperature", "humidity")  # Device types whose readings may be batched
+
+
+def encode_batch(readings):
+    """Pack [(timestamp, value), ...] (oldest first) into one frame."""
+    if not readings or len(readings) > MAX_BATCH:
+        raise ValueError(f"A batch holds 1-{MAX_BATCH} readings, got {len(readings)}")
+    base = readings[0][0]
+    return HEADER.pack(MAGIC, len(readings), base) + b"".join(
+        READING.pack(int(round((timestamp - base) * 1000)), value) for timestamp, value in readings
+    )
+
+
+def decode_batch(payload):
+    """[(timestamp, value), ...] from a frame; ValueError if it is not one."""
+    if len(payload) < HEADER.size:
+        raise ValueError("Not a sensor batch frame")
+    magic, count, base = HEADER.unpack_from(payload)
+    if magic != MAGIC or len(payload) != HEADER.size + count * READING.size:
+        raise ValueError("Not a sensor batch frame")
+    return [(base + offset / 1000, value)
+            for offset, value in READING.iter_unpack(memoryview(payload)[HEADER.size:])]
+
+
+def is_batch(payload, content_type=None):
+    """True if a message carries a batch frame rather than a text reading."""
+    if content_type is not None:
+        return content_type == CONTENT_TYPE
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def message_content_type(msg):
+    """A paho message's v5 content type, or None (v3 brokers, recorded messages)."""
+    return getattr(getattr(msg, "properties", None), "ContentType", None)
+
+
+def format_value(value):
+    """Decimal text for a reading; float32 noise is rounded away."""
+    return f"{value:.6g}"
+
+
+def advertise(session, reader_id, formats=(FORMAT_TEXT, FORMAT_BATCH)):
+    """Tell sensor publishers which payload formats this reader accepts (retained)."""
+    session.publish(f"{READERS_TOPIC}/{reader_id}", json.dumps({"formats": list(formats)}), qos=1, retain=True)
+
+
+class SensorBatcher:
+    """Publishes sensor readings, batched when every known reader accepts batches.
+
+    Readings for a topic are held until max_batch of them are pending or
+    the oldest is max_delay seconds old, then go out as one frame. Until
+    some reader has advertised FORMAT_BATCH, or if any reader advertises
+    text only, each reading is published straight away as text. Feed the
+    session's messages to on_message() and subscribe to subscription().
+    """
+
+    def __init__(self, session, max_batch=50, max_delay=1.0, qos=0):
+        self.session = session
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.qos = qos
+        self.readers = {}   # reader id -> accepted formats
+        self.batch_count = 0
+        self.text_count = 0
+        self._pending = {}  # topic -> [(timestamp, value), ...]
+        self._lock = threading.Lock()  # on_message runs on the network thread
+
+    @staticmethod
+    def subscription():
+        return f"{READERS_TOPIC}/+"
+
+    def on_message(self, client, userdata, msg):
+        """Track reader adverts; returns True if msg was one."""
+        if not msg.topic.startswith(READERS_TOPIC + "/"):
+            return False
+        reader_id = msg.topic[len(READERS_TOPIC) + 1:]
+        try:
+            self.readers[reader_id] = set(json.loads(msg.payload)["formats"])
+        except (ValueError, KeyError, TypeError):
+            self.readers.pop(reader_id, None)  # Cleared (empty payload) or unreadable
+        if not self.batching:
+            self.flush()
+        return True
+
+    @property
+    def batching(self):
+        return bool(self.readers) and all(FORMAT_BATCH in formats for formats in self.readers.values())
+
+    def add(self, topic, value, timestamp=None):
+        timestamp = timestamp or time.time()
+        if not self.batching:
+            self.session.publish(topic, format_value(value), qos=self.qos)
+            self.text_count += 1
+            return
+        with self._lock:
+            pending = self._pending.setdefault(topic, [])
+            pending.append((timestamp, value))
+            full = len(pending) >= self.max_batch or timestamp - pending[0][0] >= self.max_delay
+        if full:
+            self.flush(topic)
+
+    def flush(self, topic=None):
+        """Send pending readings now (as text if readers no longer accept batches)."""
+        with self._lock:
+            topics = [topic] if topic is not None else list(self._pending)
+            due = [(t, self._pending.pop(t)) for t in topics if self._pending.get(t)]
+        for topic, readings in due:
+            if self.batching:
+                self.session.publish(topic, encode_batch(readings), qos=self.qos, content_type=CONTENT_TYPE)
+                self.batch_count += 1
+            else:
+                for _, value in readings:
+                    self.session.publish(topic, format_value(value), qos=self.qos)
+                    self.text_count += 1
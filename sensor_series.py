@@ -0,0 +1,223 @@
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+# (level name, bucket seconds, capacity in rows)
+LEVELS = (
+    ("raw", 0, 7 * 24 * 3600),    # A week at 1 Hz
+    ("1min", 60, 90 * 24 * 60),   # 90 days
+    ("1h", 3600, 5 * 365 * 24),   # 5 years
+)
+
+
+class RingBuffer:
+    """Fixed-size ring of (timestamp, value) rows in one float64 NumPy array.
+
+    With a path the array is a memory-mapped .npy file: history is there
+    as soon as the file is opened, with no load step, and survives
+    restarts. Row 0 holds the total number of rows ever appended; the ring
+    itself starts at row 1. Timestamps must not go backwards: older rows
+    are dropped and counted in out_of_order.
+    """
+
+    def __init__(self, capacity, path=None):
+        if path and os.path.exists(path):
+            self._data = np.lib.format.open_memmap(path, mode="r+")
+        elif path:
+            self._data = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(capacity + 1, 2))
+        else:
+            self._data = np.zeros((capacity + 1, 2), dtype=np.float64)
+        self.capacity = len(self._data) - 1  # An existing file keeps its own size
+        self._ring = self._data[1:]
+        self.total = int(self._data[0, 0])
+        self.last_timestamp = self._ring[(self.total - 1) % self.capacity, 0] if self.total else -np.inf
+        self.out_of_order = 0  # Rows dropped for being older than the newest one
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, value):
+        """Add a row; out-of-order rows are counted and dropped. Returns True if stored."""
+        if timestamp < self.last_timestamp:
+            self.out_of_order += 1
+            return False
+        self._ring[self.total % self.capacity] = (timestamp, value)
+        self.total += 1
+        self._data[0, 0] = self.total
+        self.last_timestamp = timestamp
+        return True
+
+    def first_timestamp(self):
+        segments = self._segments()
+        return segments[0][0, 0] if segments else None
+
+    def count(self, start, end):
+        """Number of rows with start <= t <= end."""
+        return sum(hi - lo for _, lo, hi in self._ranges(start, end))
+
+    def window(self, start, end):
+        """Timestamps and values with start <= t <= end, oldest first."""
+        parts = [segment[lo:hi] for segment, lo, hi in self._ranges(start, end) if hi > lo]
+        if not parts:
+            return np.empty(0), np.empty(0)
+        rows = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return rows[:, 0], rows[:, 1]
+
+    def flush(self):
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+
+    def _ranges(self, start, end):
+        for segment in self._segments():
+            times = segment[:, 0]
+            yield segment, np.searchsorted(times, start, side="left"), np.searchsorted(times, end, side="right")
+
+    def _segments(self):
+        """The ring as one or two chronological views, without copying."""
+        if self.total <= self.capacity:
+            return [self._ring[:self.total]] if self.total else []
+        split = self.total % self.capacity
+        return [self._ring[split:], self._ring[:split]] if split else [self._ring]
+
+
+class SensorSeries:
+    """One sensor's readings at raw, 1 minute and 1 hour resolution.
+
+    Readings go to the raw ring as they arrive. Each coarser level gets
+    the mean of a bucket once a reading from the next bucket shows up;
+    the bucket still being filled is rebuilt from the raw ring on open.
+    Readings may be appended on one thread while another reads windows.
+    """
+
+    def __init__(self, directory=None, name="series", levels=LEVELS):
+        self.levels = []
+        for level, step, capacity in levels:
+            path = os.path.join(directory, f"{name}.{level}.npy") if directory else None
+            self.levels.append((level, step, RingBuffer(capacity, path)))
+        self._buckets = {level: [None, 0.0, 0] for level, step, _ in self.levels if step}  # [bucket, sum, count]
+        self._lock = threading.Lock()
+        raw = self.levels[0][2]
+        if raw.total:
+            for level, step, _ in self.levels[1:]:
+                index = raw.last_timestamp // step
+                _, values = raw.window(index * step, raw.last_timestamp)
+                self._buckets[level] = [index, float(values.sum()), len(values)]
+
+    @property
+    def out_of_order(self):
+        """Readings dropped because they were older than the newest one."""
+        return self.levels[0][2].out_of_order
+
+    def append(self, timestamp, value):
+        """Add a reading; returns False if it was dropped as out of order."""
+        with self._lock:
+            return self._append(timestamp, value)
+
+    def _append(self, timestamp, value):
+        raw = self.levels[0][2]
+        if not raw.append(timestamp, value):
+            return False
+        for level, step, ring in self.levels[1:]:
+            bucket = self._buckets[level]
+            index = timestamp // step
+            if bucket[0] is not None and index != bucket[0] and bucket[2]:
+                ring.append(bucket[0] * step, bucket[1] / bucket[2])
+                bucket[1:] = [0.0, 0]
+            bucket[0] = index
+            bucket[1] += value
+            bucket[2] += 1
+        return True
+
+    def window(self, start, end, max_points=1000):
+        """Decimated timestamps and values covering [start, end] for a chart max_points wide.
+
+        Uses the finest level with at most a few times max_points rows in
+        the window, then min/max-decimates those rows. A level whose ring
+        has already overwritten the start of the window is skipped, so old
+        windows come from the coarser levels that still hold them.
+        """
+        with self._lock:
+            chosen = None
+            for _, _, ring in self.levels:
+                count = ring.count(start, end)
+                if not count or (ring.total > ring.capacity and ring.first_timestamp() > start):
+                    continue
+                chosen = ring
+                if count <= max_points * 16:
+                    break
+            if chosen is None:
+                return np.empty(0), np.empty(0)
+            times, values = decimate(*chosen.window(start, end), max_points)
+            return np.array(times), np.array(values)  # Copies: the rings keep changing after the lock
+
+    def time_range(self):
+        """(oldest, newest) timestamp over all levels, or None when empty."""
+        with self._lock:
+            raw = self.levels[0][2]
+            if not raw.total:
+                return None
+            firsts = [ring.first_timestamp() for _, _, ring in self.levels if ring.total]
+            return min(firsts), raw.last_timestamp
+
+    def flush(self):
+        with self._lock:
+            for _, _, ring in self.levels:
+                ring.flush()
+
+
+class SensorHistory:
+    """SensorSeries per device id, persisted under directory when one is given."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def record(self, device_id, value, timestamp):
+        """Add a reading; returns False if it was dropped as out of order."""
+        return self.get(device_id).append(timestamp, value)
+
+    def get(self, device_id):
+        series = self.series.get(device_id)
+        if series is None:
+            with self._lock:
+                series = self.series.get(device_id)
+                if series is None:
+                    series = self.series[device_id] = SensorSeries(self.directory, series_name(device_id))
+        return series
+
+    def out_of_order(self):
+        """Readings dropped as out of order, over every series."""
+        return sum(series.out_of_order for series in list(self.series.values()))
+
+    def flush(self):
+        for series in list(self.series.values()):
+            series.flush()
+
+
+def series_name(device_id):
+    """File name stem for a device id: readable, plus a hash so ids like a/b and a_b stay apart."""
+    readable = re.sub(r"[^\w.-]", "_", device_id)
+    return f"{readable}-{hashlib.sha256(device_id.encode('utf-8')).hexdigest()[:12]}"
+
+
+def decimate(times, values, max_points):
+    """Min/max decimation: at most max_points points that keep every peak and dip."""
+    count = len(times)
+    if count <= max_points or max_points < 2:
+        return times, values
+    per_bucket = -(-count // (max_points // 2))  # Ceiling division
+    starts = np.arange(0, count, per_bucket)
+    lows = np.minimum.reduceat(values, starts)
+    highs = np.maximum.reduceat(values, starts)
+    ends = np.minimum(starts + per_bucket, count) - 1
+    out_times = np.empty(len(starts) * 2)
+    out_values = np.empty(len(starts) * 2)
+    out_times[0::2], out_times[1::2] = times[starts], times[ends]
+    out_values[0::2], out_values[1::2] = lows, highs
+    return out_times, out_values
@@ -0,0 +1,56 @@
+import contextlib
+import importlib
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+    """Records per-import and per-phase timings from process start to first listen."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.imports = []  # (module name, seconds, thread name)
+        self.phases = []   # (phase name, seconds)
+        self.marks = {}    # name -> seconds since t0
+        self._lock = threading.Lock()
+
+    def import_module(self, name):
+        """Import a module on first use and record how long it took."""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.append((name, time.perf_counter() - started, threading.current_thread().name))
+        return module
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a startup phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append((name, time.perf_counter() - started))
+
+    def mark(self, name):
+        """Record a point in time relative to process start."""
+        self.marks[name] = time.perf_counter() - self.t0
+
+    def report(self):
+        """Startup timings as printable text."""
+        lines = ["Startup profile:"]
+        for name, seconds in self.phases:
+            lines.append(f"  phase  {name:<24} {seconds * 1000:8.1f} ms")
+        for name, seconds, thread in sorted(self.imports, key=lambda item: -item[1]):
+            where = "" if thread == "MainThread" else f" ({thread})"
+            lines.append(f"  import {name:<24} {seconds * 1000:8.1f} ms{where}")
+        for name, seconds in self.marks.items():
+            lines.append(f"  {name}: {seconds * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,22 @@
+import io
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def voice_control():
+    """The VoiceControlForHome module, imported without starting anything."""
+    # The script re-wraps stdout/stderr unless they already report UTF-8,
+    # which would close pytest's capture files
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = io.TextIOWrapper(io.BytesIO(), encoding="UTF-8")
+    try:
+        import VoiceControlForHome
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    return VoiceControlForHome
@@ -0,0 +1,68 @@
+import pytest
+
+from device_registry import DeviceRegistry, TopicTrie
+
+CONFIG = {
+    "devices": [
+        {"id": "led", "type": "led", "topic": "/home/led"},
+        {"id": "fan", "type": "fan", "topic": "/home/fan", "max": 255},
+        {"id": "temp", "type": "temperature", "topic": "/rooms/+/temp"},
+        {"id": "log", "type": "log", "topic": "/logs/#"},
+    ],
+    "scenes": [
+        {"id": "off", "states": {"led": "OFF", "/home/fan": 0}},
+        {"id": "broken", "states": {"lamp": "ON"}},
+    ],
+}
+
+
+def test_trie_wildcards():
+    trie = TopicTrie()
+    trie.insert("/a/+/c", "plus")
+    trie.insert("/a/#", "hash")
+    trie.insert("#", "all")
+    assert sorted(trie.match("/a/b/c")) == ["all", "hash", "plus"]
+    assert sorted(trie.match("/a")) == ["all", "hash"]  # # also matches the parent level
+    assert trie.match("$SYS/uptime") == []  # Wildcards never match $ topics at the first level
+
+
+def test_exact_devices_exist_up_front():
+    registry = DeviceRegistry(CONFIG)
+    assert set(registry.devices) == {"led", "fan"}
+    assert registry.devices["fan"].options == {"max": 255}
+
+
+def test_wildcard_creates_device_on_first_message():
+    registry = DeviceRegistry(CONFIG)
+    seen = []
+    registry.on_new_device = seen.append
+    device = registry.resolve("/rooms/kitchen/temp")
+    assert device.id == "temp:kitchen"
+    assert registry.resolve("/rooms/kitchen/temp") is device
+    assert seen == [device]
+    assert registry.resolve("/unknown") is None
+
+
+def test_dispatch_calls_type_handler():
+    registry = DeviceRegistry(CONFIG)
+    calls = []
+    registry.register_handler("led", lambda device, payload: calls.append((device.id, payload)))
+    registry.dispatch("/home/led", "ON")
+    registry.dispatch("/home/fan", "10")  # No handler for fans
+    assert calls == [("led", "ON")]
+
+
+def test_room_device():
+    registry = DeviceRegistry(CONFIG)
+    assert registry.room_device("temperature", "bedroom").topic == "/rooms/bedroom/temp"
+    assert registry.room_device("led", "bedroom") is None
+
+
+def test_scene_states_by_id_and_topic():
+    registry = DeviceRegistry(CONFIG)
+    states = [(device.id, payload) for device, payload in registry.scene_states("off")]
+    assert states == [("led", "OFF"), ("fan", "0")]
+    with pytest.raises(KeyError):
+        registry.scene_states("broken")
+    with pytest.raises(KeyError):
+        registry.scene_states("missing")
@@ -0,0 +1,69 @@
+import pytest
+
+from device_registry import DeviceRegistry
+from device_state import DeviceStateCache
+from home_controller import HomeController
+
+CONFIG = {
+    "devices": [
+        {"id": "led", "type": "led", "topic": "/home/led"},
+        {"id": "temp", "type": "temperature", "topic": "/home/temp", "max_age": 60},
+        {"id": "temp", "type": "temperature", "topic": "/rooms/+/temp"},
+    ],
+}
+
+
+@pytest.fixture
+def cache():
+    return DeviceStateCache(DeviceRegistry(CONFIG), max_age=300)
+
+
+@pytest.fixture
+def controller():
+    controller = HomeController(DeviceRegistry(CONFIG), session=None)
+    applied = []
+    controller.on_receive = lambda topic, payload, received, older: applied.append((topic, payload))
+    controller.applied = applied
+    yield controller
+    controller.stop()
+
+
+def test_update_and_value(cache):
+    assert cache.get("/home/led") is None and cache.value("/home/led", "OFF") == "OFF"
+    cache.update("/home/led", "ON", timestamp=100.0)
+    state = cache.update("/home/led", "OFF", timestamp=200.0)
+    assert cache.get("/home/led") is state and cache.value("/home/led") == "OFF"
+    assert state.age(now=230.0) == 30.0
+
+
+def test_staleness_follows_the_device_max_age(cache):
+    home = cache.update("/home/temp", "21.5", timestamp=1000.0)
+    room = cache.update("/rooms/kitchen/temp", "23", timestamp=1000.0)
+    assert not cache.is_stale(home, now=1060.0) and cache.is_stale(home, now=1061.0)
+    assert not cache.is_stale(room, now=1300.0) and cache.is_stale(room, now=1301.0)
+    assert cache.is_stale(None)
+
+
+def test_latest_is_the_newest_reading_of_a_type(cache):
+    cache.update("/home/temp", "21.5", timestamp=100.0)
+    cache.update("/rooms/kitchen/temp", "23", timestamp=200.0)
+    cache.update("/home/led", "ON", timestamp=300.0)
+    device, state = cache.latest("temperature")
+    assert device.topic == "/rooms/kitchen/temp" and state.value == "23"
+    assert cache.latest("humidity") == (None, None)
+
+
+def test_retained_value_already_known_is_a_duplicate(controller):
+    controller.receive("/home/led", b"ON")
+    controller.receive("/home/led", b"ON", retain=True)  # Replayed by the broker after a reconnect
+    assert controller.duplicate_count == 1
+    assert controller.applied == [("/home/led", "ON")]
+
+
+def test_changed_or_live_values_are_not_duplicates(controller):
+    controller.receive("/home/led", b"ON", retain=True)  # Nothing cached yet
+    controller.receive("/home/led", b"OFF", retain=True)  # Changed while we were away
+    controller.receive("/home/led", b"OFF")  # Live repeats are still delivered
+    assert controller.duplicate_count == 0
+    assert controller.device_state.value("/home/led") == "OFF"
+    assert controller.applied == [("/home/led", "ON"), ("/home/led", "OFF"), ("/home/led", "OFF")]
@@ -0,0 +1,64 @@
+import queue
+import time
+
+import pytest
+
+from device_registry import DeviceRegistry
+from home_controller import HomeController, HomeHub
+from local_broker import LocalBroker
+from mqtt_session import MqttSession
+from test_local_broker import close, connect
+from test_mqtt_session import started
+
+CONFIG = {
+    "devices": [
+        {"id": "led", "type": "led", "topic": "/home/led", "availability": True},
+        {"id": "fan", "type": "fan", "topic": "/home/fan", "max": 255},
+    ],
+    "scenes": [{"id": "evening", "states": {"led": "ON", "fan": "80"}}],
+}
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker().start()
+    yield broker
+    broker.stop()
+
+
+@pytest.fixture
+def hub(broker):
+    session = MqttSession(broker.host, broker.port, client_id="dashboard")
+    hub = HomeHub(session, reader_id="dashboard", status_topic="/dashboard/status")
+    hub.add_home(HomeController(DeviceRegistry(CONFIG), session))
+    hub.start()
+    started(session)
+    yield hub
+    hub.stop()
+
+
+def retained_topics(broker):
+    """Topics a subscriber that joins now is sent as retained."""
+    received = queue.Queue()
+    client = connect(broker, "late-subscriber", received, subscribe="#")
+    time.sleep(0.2)
+    close(client)
+    topics = set()
+    while not received.empty():
+        msg = received.get()
+        if msg.retain:
+            topics.add(msg.topic)
+    return topics
+
+
+def test_commands_are_not_retained(broker, hub):
+    home = hub.homes[""]
+    devices = home.registry.devices
+    home.toggle_led(devices["led"])
+    home.set_fan_speed(devices["fan"], 120, immediate=True)
+    assert home.apply_scene("evening").wait(2)
+    assert home.device_state.value("/home/led") == "ON"
+    # Only state the hub owns is retained; a late subscriber gets no stale commands
+    topics = retained_topics(broker)
+    assert topics.isdisjoint({"/home/led", "/home/fan"})
+    assert {"/dashboard/status", "/home/led/availability"} <= topics
@@ -0,0 +1,119 @@
+import queue
+import socket
+import struct
+import threading
+
+import paho.mqtt.client as mqtt
+import pytest
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from local_broker import LocalBroker, topic_matches
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker().start()
+    yield broker
+    broker.stop()
+
+
+def connect(broker, client_id, received=None, subscribe=None):
+    """A started v5 client, connected and (optionally) subscribed before it is returned."""
+    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id=client_id,
+                         protocol=mqtt.MQTTv5)
+    ready = threading.Event()
+    if received is not None:
+        client.on_message = lambda client, userdata, msg: received.put(msg)
+    if subscribe:
+        client.on_connect = lambda client, *args: client.subscribe(subscribe, 1)
+        client.on_subscribe = lambda *args: ready.set()
+    else:
+        client.on_connect = lambda *args: ready.set()
+    client.connect("127.0.0.1", broker.port)
+    client.loop_start()
+    assert ready.wait(2)
+    return client
+
+
+def close(*clients):
+    for client in clients:
+        client.disconnect()  # Wakes the network loop, so loop_stop() needn't wait out its select
+        client.loop_stop()
+
+
+def properties(content_type, alias=None):
+    props = Properties(PacketTypes.PUBLISH)
+    props.ContentType = content_type
+    props.UserProperty = ("sensor", "kitchen")
+    if alias is not None:
+        props.TopicAlias = alias
+    return props
+
+
+def test_topic_matches():
+    assert topic_matches("/rooms/+/temp", "/rooms/kitchen/temp")
+    assert topic_matches("/rooms/#", "/rooms/kitchen/temp")
+    assert not topic_matches("/rooms/+", "/rooms/kitchen/temp")
+    assert not topic_matches("#", "$SYS/uptime")
+
+
+def test_properties_reach_subscribers(broker):
+    received = queue.Queue()
+    subscriber = connect(broker, "reader", received, subscribe="/sensors/#")
+    publisher = connect(broker, "writer")
+    try:
+        publisher.publish("/sensors/temp", b"\x01", qos=1, properties=properties("application/x-batch", alias=3))
+        msg = received.get(timeout=2)
+        assert msg.topic == "/sensors/temp"
+        assert msg.properties.ContentType == "application/x-batch"
+        assert msg.properties.UserProperty == [("sensor", "kitchen")]
+        assert not hasattr(msg.properties, "TopicAlias")  # The alias was the publisher's, not ours
+    finally:
+        close(publisher, subscriber)
+
+
+def test_retained_messages_keep_their_properties(broker):
+    publisher = connect(broker, "writer")
+    publisher.publish("/sensors/temp", b"\x01", qos=1, retain=True,
+                      properties=properties("application/x-batch")).wait_for_publish(2)
+    received = queue.Queue()
+    subscriber = connect(broker, "reader", received, subscribe="/sensors/#")
+    try:
+        msg = received.get(timeout=2)
+        assert msg.retain
+        assert msg.properties.ContentType == "application/x-batch"
+    finally:
+        close(publisher, subscriber)
+
+
+def raw_client(broker, client_id):
+    """A bare socket that has completed an MQTT v5 CONNECT, for sending packets paho won't."""
+    sock = socket.create_connection(("127.0.0.1", broker.port), timeout=2)
+    name = client_id.encode()
+    body = b"\x00\x04MQTT\x05\x02\x00\x3c\x00" + struct.pack("!H", len(name)) + name
+    sock.sendall(bytes([0x10, len(body)]) + body)
+    assert sock.recv(1)[0] == 0x20
+    sock.recv(sock.recv(1)[0])  # CONNACK body
+    return sock
+
+
+@pytest.mark.parametrize("alias", [5, 0, 65])  # Never set, reserved, above the broker's maximum
+def test_invalid_topic_alias_disconnects_the_client(broker, alias):
+    received = queue.Queue()
+    subscriber = connect(broker, "reader", received, subscribe="#")
+    sock = raw_client(broker, "writer")
+    try:
+        # PUBLISH, QoS 0, empty topic, Topic Alias property
+        body = b"\x00\x00\x03\x23" + struct.pack("!H", alias) + b"80"
+        sock.sendall(bytes([0x30, len(body)]) + body)
+        assert sock.recv(4) == b"\xe0\x02\x94\x00"  # DISCONNECT: Topic Alias invalid
+        assert sock.recv(1) == b""
+        # The broker carries on for everyone else
+        publisher = connect(broker, "writer2")
+        publisher.publish("/home/fan", "90", qos=1).wait_for_publish(2)
+        assert received.get(timeout=2).payload == b"90" and received.empty()
+        close(publisher)
+    finally:
+        sock.close()
+        close(subscriber)
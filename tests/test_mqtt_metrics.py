@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from mqtt_metrics import Histogram, MqttMetrics
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    histogram = Histogram()
+    for _ in range(90):
+        histogram.add(0.0008)  # 0.8 ms, in the 1 ms bucket
+    for _ in range(9):
+        histogram.add(0.015)
+    histogram.add(0.3)
+    snapshot = histogram.snapshot()
+    assert (snapshot["p50_ms"], snapshot["p95_ms"], snapshot["p99_ms"]) == (1, 20, 20)
+    assert snapshot["max_ms"] == pytest.approx(300)
+    assert snapshot["buckets"] == {"1": 90, "20": 9, "500": 1}
+    assert Histogram().percentile(95) == 0.0
+
+
+def test_percentile_never_exceeds_the_largest_sample():
+    histogram = Histogram()
+    histogram.add(0.0012)
+    assert histogram.percentile(99) == pytest.approx(1.2)
+
+
+def test_ack_latency_and_in_flight():
+    metrics = MqttMetrics()
+    metrics.published("/home/led", 1, mid=1, sent=10.0)
+    metrics.published("/home/led", 1, mid=2, sent=10.0)
+    assert metrics.in_flight == 2
+    metrics.acked(1)
+    metrics.acked(3)  # Beats published(), as a fast broker's PUBACK can
+    metrics.published("/home/fan", 1, mid=3, sent=0.0)
+    topics = metrics.snapshot()["topics"]
+    assert metrics.in_flight == 1 and metrics.snapshot()["in_flight"] == 1
+    assert (topics["/home/led"]["acked"], topics["/home/led"]["in_flight"]) == (1, 1)
+    assert topics["/home/fan"]["acked"] == 1 and topics["/home/fan"]["ack_latency"]["count"] == 1
+
+
+def test_connection_lost_drops_qos0_and_retries_qos1():
+    metrics = MqttMetrics()
+    metrics.published("/home/temp", 0, mid=1, sent=0.0)
+    metrics.published("/home/led", 1, mid=2, sent=0.0)
+    metrics.queued("/home/fan")
+    metrics.dropped("/home/fan")
+    metrics.connection_lost()
+    topics = metrics.snapshot()["topics"]
+    assert topics["/home/temp"]["dropped"] == 1 and topics["/home/temp"]["in_flight"] == 0
+    assert topics["/home/led"]["retries"] == 1 and metrics.in_flight == 1
+    assert (topics["/home/fan"]["queued"], topics["/home/fan"]["dropped"]) == (1, 1)
+
+
+def test_snapshot_is_written_as_json(tmp_path):
+    metrics = MqttMetrics()
+    metrics.handled("/home/temp", 0.002)
+    path = tmp_path / "metrics.json"
+    metrics.write_snapshot(str(path))
+    snapshot = json.loads(path.read_text(encoding="utf-8"))
+    assert snapshot["topics"]["/home/temp"]["received"] == 1
+    assert snapshot["topics"]["/home/temp"]["handler_time"]["count"] == 1
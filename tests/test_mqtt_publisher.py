@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from mqtt_publisher import CoalescingPublisher
+
+
+class RecordingClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+
+@pytest.fixture
+def publisher():
+    # A slow rate keeps values pending until the test flushes them
+    publisher = CoalescingPublisher(RecordingClient(), max_rate=0.01)
+    yield publisher
+    publisher.stop(flush=False)
+
+
+def test_newest_value_wins(publisher):
+    publisher.publish("/fan", 10)
+    publisher.flush()
+    publisher.publish("/fan", 20)
+    publisher.publish("/fan", 30)
+    publisher.flush()
+    assert publisher.client.published == [("/fan", "10"), ("/fan", "30")]
+    assert publisher.stats() == {"sent": 2, "suppressed": 1, "pending": 0}
+
+
+def test_value_already_on_broker_is_skipped(publisher):
+    publisher.observe("/fan", "50")
+    publisher.publish("/fan", 50)
+    publisher.flush()
+    assert publisher.client.published == []
+    assert publisher.stats()["suppressed"] == 1
+
+
+def test_pending_replaced_by_broker_value_counts_once(publisher):
+    publisher.publish("/fan", 10)
+    publisher.flush()
+    publisher.publish("/fan", 20)
+    publisher.publish("/fan", 10)  # Back to what the broker holds: nothing to send
+    publisher.flush()
+    assert publisher.client.published == [("/fan", "10")]
+    assert publisher.stats() == {"sent": 1, "suppressed": 1, "pending": 0}
+
+
+def test_discard_drops_unsent_value(publisher):
+    publisher.publish("/fan", 10)
+    publisher.discard("/fan")
+    publisher.flush()
+    assert publisher.client.published == []
+
+
+def test_flush_cannot_overtake_a_send_in_progress():
+    entered = threading.Event()
+
+    class SlowClient(RecordingClient):
+        def publish(self, topic, payload, qos=0, retain=False):
+            if payload == "1":
+                entered.set()
+                threading.Event().wait(0.3)  # A slow first send on the worker thread
+            super().publish(topic, payload, qos, retain)
+
+    publisher = CoalescingPublisher(SlowClient(), max_rate=0)
+    try:
+        publisher.publish("/fan", 1)
+        assert entered.wait(2)
+        publisher.publish("/fan", 2)
+        publisher.flush()
+        assert publisher.client.published == [("/fan", "1"), ("/fan", "2")]
+    finally:
+        publisher.stop()
@@ -0,0 +1,58 @@
+import os
+
+import mqtt_replay
+from mqtt_replay import MessageLog, Replayer, read_log
+
+
+def write_log(path, messages):
+    log = MessageLog(path)
+    for topic, payload, timestamp in messages:
+        log.record(topic, payload, timestamp)
+    return log
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "evening.mqlog")
+    write_log(path, [("/home/temp", "21.5", 1.0), ("/home/led", b"ON", 2.0), ("/home/temp", "22", 3.0)]).close()
+    assert list(read_log(path)) == [(1.0, "/home/temp", b"21.5"), (2.0, "/home/led", b"ON"),
+                                    (3.0, "/home/temp", b"22")]
+
+
+def test_records_reach_the_file_before_close(tmp_path):
+    path = str(tmp_path / "evening.mqlog")
+    log = write_log(path, [("/home/temp", "21.5", 1.0)])
+    assert list(read_log(path)) == [(1.0, "/home/temp", b"21.5")]  # As a crash right now would leave it
+    log.close()
+    log.record("/home/temp", "22")  # Late message during shutdown
+    assert log.count == 1
+
+
+def test_torn_last_record_is_ignored_and_trimmed(tmp_path):
+    path = str(tmp_path / "evening.mqlog")
+    write_log(path, [("/home/temp", "21.5", 1.0), ("/home/temp", "22.0", 2.0)]).close()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 2)  # A crash in the middle of the last record
+    assert list(read_log(path)) == [(1.0, "/home/temp", b"21.5")]
+
+    log = MessageLog(path)  # Reopen to append
+    log.record("/home/humidity", "40", 3.0)
+    log.close()
+    assert list(read_log(path)) == [(1.0, "/home/temp", b"21.5"), (3.0, "/home/humidity", b"40")]
+
+
+def test_topics_past_the_id_limit_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(mqtt_replay, "MAX_TOPICS", 2)
+    path = str(tmp_path / "evening.mqlog")
+    log = write_log(path, [("/a", "1", 1.0), ("/b", "2", 2.0), ("/c", "3", 3.0), ("/a", "4", 4.0)])
+    log.close()
+    assert [topic for _, topic, _ in read_log(path)] == ["/a", "/b", "/a"]
+    assert log.skipped_count == 1
+
+
+def test_replayer_delivers_everything(tmp_path):
+    path = str(tmp_path / "evening.mqlog")
+    write_log(path, [("/home/temp", str(i), float(i)) for i in range(5)]).close()
+    delivered = []
+    stats = Replayer(path, speed=0).run(lambda topic, payload: delivered.append(payload))
+    assert delivered == [b"0", b"1", b"2", b"3", b"4"]
+    assert stats["sent"] == 5
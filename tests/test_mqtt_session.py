@@ -0,0 +1,203 @@
+import queue
+import time
+
+import paho.mqtt.client as mqtt
+import pytest
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
+
+from local_broker import LocalBroker
+from mqtt_session import MqttSession
+from test_local_broker import close, connect
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker().start()
+    yield broker
+    broker.stop()
+
+
+class AckingClient:
+    """Stands in for paho: acks each publish before publish() returns, as a fast broker can."""
+
+    def __init__(self, session, reason_code=None, ack=True, refuse=0):
+        self.session = session
+        self.reason_code = reason_code
+        self.ack = ack
+        self.refuse = refuse  # Refuse this many publishes first
+        self.mids = []
+        self.topics = []  # As sent on the wire ("" when alias only)
+
+    def publish(self, topic, payload, qos=0, retain=False, properties=None):
+        info = mqtt.MQTTMessageInfo(len(self.mids) + 1)
+        self.mids.append(info.mid)
+        self.topics.append(topic)
+        if self.refuse:
+            self.refuse -= 1
+            info.rc = mqtt.MQTT_ERR_QUEUE_SIZE  # paho's queue is full; the message is not kept
+            return info
+        if self.ack:
+            self.session._on_publish(self, None, info.mid, self.reason_code, None)  # Before _set_as_published()
+        return info
+
+
+def offline_session(topic_aliases=False, **client_args):
+    session = MqttSession("127.0.0.1", 1, topic_aliases=topic_aliases)
+    session._alias_maximum = 10 if topic_aliases else 0
+    session.client = AckingClient(session, **client_args)
+    session.connected = True
+    return session
+
+
+def started(session):
+    session.start()
+    deadline = time.time() + 2
+    while not session.connected and time.time() < deadline:
+        time.sleep(0.01)
+    assert session.connected
+    return session
+
+
+def retained(broker, topic_filter, count):
+    """{topic: payload} of the first count retained messages a new subscriber gets."""
+    received = queue.Queue()
+    client = connect(broker, "watcher", received, subscribe=topic_filter)
+    messages = {}
+    try:
+        for _ in range(count):
+            msg = received.get(timeout=2)
+            messages[msg.topic] = msg.payload
+    finally:
+        close(client)
+    return messages
+
+
+def test_availability_online_then_offline_on_one_connection(broker):
+    session = MqttSession(broker.host, broker.port, client_id="hub")
+    session.set_will("/hub/status", "offline")
+    for topic in ("/hub/status", "/home/led/availability", "/home/fan/availability"):
+        session.add_availability(topic)
+    started(session)
+    assert broker.client_count == 1  # No extra connection per availability topic
+    time.sleep(0.2)
+    assert set(retained(broker, "#", 3).values()) == {b"online"}
+
+    session.stop()
+    assert retained(broker, "#", 3) == {
+        "/hub/status": b"offline", "/home/led/availability": b"offline", "/home/fan/availability": b"offline"}
+
+
+def test_will_marks_hub_offline_when_dropped(broker):
+    session = MqttSession(broker.host, broker.port, client_id="hub", min_backoff=5, max_backoff=5)
+    session.set_will("/hub/status", "offline")
+    session.add_availability("/hub/status")
+    started(session)
+    time.sleep(0.2)
+    broker.drop_connections()
+    time.sleep(0.2)
+    try:
+        assert retained(broker, "/hub/status", 1) == {"/hub/status": b"offline"}
+    finally:
+        session.stop()
+
+
+def test_resent_alias_only_messages_reach_their_topic(broker):
+    session = started(MqttSession(broker.host, broker.port, client_id="hub", topic_aliases=True,
+                                  min_backoff=0.05, max_backoff=0.05))
+    session.publish("/home/fan", "1", qos=1, retain=True)  # Names the topic and is acknowledged
+    time.sleep(0.2)
+    (client,) = broker._sessions
+    send = client._send
+    client._send = lambda first_byte, body: None if first_byte == 0x40 else send(first_byte, body)  # No PUBACKs
+    for value in ("2", "3"):  # Alias only
+        session.publish("/home/fan", value, qos=1, retain=True)
+    time.sleep(0.2)
+    broker.drop_connections()
+    deadline = time.time() + 2
+    while session.connect_count < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    try:
+        assert session.connected and session.connect_count == 2
+        assert session._aliased == {}  # Every resent copy was acknowledged
+        assert retained(broker, "/home/fan", 1) == {"/home/fan": b"3"}
+    finally:
+        session.stop()
+
+
+def test_batch_completes_when_acks_beat_publish():
+    session = offline_session()
+    batch = session.publish_batch([("/home/led", "ON"), ("/home/fan", "80")], name="evening")
+    assert batch.done and batch.failed == []
+    assert session._batch_mids == {} and session._early_acks == {}
+    session.publish("/home/led", "OFF", qos=1)  # Plain publishes leave nothing behind
+    assert session._early_acks == {}
+
+
+def test_batch_reports_refused_topics():
+    session = offline_session(reason_code=ReasonCode(PacketTypes.PUBACK, identifier=0x87))  # Not authorized
+    batch = session.publish_batch([("/home/led", "ON")])
+    assert batch.done and batch.failed == ["/home/led"]
+
+
+def test_batch_completes_on_later_acks():
+    session = offline_session(ack=False)
+    batch = session.publish_batch([("/home/led", "ON"), ("/home/fan", "80")])
+    assert not batch.done
+    for mid in session.client.mids:
+        session._on_publish(session.client, None, mid)
+    assert batch.done and batch.failed == []
+
+
+def test_alias_is_announced_only_by_a_publish_paho_accepted():
+    session = offline_session(topic_aliases=True, refuse=1)
+    assert not session.publish("/home/fan", "80", qos=1)  # Refused: waits in the outbox
+    session.publish("/home/fan", "90", qos=1)
+    session.publish("/home/fan", "100", qos=1)
+    assert session.client.topics == ["/home/fan", "/home/fan", ""]
+
+
+def test_batch_acked_by_broker(broker):
+    session = started(MqttSession(broker.host, broker.port, client_id="hub", max_inflight=10))
+    try:
+        batch = session.publish_batch([(f"/homes/home{i}/led", "ON") for i in range(200)], name="all_on")
+        assert batch.wait(2) and batch.failed == []
+    finally:
+        session.stop()
+
+
+def test_inflight_limit_follows_receive_maximum():
+    session = MqttSession("127.0.0.1", 1, max_inflight=100)
+    session._receive_maximum = 10
+    session._limit_inflight()
+    assert session.client.max_inflight_messages == 10
+    session._receive_maximum = None
+    session._limit_inflight()
+    assert session.client.max_inflight_messages == 100
+
+
+def test_publish_on_a_lost_connection_is_delivered_once(broker):
+    session = started(MqttSession(broker.host, broker.port, client_id="hub", min_backoff=0.5, max_backoff=0.5))
+    try:
+        broker.drop_connections()
+        deadline = time.time() + 2
+        while session.connected and time.time() < deadline:
+            time.sleep(0.01)
+        received = queue.Queue()
+        watcher = connect(broker, "watcher", received, subscribe="/home/#")
+        # The window before the session notices the drop: paho has no socket but keeps QoS 1 messages
+        session.connected = True
+        session.publish("/home/fan", "80", qos=1)
+        batch = session.publish_batch([("/home/led", "ON")], name="evening")
+        assert session.stats()["outbox"] == 0
+        assert batch.wait(3) and batch.failed == []
+        time.sleep(0.2)
+        close(watcher)
+        delivered = []
+        while not received.empty():
+            msg = received.get()
+            delivered.append((msg.topic, msg.payload))
+        assert sorted(delivered) == [("/home/fan", b"80"), ("/home/led", b"ON")]
+    finally:
+        session.stop()
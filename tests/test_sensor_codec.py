@@ -0,0 +1,79 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from sensor_codec import (CONTENT_TYPE, FORMAT_BATCH, FORMAT_TEXT, READERS_TOPIC, SensorBatcher, decode_batch,
+                          encode_batch, format_value, is_batch)
+
+
+class RecordingSession:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False, content_type=None):
+        self.published.append((topic, payload, content_type))
+
+
+def advert(reader_id, *formats):
+    return SimpleNamespace(topic=f"{READERS_TOPIC}/{reader_id}", payload=json.dumps({"formats": list(formats)}))
+
+
+def test_round_trip():
+    readings = [(1700000000.0, 21.5), (1700000000.25, 21.75), (1700000059.999, -3.0)]
+    frame = encode_batch(readings)
+    assert is_batch(frame) and is_batch(frame, CONTENT_TYPE)
+    decoded = decode_batch(frame)
+    assert [t for t, _ in decoded] == pytest.approx([t for t, _ in readings], abs=1e-3)
+    assert [format_value(v) for _, v in decoded] == ["21.5", "21.75", "-3"]
+
+
+def test_text_is_not_a_batch():
+    assert not is_batch(b"21.5")
+    assert not is_batch(b"21.5", "text/plain")
+
+
+@pytest.mark.parametrize("frame", [
+    b"",
+    encode_batch([(0.0, 1.0), (1.0, 2.0)])[:-1],          # Truncated reading
+    encode_batch([(0.0, 1.0)]) + b"\x00",                 # Trailing bytes
+    b"XX" + encode_batch([(0.0, 1.0)])[2:],               # Wrong magic
+    encode_batch([(0.0, 1.0)])[:10],                      # Truncated header
+])
+def test_bad_frames_raise_value_error(frame):
+    with pytest.raises(ValueError):
+        decode_batch(frame)
+
+
+def test_encode_refuses_empty_batches():
+    with pytest.raises(ValueError):
+        encode_batch([])
+
+
+def test_text_until_every_reader_accepts_batches():
+    session = RecordingSession()
+    batcher = SensorBatcher(session, max_batch=2)
+    batcher.add("/home/temp", 21.5, 1.0)  # No reader has advertised yet
+    batcher.on_message(None, None, advert("dashboard", FORMAT_TEXT, FORMAT_BATCH))
+    batcher.on_message(None, None, advert("legacy", FORMAT_TEXT))
+    batcher.add("/home/temp", 22.0, 2.0)
+    assert session.published == [("/home/temp", "21.5", None), ("/home/temp", "22", None)]
+
+
+def test_batches_once_all_readers_accept_them():
+    session = RecordingSession()
+    batcher = SensorBatcher(session, max_batch=2)
+    batcher.on_message(None, None, advert("dashboard", FORMAT_TEXT, FORMAT_BATCH))
+    batcher.add("/home/temp", 21.5, 1.0)
+    batcher.add("/home/temp", 22.0, 2.0)
+    ((topic, payload, content_type),) = session.published
+    assert content_type == CONTENT_TYPE and decode_batch(payload) == [(1.0, 21.5), (2.0, 22.0)]
+
+
+def test_pending_readings_fall_back_to_text_when_a_legacy_reader_appears():
+    session = RecordingSession()
+    batcher = SensorBatcher(session, max_batch=10)
+    batcher.on_message(None, None, advert("dashboard", FORMAT_BATCH))
+    batcher.add("/home/temp", 21.5, 1.0)
+    batcher.on_message(None, None, advert("legacy", FORMAT_TEXT))
+    assert session.published == [("/home/temp", "21.5", None)]
@@ -0,0 +1,109 @@
+import numpy as np
+
+from device_registry import DeviceRegistry
+from home_controller import HomeController
+from sensor_series import RingBuffer, SensorHistory, SensorSeries, decimate
+
+SMALL_LEVELS = (("raw", 0, 100), ("1min", 60, 1000), ("1h", 3600, 1000))
+
+
+def fill(series, seconds, start=0):
+    for t in range(start, start + seconds):
+        series.append(float(t), float(t % 60))
+
+
+def test_ring_wraps_and_keeps_order():
+    ring = RingBuffer(4)
+    for t in range(6):
+        ring.append(float(t), float(t))
+    times, values = ring.window(0, 10)
+    assert times.tolist() == [2, 3, 4, 5]
+    assert ring.append(1.0, 0.0) is False  # Older than the newest row
+    assert ring.out_of_order == 1 and len(ring) == 4
+
+
+def test_coarse_levels_get_bucket_means():
+    series = SensorSeries(levels=SMALL_LEVELS)
+    fill(series, 150)
+    times, values = series.levels[1][2].window(0, 1000)
+    assert times.tolist() == [0, 60]  # The third minute is still being filled
+    assert values.tolist() == [29.5, 29.5]
+
+
+def test_old_window_falls_back_to_a_coarser_level():
+    series = SensorSeries(levels=SMALL_LEVELS)
+    fill(series, 600)  # The raw ring only keeps the last 100 seconds
+    times, _ = series.window(0, 299)
+    assert len(times) == 5  # One point per minute from the 1min level
+    times, _ = series.window(550, 599)
+    assert len(times) == 50  # Recent windows still come from raw
+
+
+def test_time_range_spans_every_level():
+    series = SensorSeries(levels=SMALL_LEVELS)
+    fill(series, 600)
+    first, last = series.time_range()
+    assert (first, last) == (0, 599)
+    assert len(series.window(first, first + 120)[0])
+
+
+def test_partial_buckets_survive_a_restart(tmp_path):
+    series = SensorSeries(tmp_path, "temp", levels=SMALL_LEVELS)
+    fill(series, 90)  # Minute 1 is half full when the process stops
+    series.flush()
+    reopened = SensorSeries(tmp_path, "temp", levels=SMALL_LEVELS)
+    fill(reopened, 30, start=90)
+    reopened.append(120.0, 0.0)  # First reading of minute 2 closes minute 1
+    times, values = reopened.levels[1][2].window(0, 1000)
+    assert times.tolist() == [0, 60]
+    assert values.tolist() == [29.5, 29.5]
+
+
+def test_out_of_order_readings_are_counted():
+    series = SensorSeries(levels=SMALL_LEVELS)
+    fill(series, 90)
+    assert series.append(30.0, 99.0) is False  # A late reading, e.g. from a delayed batch
+    assert series.out_of_order == 1
+    assert 99.0 not in series.levels[0][2].window(0, 1000)[1]
+
+
+def test_history_files_do_not_collide(tmp_path):
+    history = SensorHistory(str(tmp_path))
+    history.record("a/b", 1.0, 10.0)
+    history.record("a_b", 2.0, 10.0)
+    history.flush()
+    reopened = SensorHistory(str(tmp_path))
+    assert reopened.get("a/b").window(0, 100)[1].tolist() == [1.0]
+    assert reopened.get("a_b").window(0, 100)[1].tolist() == [2.0]
+    assert len(list(tmp_path.iterdir())) == 2 * len(reopened.get("a/b").levels)
+
+
+def test_decimate_keeps_peaks():
+    times = np.arange(1000.0)
+    values = np.zeros(1000)
+    values[500] = 9
+    out_times, out_values = decimate(times, values, 100)
+    assert len(out_times) <= 100
+    assert out_values.max() == 9
+
+
+class RecordingClient:
+    def publish(self, topic, payload, qos=0, retain=False):
+        pass
+
+
+def test_every_reading_is_recorded_even_when_rendering_coalesces():
+    registry = DeviceRegistry({"devices": [{"id": "temp", "type": "temperature", "topic": "/rooms/+/temp"}]})
+    history = SensorHistory()
+    controller = HomeController(registry, RecordingClient(), history=history)
+    rendered = {}
+    controller.on_receive = lambda topic, payload, received, older: rendered.update({topic: payload})
+    for value in ("20.5", "21.0", "21.5"):
+        controller.receive("/rooms/kitchen/temp", value.encode())
+    controller.publisher.stop(flush=False)
+    assert rendered == {"/rooms/kitchen/temp": "21.5"}
+    assert "temp:kitchen" not in registry.devices  # Still created only when the message is applied
+    times, values = history.get("temp:kitchen").window(0, 1e12)
+    assert values.tolist() == [20.5, 21.0, 21.5]
+    history.record("temp:kitchen", 19.0, times[0])  # Older than the newest reading
+    assert controller.stats()["out_of_order"] == 1
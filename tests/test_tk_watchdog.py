@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from tk_watchdog import TkWatchdog
+
+
+class FakeRoot:
+    """Holds root.after callbacks until the test runs them, like a Tk loop that is busy."""
+
+    def __init__(self):
+        self.pending = {}
+        self._next_id = 0
+
+    def after(self, ms, func):
+        self._next_id += 1
+        self.pending[self._next_id] = func
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        pending, self.pending = self.pending, {}
+        for func in pending.values():
+            func()
+
+
+@pytest.fixture
+def watchdog():
+    watchdog = TkWatchdog(FakeRoot(), interval_ms=20, threshold_ms=100, sample_ms=10)
+    watchdog.start()
+    yield watchdog
+    watchdog.stop()
+
+
+def refresh_sensors(seconds):
+    time.sleep(seconds)  # Blocking work on the Tk thread
+
+
+def test_blocked_callback_is_named_in_the_stall(watchdog):
+    watchdog.watch(refresh_sensors)(0.4)
+    watchdog.root.run_pending()  # The heartbeat finally fires
+    (stall,) = watchdog.stalls
+    assert stall["callback"] == "refresh_sensors"
+    assert stall["lag_ms"] >= 300 and stall["samples"] > 0
+    assert any(frame.startswith("refresh_sensors (test_tk_watchdog.py:") for frame in stall["stack"])
+    (stats,) = watchdog.slowest()
+    assert (stats.name, stats.count, stats.slow) == ("refresh_sensors", 1, 1)
+    assert "in refresh_sensors" in watchdog.report()
+
+
+def test_fast_callbacks_are_timed_without_stalls(watchdog):
+    handler = watchdog.watch(lambda: None, name="on_message")
+    for _ in range(3):
+        handler()
+        watchdog.root.run_pending()
+    assert watchdog.stalls == [] and watchdog.callbacks["on_message"].count == 3
+    assert watchdog.profile()["lag_ms"]["max"] < 100
@@ -0,0 +1,73 @@
+import os
+import warnings
+
+import pytest
+
+from tts_cache import ToneBackend, TtsCache
+
+
+class CountingBackend(ToneBackend):
+    def __init__(self):
+        super().__init__(seconds_per_char=0.005)
+        self.synthesized = []
+
+    def synthesize(self, text, lang):
+        self.synthesized.append(text)
+        return super().synthesize(text, lang)
+
+
+@pytest.fixture
+def backend():
+    return CountingBackend()
+
+
+@pytest.fixture(autouse=True)
+def quiet_pydub():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # No ffmpeg here; WAV decodes without it
+        yield
+
+
+def test_miss_then_hit(tmp_path, backend):
+    cache = TtsCache(backend, cache_dir=str(tmp_path))
+    assert not cache.contains("تم تشغيل الضوء")
+    path = cache.get_file("تم تشغيل الضوء")
+    assert cache.contains("تم تشغيل الضوء") and os.path.exists(path)
+    assert cache.get_file("تم تشغيل الضوء") == path
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert backend.synthesized == ["تم تشغيل الضوء"]
+
+
+def test_languages_are_cached_separately(tmp_path, backend):
+    cache = TtsCache(backend, cache_dir=str(tmp_path))
+    assert cache.get_file("OK", "ar") != cache.get_file("OK", "en")
+    assert cache.misses == 2
+
+
+def test_cache_survives_a_restart(tmp_path, backend):
+    TtsCache(backend, cache_dir=str(tmp_path)).get_file("مرحبا")
+    cache = TtsCache(backend, cache_dir=str(tmp_path))
+    assert cache.contains("مرحبا")
+    cache.get_audio("مرحبا")
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert backend.synthesized == ["مرحبا"]
+
+
+def test_hot_phrases_are_decoded_once(tmp_path, backend):
+    cache = TtsCache(backend, cache_dir=str(tmp_path), memory_items=1)
+    first = cache.get_audio("مرحبا")
+    assert cache.get_audio("مرحبا") is first
+    cache.get_audio("وداعا")  # Pushes the first phrase out of memory, but not off the disk
+    assert cache.get_audio("مرحبا") is not first
+    assert backend.synthesized == ["مرحبا", "وداعا"]
+
+
+def test_least_recently_used_files_are_evicted(tmp_path, backend):
+    cache = TtsCache(backend, cache_dir=str(tmp_path))
+    size = os.path.getsize(cache.get_file("one"))
+    cache.max_bytes = 2 * size
+    cache.get_file("two")
+    os.utime(cache.path_for("one", "ar"), (0, 0))  # Used long ago
+    cache.get_file("six")
+    assert not cache.contains("one")
+    assert cache.contains("two") and cache.contains("six")
@@ -0,0 +1,63 @@
+import threading
+import time
+import warnings
+
+import pytest
+
+from tts_cache import ToneBackend, TtsCache
+from tts_stream import StreamingSpeaker
+
+TEXT = "تم تشغيل الضوء. " * 12  # Twelve chunks, more than the queue holds
+
+
+@pytest.fixture(autouse=True)
+def quiet_pydub():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # No ffmpeg here; WAV decodes without it
+        yield
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TtsCache(ToneBackend(seconds_per_char=0.001), cache_dir=str(tmp_path))
+
+
+def producers_alive():
+    return [t for t in threading.enumerate() if t.name == "TtsStream"]
+
+
+def test_streamed_phrase_is_cached_for_the_repeat(cache):
+    played = []
+    speaker = StreamingSpeaker(cache, play_func=played.append)
+    first = speaker.speak(TEXT)
+    assert not first["cached"] and first["chunks"] == 12 and len(played) == 12
+    second = speaker.speak(TEXT)
+    assert second["cached"] and len(played) == 13
+    assert len(played[-1]) == pytest.approx(sum(len(audio) for audio in played[:12]), abs=12)
+
+
+def test_failed_playback_does_not_leak_the_producer(cache):
+    def play(audio):
+        raise RuntimeError("no audio device")
+
+    speaker = StreamingSpeaker(cache, play_func=play)
+    with pytest.raises(RuntimeError):
+        speaker.speak(TEXT)
+    deadline = time.time() + 2
+    while producers_alive() and time.time() < deadline:
+        time.sleep(0.01)
+    assert producers_alive() == []
+    assert not cache.contains(TEXT)
+
+
+def test_synthesis_errors_reach_the_caller(cache):
+    class FailingBackend(ToneBackend):
+        def stream(self, text, lang):
+            yield self.synthesize("first.", lang)
+            raise OSError("network down")
+
+    cache.backend = FailingBackend()
+    played = []
+    with pytest.raises(OSError):
+        StreamingSpeaker(cache, play_func=played.append).speak(TEXT)
+    assert len(played) == 1 and not cache.contains(TEXT)
@@ -0,0 +1,22 @@
+from ui_queue import UiUpdateQueue
+
+
+def test_post_keeps_newest_per_key_and_call_keeps_order():
+    queue = UiUpdateQueue(root=None)
+    applied = []
+    queue.post("fan", applied.append, "fan 1")
+    queue.post("fan", applied.append, "fan 2")
+    queue.call(applied.append, "line 1")
+    queue.call(applied.append, "line 2")
+    queue.drain()
+    assert applied == ["line 1", "line 2", "fan 2"]
+    assert (queue.posted_count, queue.applied_count) == (4, 3)
+
+
+def test_failing_update_does_not_stop_the_drain():
+    queue = UiUpdateQueue(root=None)
+    applied = []
+    queue.call(lambda: 1 / 0)
+    queue.call(applied.append, "after")
+    queue.drain()
+    assert applied == ["after"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from vad import EnergyVAD, _to_int16
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=8000, hz=220):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return amplitude * np.sin(2 * np.pi * hz * t)
+
+
+def noise(seconds, level=30, seed=0):
+    return np.random.default_rng(seed).normal(0, level, int(seconds * RATE))
+
+
+def audio(*parts):
+    samples = np.clip(np.concatenate(parts), -32768, 32767).astype("<i2")
+    return sr.AudioData(samples.tobytes(), RATE, 2)
+
+
+@pytest.fixture
+def vad():
+    return EnergyVAD()
+
+
+def test_silence_is_dropped(vad):
+    assert vad.process(audio(noise(1.0))) is None
+    assert vad.stats() == {"forwarded": 0, "dropped": 1}
+
+
+def test_voiced_burst_is_kept_and_trimmed(vad):
+    kept = vad.process(audio(noise(1.0), tone(0.6) + noise(0.6, seed=1), noise(1.0, seed=2)))
+    assert kept is not None
+    # The 0.6 s burst plus 150 ms of padding on each side, to the frame
+    assert len(kept.frame_data) // 2 == pytest.approx(0.9 * RATE, abs=2 * 320)
+    assert vad.stats() == {"forwarded": 1, "dropped": 0}
+
+
+def test_high_zcr_hiss_is_dropped(vad):
+    hiss = noise(0.6, level=4000, seed=3)  # Loud, but crosses zero about every other sample
+    assert vad.process(audio(noise(1.0), hiss, noise(1.0, seed=4))) is None
+
+
+def test_bursts_shorter_than_min_speech_are_dropped(vad):
+    assert vad.process(audio(noise(1.0), tone(0.1), noise(1.0, seed=5))) is None
+
+
+def test_padding_around_speech_is_kept_at_the_edges(vad):
+    frame = RATE * vad.frame_ms // 1000
+    padding = RATE * vad.padding_ms // 1000
+    samples = np.concatenate([noise(1.0), tone(0.5), noise(1.0, seed=6)]).astype(np.int16)
+    start, end = vad.speech_bounds(samples, RATE)
+    assert start == pytest.approx(RATE - padding, abs=frame)
+    assert end == pytest.approx(int(1.5 * RATE) + padding, abs=frame)
+    # Speech right at the start or end of the segment is clamped, not cut
+    start, end = vad.speech_bounds(np.concatenate([tone(0.5), noise(1.0)]).astype(np.int16), RATE)
+    assert start == 0
+    start, end = vad.speech_bounds(np.concatenate([noise(1.0), tone(0.5)]).astype(np.int16), RATE)
+    assert end == int(1.5 * RATE)
+
+
+def test_sample_widths_are_scaled_to_int16():
+    assert list(_to_int16(bytes([0, 128, 255]), 1)) == [-32768, 0, 127 << 8]
+    assert list(_to_int16(np.array([1 << 30], dtype="<i4").tobytes(), 4)) == [1 << 14]
+    with pytest.raises(ValueError):
+        _to_int16(b"\x00" * 5, 5)
@@ -0,0 +1,73 @@
+import pytest
+
+from view_model import ViewModel
+
+
+class FakeWidget:
+    """Records config(), set() and Entry edits the way Tk widgets would apply them."""
+
+    def __init__(self):
+        self.calls = []
+        self.options = {}
+        self.text = ""
+
+    def config(self, **options):
+        self.calls.append(options)
+        self.options.update(options)
+
+    def set(self, value):
+        self.calls.append({"value": value})
+
+    def delete(self, first, last):
+        self.text = ""
+
+    def insert(self, index, text):
+        self.text = text
+
+
+@pytest.fixture
+def view():
+    return ViewModel()
+
+
+def test_unchanged_values_are_skipped(view):
+    label = FakeWidget()
+    assert view.config(label, text="Status: ON", style="Gauge.TLabel")
+    assert not view.config(label, text="Status: ON")
+    assert view.config(label, text="Status: ON", style="StaleGauge.TLabel")
+    assert label.calls == [{"text": "Status: ON", "style": "Gauge.TLabel"}, {"style": "StaleGauge.TLabel"}]
+    assert (view.applied_count, view.skipped_count) == (2, 1)
+
+
+def test_widgets_are_tracked_separately(view):
+    first, second = FakeWidget(), FakeWidget()
+    view.config(first, text="21.5°C")
+    assert view.config(second, text="21.5°C")
+
+
+def test_status_text_returns_after_another_message(view):
+    status = FakeWidget()
+    view.config(status, text="Last update: 12:00:00")
+    view.config(status, text="Offline for 3 s")
+    assert view.config(status, text="Last update: 12:00:00")
+    assert status.options["text"] == "Last update: 12:00:00"
+
+
+def test_scale_and_entry(view):
+    scale, entry = FakeWidget(), FakeWidget()
+    assert view.set_value(scale, 120)
+    assert not view.set_value(scale, 120)
+    assert view.set_text(entry, "120")
+    assert not view.set_text(entry, "120")
+    assert entry.text == "120" and scale.calls == [{"value": 120}]
+
+
+def test_note_invalidates_what_the_user_changed(view):
+    scale, entry = FakeWidget(), FakeWidget()
+    view.set_value(scale, 120)
+    view.set_text(entry, "120")
+    view.note(scale, "value", 40)  # The user dragged the slider
+    view.note(entry, "text", "4")  # and is typing
+    assert view.set_value(scale, 120)  # The broker's value must be drawn again
+    assert view.set_text(entry, "120")
+    assert not view.set_value(scale, 120)
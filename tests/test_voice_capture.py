@@ -0,0 +1,59 @@
+import time
+
+import speech_recognition as sr
+
+from voice_capture import ContinuousCapture
+
+
+class StrictSource(sr.AudioSource):
+    """Silence at speaking pace; like sr.Microphone, it can't be opened twice at once."""
+
+    SAMPLE_RATE = 16000
+    SAMPLE_WIDTH = 2
+    CHUNK = 1024
+
+    def __init__(self):
+        self.stream = None
+        self.opened = 0
+
+    def __enter__(self):
+        assert self.stream is None
+        self.stream = self
+        self.opened += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
+
+    def read(self, size):
+        time.sleep(size / self.SAMPLE_RATE)
+        return b"\0" * size * self.SAMPLE_WIDTH
+
+
+def test_quick_pause_and_resume_reopens_the_source():
+    source = StrictSource()
+    capture = ContinuousCapture(sr.Recognizer(), source=source, calibration_seconds=0.1)
+    capture.start()  # Calibration opens the source once, the listener a second time
+    deadline = time.time() + 2
+    while source.opened < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    capture.stop()
+    capture.start()  # Right away, while the first listener still holds the source
+    deadline = time.time() + 3
+    while source.opened < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    try:
+        assert capture.running
+        assert source.opened == 3
+    finally:
+        capture.stop()
+
+
+def test_muted_phrases_are_dropped():
+    capture = ContinuousCapture(recognizer=None)
+    capture.muted = True
+    capture._on_phrase(None, "our own voice")
+    capture.muted = False
+    capture._on_phrase(None, "a command")
+    assert capture.get(timeout=0) == "a command"
+    assert (capture.captured_count, capture.dropped_count) == (1, 1)
@@ -0,0 +1,83 @@
+import pytest
+
+
+@pytest.fixture
+def processor(voice_control):
+    """An ArabicSpeechProcessor with intents only; publishes and replies are recorded."""
+    processor = voice_control.ArabicSpeechProcessor.__new__(voice_control.ArabicSpeechProcessor)
+    processor.intents = voice_control.IntentEngine.load()
+    processor.published = []
+    processor.replies = []
+    processor._publish = lambda device, topic, payload, room=None: processor.published.append((topic, payload))
+    processor._respond = processor.replies.append
+    return processor
+
+
+def test_fan_speed_in_range_is_published(processor, voice_control):
+    processor._execute_command("اضبط المروحة على 120")
+    assert processor.published == [(voice_control.FAN_TOPIC, "120")]
+
+
+def test_fan_speed_above_max_is_refused(processor):
+    processor._execute_command("سرعة المروحة 999999999999999999999")
+    assert processor.published == []
+    assert "255" in processor.replies[0]
+
+
+def test_fan_speed_uses_the_room_fan_limit(processor, voice_control):
+    processor.control_fan_set(255, room="kitchen")
+    processor.control_fan_set(256, room="kitchen")
+    assert processor.published == [("/rooms/kitchen/fan", "255")]
+
+
+def test_shapers_are_imported_once_across_threads(voice_control, monkeypatch):
+    import importlib
+    import threading
+    import time
+
+    imported = []
+
+    def slow_import(name):
+        imported.append(name)
+        time.sleep(0.05)  # Wide window for a second thread to start the same import
+        return importlib.import_module(name)
+
+    monkeypatch.setattr(voice_control, "_bidi", None)
+    monkeypatch.setattr(voice_control.profiler, "import_module", slow_import)
+    threads = [threading.Thread(target=voice_control.shape_arabic, args=("مرحبا",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert imported == ["arabic_reshaper", "bidi.algorithm"]
+
+
+def test_speaking_mutes_every_room(processor, voice_control):
+    from types import SimpleNamespace
+
+    from voice_events import EventEmitter
+    from voice_rooms import RoomVoicePool
+
+    rooms = RoomVoicePool([])
+    heard = []
+    processor.capture = SimpleNamespace(muted=False)
+    processor.rooms = rooms
+    processor.events = EventEmitter()
+
+    def speak(text, lang):
+        heard.append((processor.capture.muted, rooms._muted_until.value))
+        return {"cached": True, "time_to_first_audio": 0.0, "synthesis_time": 0.0, "total_time": 0.0, "chunks": 1}
+
+    processor.speaker = SimpleNamespace(speak=speak)
+    processor._speak("تم تشغيل الأضواء")
+    assert heard == [(True, float("inf"))]
+    assert not processor.capture.muted and rooms._muted_until.value < float("inf")
+
+
+def test_fan_on_and_off_publish_the_configured_range(processor, voice_control, monkeypatch):
+    processor.control_fan_on()
+    processor.control_fan_off()
+    assert processor.published == [(voice_control.FAN_TOPIC, "255"), (voice_control.FAN_TOPIC, "0")]
+    monkeypatch.setitem(voice_control.registry.devices["fan"].options, "max", 1023)
+    processor.control_fan_on()
+    assert processor.published[-1] == (voice_control.FAN_TOPIC, "1023")
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import threading
+
+from voice_console import StreamReader
+
+CHILD = """
+import sys
+for n in range(500):
+    stream = sys.stderr if n % 3 == 0 else sys.stdout
+    stream.write(f"line {n}\\n")
+    stream.flush()
+"""
+
+
+def test_interleaved_stdout_and_stderr_are_all_delivered():
+    closed = threading.Event()
+    close_calls = []
+
+    def on_close():
+        close_calls.append(True)
+        closed.set()
+
+    reader = StreamReader(on_close=on_close)
+    child = subprocess.Popen([sys.executable, "-c", CHILD], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             text=True, encoding="utf-8")
+    reader.add(child.stdout)
+    reader.add(child.stderr, prefix="ERR: ")
+    child.wait(10)
+    assert closed.wait(5)
+    for thread in reader._threads:
+        thread.join(2)
+        assert not thread.is_alive()
+    lines = reader.read_available()
+    assert sorted(lines) == sorted(f"{'ERR: ' if n % 3 == 0 else ''}line {n}\n" for n in range(500))
+    # Each pipe keeps its own order
+    assert [line for line in lines if line.startswith("ERR: ")] == [f"ERR: line {n}\n" for n in range(0, 500, 3)]
+    assert close_calls == [True] and reader.read_available() == []
+    child.stdout.close()
+    child.stderr.close()
@@ -0,0 +1,56 @@
+import queue
+import socket
+import threading
+import time
+
+from voice_events import EventEmitter, EventServer
+
+
+def test_events_arrive_in_order():
+    received = queue.Queue()
+    server = EventServer(received.put)
+    emitter = EventEmitter(server.address)
+    try:
+        emitter.emit("utterance", text="شغل الضوء")
+        emitter.emit("intent", name="led_on")
+        events = [received.get(timeout=2) for _ in range(2)]
+        assert [e["event"] for e in events] == ["utterance", "intent"]
+        assert events[0]["text"] == "شغل الضوء" and events[0]["ts"] <= events[1]["ts"]
+    finally:
+        emitter.close()
+        server.close()
+
+
+def test_slow_reader_does_not_close_the_channel():
+    listener = socket.create_server(("127.0.0.1", 0))
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    emitter = EventEmitter("%s:%d" % listener.getsockname())
+    emitter._sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)  # Fill the socket buffers quickly
+    conn, _ = listener.accept()
+    count = 2000
+    sender = threading.Thread(target=lambda: [emitter.emit("tick", n=n, pad="x" * 200) for n in range(count)])
+    sender.start()
+    time.sleep(2.5)  # The dashboard is busy longer than the connect timeout; sends block meanwhile
+    try:
+        with conn, conn.makefile("r", encoding="utf-8") as lines:
+            seen = sum(1 for _, line in zip(range(count), lines))
+        sender.join(2)
+        assert seen == count and emitter._sock is not None
+    finally:
+        emitter.close()
+        listener.close()
+
+
+def test_closed_dashboard_disables_the_channel(capsys):
+    listener = socket.create_server(("127.0.0.1", 0))
+    emitter = EventEmitter("%s:%d" % listener.getsockname())
+    conn, _ = listener.accept()
+    conn.close()
+    listener.close()
+    deadline = time.time() + 2
+    while emitter._sock is not None and time.time() < deadline:
+        emitter.emit("tick")
+        time.sleep(0.01)
+    assert emitter._sock is None
+    assert "Event channel closed" in capsys.readouterr().out
+    emitter.emit("tick")  # A no-op from now on
@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+
+from voice_pipeline import VoicePipeline
+
+
+def make_pipeline(acted, recognize=lambda audio: audio, workers=2):
+    return VoicePipeline(queue.Queue(), recognize, match=lambda text: text.upper(),
+                         act=lambda text, intent: acted.append(intent), speak=lambda text: None,
+                         workers=workers)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_results_are_acted_on_in_capture_order():
+    acted = []
+    # Earlier phrases take longer to recognize, so they finish out of order
+    pipeline = make_pipeline(acted, recognize=lambda audio: time.sleep(0.05 * (3 - int(audio[-1]))) or audio,
+                             workers=3)
+    pipeline.start()
+    for i in range(3):
+        pipeline.source.put(f"phrase{i}")
+    assert wait_for(lambda: len(acted) == 3)
+    pipeline.stop()
+    assert acted == ["PHRASE0", "PHRASE1", "PHRASE2"]
+
+
+def test_failed_recognition_does_not_block_later_phrases():
+    acted = []
+
+    def recognize(audio):
+        if audio == "bad":
+            raise RuntimeError("not understood")
+        return audio
+
+    errors = []
+    pipeline = make_pipeline(acted, recognize=recognize)
+    pipeline.on_error = lambda stage, error: errors.append(stage)
+    pipeline.start()
+    for audio in ("bad", "good"):
+        pipeline.source.put(audio)
+    assert wait_for(lambda: acted == ["GOOD"])
+    pipeline.stop()
+    assert errors == ["recognize"]
+
+
+def test_restart_after_stop_keeps_working():
+    acted = []
+    pipeline = make_pipeline(acted)
+    pipeline.start()
+    pipeline.source.put("first")
+    assert wait_for(lambda: acted == ["FIRST"])
+    pipeline.stop()
+    pipeline.start()
+    pipeline.source.put("second")
+    assert wait_for(lambda: acted == ["FIRST", "SECOND"])
+    pipeline.stop()
+
+
+def test_restart_while_a_stage_is_still_busy_does_not_duplicate_it():
+    speaking = threading.Event()
+    release = threading.Event()
+    spoken = []
+
+    def speak(text):
+        spoken.append(text)
+        speaking.set()
+        release.wait(5)  # A reply longer than stop() waits for
+
+    pipeline = VoicePipeline(queue.Queue(), lambda audio: audio, match=lambda text: text,
+                             act=lambda text, intent: None, speak=speak)
+    pipeline.start()
+    pipeline.say("long reply")
+    assert speaking.wait(2)
+    pipeline.stop(timeout=0.1)
+    pipeline.start()
+    release.set()
+    time.sleep(0.5)  # The old speak stage finishes its reply and exits
+    speakers = [t for t in threading.enumerate() if t.name.startswith("voice-speak-")]
+    pipeline.say("next")
+    assert wait_for(lambda: spoken == ["long reply", "next"])
+    pipeline.stop()
+    assert len(speakers) == 1
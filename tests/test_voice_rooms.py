@@ -0,0 +1,50 @@
+import multiprocessing
+import queue
+import threading
+
+import pytest
+
+from bench_rooms import write_phrases
+from voice_rooms import RoomVoicePool, room_worker
+
+
+@pytest.fixture(scope="module")
+def room_wav(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("rooms") / "kitchen.wav")
+    write_phrases(path, 3, seed=0)
+    return path
+
+
+def run_worker(path, muted_until):
+    """Run room_worker in this process over a WAV file; returns its recognized texts and counters."""
+    results = queue.Queue()
+    muted = multiprocessing.Value("d", muted_until)
+    room_worker({"room": "kitchen", "source": "wav", "path": path}, results, threading.Event(),
+                threading.Event(), muted, recognizer=("scripted", {"transcripts": ["تشغيل الاضواء"]}),
+                calibration_seconds=0.5)
+    texts, counts = [], None
+    while not results.empty():
+        result = results.get()
+        if result["event"] == "result":
+            texts.append(result["text"])
+        elif result["event"] == "ended":
+            counts = result
+    return texts, counts
+
+
+def test_worker_recognizes_while_unmuted(room_wav):
+    texts, counts = run_worker(room_wav, 0.0)
+    assert len(texts) == 3 and counts["muted"] == 0
+
+
+def test_worker_drops_phrases_while_muted(room_wav):
+    texts, counts = run_worker(room_wav, float("inf"))
+    assert texts == [] and counts["phrases"] == 0 and counts["muted"] >= 3  # Dropped before the VAD
+
+
+def test_unmute_keeps_dropping_phrases_that_began_while_muted():
+    pool = RoomVoicePool([])
+    pool.mute()
+    assert pool._muted_until.value == float("inf")
+    pool.unmute()
+    assert 0 < pool._muted_until.value < float("inf")
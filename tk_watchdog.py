@@ -0,0 +1,200 @@
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+from mqtt_metrics import percentiles
+
+
+class CallbackStats:
+    """Timing for one named callback."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0  # Calls longer than the watchdog threshold
+
+    def add(self, seconds, threshold):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if seconds >= threshold:
+            self.slow += 1
+
+
+class TkWatchdog:
+    """Finds out what is freezing the Tk main loop.
+
+    A heartbeat is scheduled with root.after every interval_ms; how late it
+    fires is the loop lag. Callbacks run through run() / watch() are timed
+    by name. A sampler thread checks the heartbeat: once it is more than
+    threshold_ms overdue, the main thread's stack is sampled every
+    sample_ms until the loop comes back, and the stall is recorded with
+    the callback that was running and its most frequent stack.
+    """
+
+    def __init__(self, root, interval_ms=20, threshold_ms=100, sample_ms=10, max_stalls=50, max_samples=30000):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.threshold = threshold_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.max_stalls = max_stalls
+        self.lag_samples = collections.deque(maxlen=max_samples)  # 10 minutes at 20 ms
+        self.callbacks = {}  # name -> CallbackStats
+        self.stalls = []     # Most recent max_stalls stalls
+        self.stacks = {}     # collapsed stack "outer;...;inner" -> sample count
+        self.stall_count = 0
+        self.started = None
+        self.current = None  # Name of the callback running on the Tk thread
+        self._due = 0.0
+        self._after_id = None
+        self._main_ident = threading.main_thread().ident
+        self._stall = None   # {"started", "callback", "stacks"} while the loop is stuck
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        """Start the heartbeat and the sampler thread; call from the Tk thread."""
+        if self._after_id is not None:
+            return
+        self._main_ident = threading.get_ident()
+        self.started = time.time()
+        self._stop.clear()
+        self._schedule()
+        threading.Thread(target=self._sample, name="TkWatchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    # ---------- timing callbacks ----------
+    def run(self, name, func, *args):
+        """Call func(*args) on the Tk thread, timing it under name."""
+        previous = self.current
+        self.current = name
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.current = previous
+            with self._lock:
+                stats = self.callbacks.get(name)
+                if stats is None:
+                    stats = self.callbacks[name] = CallbackStats(name)
+                stats.add(elapsed, self.threshold)
+
+    def watch(self, func, name=None):
+        """Wrap a Tk callback (command=, bind, after) so every call is timed."""
+        name = name or func.__name__
+
+        @functools.wraps(func)
+        def watched(*args):
+            return self.run(name, func, *args)
+        return watched
+
+    # ---------- heartbeat and sampling ----------
+    def _schedule(self):
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def _beat(self):
+        lag = max(0.0, time.perf_counter() - self._due)
+        self.lag_samples.append(lag)
+        with self._lock:
+            stall, self._stall = self._stall, None
+        if stall is not None:
+            self._finish_stall(stall, lag)
+        self._schedule()
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            overdue = time.perf_counter() - self._due
+            if overdue < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._main_ident)
+            if frame is None:
+                continue
+            stack = ";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})"
+                             for f in traceback.extract_stack(frame))
+            del frame
+            with self._lock:
+                if self._stall is None:
+                    self._stall = {"started": time.time() - overdue, "callback": self.current, "stacks": {}}
+                self._stall["stacks"][stack] = self._stall["stacks"].get(stack, 0) + 1
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def _finish_stall(self, stall, lag):
+        top = max(stall["stacks"].items(), key=lambda item: item[1])[0] if stall["stacks"] else ""
+        self.stall_count += 1
+        self.stalls.append({
+            "time": stall["started"],
+            "lag_ms": lag * 1000,
+            "callback": stall["callback"],
+            "samples": sum(stall["stacks"].values()),
+            "stack": top.split(";") if top else [],
+        })
+        del self.stalls[:-self.max_stalls]
+
+    # ---------- reporting ----------
+    def slowest(self, count=10):
+        """CallbackStats ordered by their worst call."""
+        with self._lock:
+            stats = list(self.callbacks.values())
+        return sorted(stats, key=lambda s: s.max, reverse=True)[:count]
+
+    def report(self):
+        """Text summary for the watchdog window."""
+        lag = percentiles(self.lag_samples)
+        lines = [
+            f"Tk loop lag over {len(self.lag_samples)} heartbeats: p50 {lag['p50']:.1f} ms, "
+            f"p95 {lag['p95']:.1f} ms, p99 {lag['p99']:.1f} ms, max {lag['max']:.1f} ms",
+            f"Stalls over {self.threshold * 1000:.0f} ms: {self.stall_count}",
+            "",
+            f"{'Callback':<32}{'calls':>8}{'mean ms':>10}{'max ms':>10}{'slow':>6}",
+        ]
+        for stats in self.slowest(15):
+            lines.append(f"{stats.name[:31]:<32}{stats.count:>8}{stats.total / stats.count * 1000:>10.2f}"
+                         f"{stats.max * 1000:>10.1f}{stats.slow:>6}")
+        for stall in reversed(self.stalls[-5:]):
+            lines.append("")
+            lines.append(f"Stall at {time.strftime('%H:%M:%S', time.localtime(stall['time']))}: "
+                         f"{stall['lag_ms']:.0f} ms in {stall['callback'] or 'Tk event handling'}")
+            lines.extend(f"    {frame}" for frame in stall["stack"][-6:])
+        return "\n".join(lines)
+
+    def profile(self):
+        """Everything recorded, as a JSON-ready dict."""
+        with self._lock:
+            callbacks = {
+                s.name: {"count": s.count, "total_ms": s.total * 1000, "max_ms": s.max * 1000, "slow": s.slow}
+                for s in self.callbacks.values()
+            }
+            stacks = dict(self.stacks)
+        return {
+            "started": self.started,
+            "time": time.time(),
+            "interval_ms": self.interval_ms,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": percentiles(self.lag_samples),
+            "stall_count": self.stall_count,
+            "stalls": list(self.stalls),
+            "callbacks": callbacks,
+            # Collapsed stacks, the input format of flame graph tools
+            "stacks": stacks,
+        }
+
+    def dump(self, path):
+        """Write profile() as JSON; returns the path."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.profile(), f, indent=1)
+        return path
@@ -0,0 +1,175 @@
+import collections
+import hashlib
+import io
+import math
+import os
+import re
+import struct
+import threading
+import wave
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+
+
+class GttsBackend:
+    """Google Text-to-Speech over the network, producing MP3."""
+
+    name = "gtts"
+    format = "mp3"
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def stream(self, text, lang):
+        """Yield MP3 chunks as gTTS synthesizes each part of the text."""
+        from gtts import gTTS
+
+        yield from gTTS(text=text, lang=lang, slow=False).stream()
+
+    def join_chunks(self, chunks):
+        return b"".join(chunks)  # MP3 frames concatenate cleanly
+
+
+class ToneBackend:
+    """Offline stand-in that renders a short beep per phrase as WAV; for tests and benchmarks."""
+
+    name = "tone"
+    format = "wav"
+
+    def __init__(self, sample_rate=16000, seconds_per_char=0.02):
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+
+    def synthesize(self, text, lang):
+        frames = max(1, int(len(text) * self.seconds_per_char * self.sample_rate))
+        samples = (int(3000 * math.sin(2 * math.pi * 440 * i / self.sample_rate)) for i in range(frames))
+        return self._wav(struct.pack(f"<{frames}h", *samples))
+
+    def stream(self, text, lang):
+        """Yield one WAV chunk per sentence."""
+        for part in re.split(r"(?<=[.!?؟،,])\s+", text):
+            if part:
+                yield self.synthesize(part, lang)
+
+    def join_chunks(self, chunks):
+        frames = b""
+        for chunk in chunks:
+            with wave.open(io.BytesIO(chunk), "rb") as wav:
+                frames += wav.readframes(wav.getnframes())
+        return self._wav(frames)
+
+    def _wav(self, frames):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(frames)
+        return buffer.getvalue()
+
+
+class TtsCache:
+    """Content-addressed TTS cache: audio files on disk plus decoded audio in memory.
+
+    Files are keyed by a hash of (text, language, backend) and evicted
+    least-recently-used once the directory grows past max_bytes. The most
+    recently played phrases stay decoded in memory so they can start
+    playing without touching the disk or the decoder.
+    """
+
+    def __init__(self, backend=None, cache_dir=DEFAULT_CACHE_DIR, max_bytes=50 * 1024 * 1024, memory_items=32):
+        self.backend = backend or GttsBackend()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self._decoded = collections.OrderedDict()  # key -> AudioSegment
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, text, lang):
+        digest = hashlib.sha256(f"{self.backend.name}\0{lang}\0{text}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def path_for(self, text, lang):
+        return os.path.join(self.cache_dir, f"{self.key(text, lang)}.{self.backend.format}")
+
+    def contains(self, text, lang="ar"):
+        """True if the phrase can be played without synthesizing it."""
+        return self.key(text, lang) in self._decoded or os.path.exists(self.path_for(text, lang))
+
+    def get_file(self, text, lang="ar"):
+        """Return the path of the synthesized audio, synthesizing on a miss."""
+        path = self.path_for(text, lang)
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)  # Mark as recently used for eviction
+            return path
+
+        self.misses += 1
+        return self.store(text, lang, self.backend.synthesize(text, lang))
+
+    def store(self, text, lang, data):
+        """Write already synthesized audio into the cache and return its path."""
+        path = self.path_for(text, lang)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def get_audio(self, text, lang="ar"):
+        """Return decoded audio for text, from memory when the phrase is hot."""
+        key = self.key(text, lang)
+        with self._lock:
+            if key in self._decoded:
+                self._decoded.move_to_end(key)
+                self.hits += 1
+                return self._decoded[key]
+
+        from pydub import AudioSegment
+
+        audio = AudioSegment.from_file(self.get_file(text, lang), format=self.backend.format)
+        with self._lock:
+            self._decoded[key] = audio
+            while len(self._decoded) > self.memory_items:
+                self._decoded.popitem(last=False)
+        return audio
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def prewarm(self, phrases, lang="ar"):
+        """Synthesize and decode phrases on a background thread."""
+        def worker():
+            for phrase in phrases:
+                try:
+                    self.get_audio(phrase, lang)
+                except Exception as e:
+                    print(f"خطأ في تجهيز الصوت مسبقًا: {e}")  # "Error pre-synthesizing audio"
+
+        thread = threading.Thread(target=worker, name="TtsPrewarm", daemon=True)
+        thread.start()
+        return thread
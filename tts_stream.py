@@ -0,0 +1,112 @@
+import io
+import queue
+import threading
+import time
+
+
+class StreamingSpeaker:
+    """Plays speech chunk by chunk while later chunks are still being synthesized.
+
+    Cached phrases play straight from the TtsCache. Anything else is
+    streamed from the backend: a producer thread pulls audio chunks into a
+    small queue and the caller decodes and plays each one from memory as
+    soon as it arrives. The joined chunks are stored in the cache afterwards,
+    so a repeat of the same text skips synthesis entirely.
+    """
+
+    def __init__(self, cache, play_func=None, history_size=100):
+        self.cache = cache
+        self.play_func = play_func
+        self.history_size = history_size
+        self.history = []  # Metrics for the most recent utterances
+
+    def speak(self, text, lang="ar"):
+        """Speak text and return its timing metrics (seconds)."""
+        started = time.perf_counter()
+        if self.cache.contains(text, lang):
+            audio = self.cache.get_audio(text, lang)
+            first_audio = time.perf_counter()
+            self._play(audio)
+            metrics = {
+                "cached": True,
+                "chunks": 1,
+                "time_to_first_audio": first_audio - started,
+                "synthesis_time": 0.0,
+            }
+        else:
+            metrics = self._speak_streaming(text, lang, started)
+
+        metrics["total_time"] = time.perf_counter() - started
+        self.history.append(metrics)
+        del self.history[:-self.history_size]
+        return metrics
+
+    def _speak_streaming(self, text, lang, started):
+        chunks = queue.Queue(maxsize=4)
+        stop = threading.Event()  # Set once the consumer is done, even if it failed
+        synthesis = {"time": 0.0, "error": None}
+        received = []
+
+        def produce():
+            try:
+                for chunk in self.cache.backend.stream(text, lang):
+                    if not _put(chunks, chunk, stop):
+                        return
+            except Exception as e:
+                synthesis["error"] = e
+            finally:
+                synthesis["time"] = time.perf_counter() - started
+                _put(chunks, None, stop)
+
+        threading.Thread(target=produce, name="TtsStream", daemon=True).start()
+
+        from pydub import AudioSegment
+
+        first_audio = None
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                received.append(chunk)
+                audio = AudioSegment.from_file(io.BytesIO(chunk), format=self.cache.backend.format)
+                if first_audio is None:
+                    first_audio = time.perf_counter()
+                self._play(audio)
+        finally:
+            # A failed decode or playback must not leave the producer blocked on a full queue
+            stop.set()
+            while True:
+                try:
+                    chunks.get_nowait()
+                except queue.Empty:
+                    break
+
+        if synthesis["error"] is not None:
+            raise synthesis["error"]
+        if received:
+            self.cache.store(text, lang, self.cache.backend.join_chunks(received))
+        return {
+            "cached": False,
+            "chunks": len(received),
+            "time_to_first_audio": (first_audio or time.perf_counter()) - started,
+            "synthesis_time": synthesis["time"],
+        }
+
+    def _play(self, audio):
+        if self.play_func is None:
+            from pydub.playback import play
+
+            self.play_func = play
+        self.play_func(audio)
+
+
+def _put(chunks, item, stop):
+    """chunks.put(item), giving up once stop is set; returns True if it was queued."""
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
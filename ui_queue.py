@@ -0,0 +1,75 @@
+import collections
+
+
+class UiUpdateQueue:
+    """Hands widget updates from worker threads to the Tk main loop.
+
+    Worker threads never touch Tk directly. They either post() an update
+    under a key, where only the newest update per key survives until the
+    next frame, or call() something that must run in order (console text).
+    Both containers rely on operations that are atomic under the GIL
+    (dict item assignment/popitem, deque append/popleft), so producers
+    never take a lock.
+
+    With a TkWatchdog, every applied update is timed under its function's name.
+    """
+
+    def __init__(self, root, interval_ms=16, watchdog=None):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.watchdog = watchdog
+        self.posted_count = 0
+        self.applied_count = 0
+        self._latest = {}
+        self._ordered = collections.deque()
+        self._after_id = None
+
+    def post(self, key, func, *args):
+        """Schedule func(*args) for the next frame, replacing any pending update for key."""
+        self._latest[key] = (func, args)
+        self.posted_count += 1
+
+    def call(self, func, *args):
+        """Schedule func(*args) for the next frame without coalescing."""
+        self._ordered.append((func, args))
+        self.posted_count += 1
+
+    def start(self):
+        """Begin draining once per frame on the Tk main loop."""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        """Stop the drain loop."""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def drain(self):
+        """Apply every pending update; must run on the Tk thread."""
+        while True:
+            try:
+                func, args = self._ordered.popleft()
+            except IndexError:
+                break
+            self._apply(func, args)
+        while True:
+            try:
+                _, (func, args) = self._latest.popitem()
+            except KeyError:
+                break
+            self._apply(func, args)
+
+    def _apply(self, func, args):
+        try:
+            if self.watchdog:
+                self.watchdog.run(getattr(func, "__qualname__", repr(func)), func, *args)
+            else:
+                func(*args)
+        except Exception as e:
+            print(f"UI update error: {e}")
+        self.applied_count += 1
+
+    def _tick(self):
+        self.drain()
+        self._after_id = self.root.after(self.interval_ms, self._tick)
@@ -0,0 +1,61 @@
+import tkinter as tk
+
+_UNSET = object()
+
+
+class ViewModel:
+    """What each widget currently shows, so Tk is only touched on a change.
+
+    Handlers describe the state they want (config options, a Scale value,
+    an Entry's text) and the view model compares it with what it rendered
+    last. Repeated values, such as a reconnect replaying retained messages,
+    cost a dict lookup instead of a widget reconfigure and redraw. Values
+    the user changes directly (dragging a slider, typing in an entry) are
+    reported with note() so the next comparison is against what is on
+    screen. Use from the Tk thread only.
+    """
+
+    def __init__(self):
+        self._rendered = {}  # (widget, option) -> value last shown
+        self.applied_count = 0
+        self.skipped_count = 0
+
+    def config(self, widget, **options):
+        """widget.config() with only the options whose value changed; returns True if any did."""
+        changed = {}
+        for option, value in options.items():
+            if self._rendered.get((widget, option), _UNSET) != value:
+                changed[option] = value
+        if not changed:
+            self.skipped_count += 1
+            return False
+        widget.config(**changed)
+        for option, value in changed.items():
+            self._rendered[(widget, option)] = value
+        self.applied_count += 1
+        return True
+
+    def set_value(self, scale, value):
+        """scale.set(value) unless it already shows value."""
+        if self._rendered.get((scale, "value"), _UNSET) == value:
+            self.skipped_count += 1
+            return False
+        scale.set(value)
+        self._rendered[(scale, "value")] = value
+        self.applied_count += 1
+        return True
+
+    def set_text(self, entry, text):
+        """Replace an Entry's text unless it already shows text."""
+        if self._rendered.get((entry, "text"), _UNSET) == text:
+            self.skipped_count += 1
+            return False
+        entry.delete(0, tk.END)
+        entry.insert(0, text)
+        self._rendered[(entry, "text")] = text
+        self.applied_count += 1
+        return True
+
+    def note(self, widget, option, value):
+        """Record a value the user put on screen (option "value" for a Scale, "text" for an Entry)."""
+        self._rendered[(widget, option)] = value
@@ -0,0 +1,80 @@
+import queue
+
+
+class ContinuousCapture:
+    """Keeps the microphone open and queues every completed phrase.
+
+    The microphone is calibrated once at start. After that the recognizer's
+    dynamic energy threshold keeps adapting to the room while
+    speech_recognition's background listener captures phrases on its own
+    thread. Capture therefore never pauses while a previous phrase is being
+    recognized or acted on.
+    """
+
+    def __init__(self, recognizer, source=None, max_queue=10, calibration_seconds=1.0, phrase_time_limit=None):
+        self.recognizer = recognizer
+        self.source = source
+        self.calibration_seconds = calibration_seconds
+        self.phrase_time_limit = phrase_time_limit
+        self.phrases = queue.Queue(maxsize=max_queue)
+        self.muted = False  # Set while our own TTS is playing so it isn't heard as a command
+        self.captured_count = 0
+        self.dropped_count = 0
+        self.calibrated = False
+        self._stop_listening = None
+        self._stopping = None  # Stopper of a listener that may still be closing the microphone
+
+    def start(self):
+        """Start capturing in the background, calibrating only the first time."""
+        if self._stop_listening is not None:
+            return
+        if self._stopping is not None:
+            # A listener still inside "with source" would make the new one fail to open it
+            self._stopping(wait_for_stop=True)
+            self._stopping = None
+        if self.source is None:
+            import speech_recognition as sr
+
+            self.source = sr.Microphone()
+        if not self.calibrated:
+            with self.source as source:
+                self.recognizer.adjust_for_ambient_noise(source, duration=self.calibration_seconds)
+            self.recognizer.dynamic_energy_threshold = True  # Keep adapting after calibration
+            self.calibrated = True
+        self._stop_listening = self.recognizer.listen_in_background(
+            self.source, self._on_phrase, phrase_time_limit=self.phrase_time_limit
+        )
+
+    def stop(self):
+        """Stop the background listener; it releases the microphone within about a second."""
+        if self._stop_listening is not None:
+            self._stop_listening(wait_for_stop=False)
+            self._stopping = self._stop_listening
+            self._stop_listening = None
+
+    def get(self, timeout=None):
+        """Return the next captured phrase, or None if none arrived within timeout."""
+        try:
+            return self.phrases.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    @property
+    def running(self):
+        return self._stop_listening is not None
+
+    def _on_phrase(self, recognizer, audio):
+        if self.muted:
+            self.dropped_count += 1
+            return
+        self.captured_count += 1
+        try:
+            self.phrases.put_nowait(audio)
+        except queue.Full:
+            # Fall behind gracefully: keep the newest speech, drop the oldest
+            try:
+                self.phrases.get_nowait()
+                self.dropped_count += 1
+            except queue.Empty:
+                pass
+            self.phrases.put_nowait(audio)
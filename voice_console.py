@@ -0,0 +1,72 @@
+import collections
+import threading
+import tkinter as tk
+
+
+class StreamReader:
+    """Reads several pipes on their own threads and merges lines in arrival order."""
+
+    def __init__(self, on_data=None, on_close=None):
+        """on_data() fires when lines are waiting; on_close() once every pipe hits EOF."""
+        self.on_data = on_data
+        self.on_close = on_close
+        self._lines = collections.deque()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._threads = []
+
+    def add(self, pipe, prefix=""):
+        """Start a reader thread for a text-mode pipe."""
+        with self._lock:
+            self._open += 1
+        thread = threading.Thread(target=self._pump, args=(pipe, prefix), daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def read_available(self):
+        """Return every line received so far without blocking."""
+        lines = []
+        while True:
+            try:
+                lines.append(self._lines.popleft())
+            except IndexError:
+                return lines
+
+    def _pump(self, pipe, prefix):
+        try:
+            for line in iter(pipe.readline, ""):
+                self._lines.append(prefix + line)
+                if self.on_data:
+                    self.on_data()
+        except (OSError, ValueError):
+            pass  # Pipe closed underneath us while stopping
+        finally:
+            with self._lock:
+                self._open -= 1
+                closed = self._open == 0
+            if closed and self.on_close:
+                self.on_close()
+
+
+class BoundedConsole:
+    """Tk Text wrapper that appends in batches and keeps at most max_lines lines."""
+
+    def __init__(self, text_widget, max_lines=2000):
+        self.text = text_widget
+        self.max_lines = max_lines
+
+    def append(self, lines):
+        """Insert a batch of lines with one widget update, trimming the oldest."""
+        if isinstance(lines, str):
+            lines = [lines]
+        if not lines:
+            return
+        self.text.insert(tk.END, "".join(lines))
+        line_count = int(self.text.index("end-1c").split(".")[0])
+        excess = line_count - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.see(tk.END)
+
+    def clear(self):
+        self.text.delete(1.0, tk.END)
@@ -0,0 +1,86 @@
+import json
+import socket
+import threading
+import time
+
+
+class EventEmitter:
+    """Sends typed JSON-lines events from the voice engine to the dashboard.
+
+    Events go over a local TCP socket given as "host:port". Without an
+    address, or once the dashboard has gone away, emit() does nothing, so
+    the engine runs the same standalone.
+    """
+
+    def __init__(self, address=None):
+        self._sock = None
+        self._lock = threading.Lock()
+        if address:
+            host, port = address.rsplit(":", 1)
+            try:
+                self._sock = socket.create_connection((host, int(port)), timeout=2)
+                self._sock.settimeout(None)  # The timeout is for connecting; a busy dashboard only slows sends
+                self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError as e:
+                print(f"Event channel unavailable ({address}): {e}")
+
+    def emit(self, event, **fields):
+        """Send one event with a wall-clock timestamp."""
+        if self._sock is None:
+            return
+        fields["event"] = event
+        fields["ts"] = time.time()
+        line = (json.dumps(fields, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                self._sock.sendall(line)
+            except OSError as e:
+                print(f"Event channel closed, events are no longer sent: {e}")
+                self._sock.close()
+                self._sock = None
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+class EventServer:
+    """Accepts voice engine connections on localhost and calls on_event(dict) per event."""
+
+    def __init__(self, on_event, host="127.0.0.1", port=0):
+        self.on_event = on_event
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind((host, port))
+        self._server.listen(2)
+        self._thread = threading.Thread(target=self._accept, name="VoiceEvents", daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        host, port = self._server.getsockname()
+        return f"{host}:{port}"
+
+    def close(self):
+        self._server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return  # Server closed
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn):
+        with conn, conn.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    print(f"Voice event handler error: {e}")
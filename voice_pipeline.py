@@ -0,0 +1,254 @@
+import collections
+import itertools
+import queue
+import threading
+import time
+
+
+class StageMetrics:
+    """Latency samples and counters for one pipeline stage."""
+
+    def __init__(self, name, window=500):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.samples = collections.deque(maxlen=window)
+
+    def record(self, seconds, error=False):
+        self.count += 1
+        self.errors += error
+        self.samples.append(seconds)
+
+    def snapshot(self, queue_depth):
+        samples = sorted(self.samples)
+        if samples:
+            p50 = samples[len(samples) // 2]
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        else:
+            p50 = p95 = 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "queue_depth": queue_depth,
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "max_ms": (samples[-1] if samples else 0.0) * 1000,
+        }
+
+
+class VoicePipeline:
+    """capture -> recognize -> intent -> act -> speak, connected by bounded queues.
+
+    Each stage runs on its own thread, and recognition runs on a pool of
+    workers so a slow network round trip does not hold up the next phrase.
+    Results are put back in capture order before intent matching, so
+    commands still run in the order they were spoken.
+
+    recognize(audio) returns text, match(text) returns an intent (or None),
+    act(text, intent) carries the command out and speak(text) plays a reply
+    queued with say(). Failures are reported through on_error(stage, error).
+    An optional preprocess(audio) runs in the capture stage and may return
+    None to drop a segment before it reaches recognition.
+
+    Every start() gets its own stop event and stage queues. A stage still
+    busy when stop() gives up waiting (a long reply being spoken, say)
+    finishes its item and exits on its own, without touching the new run.
+    """
+
+    STAGES = ("capture", "recognize", "intent", "act", "speak")
+
+    def __init__(self, source, recognize, match, act, speak, workers=2, queue_size=8, on_error=None,
+                 preprocess=None):
+        self.source = source  # queue.Queue of captured audio
+        self.recognize = recognize
+        self.match = match
+        self.act = act
+        self.speak = speak
+        self.workers = workers
+        self.on_error = on_error
+        self.preprocess = preprocess
+        self.queue_size = queue_size
+        self.queues = self._new_queues()
+        self.stage_metrics = {name: StageMetrics(name) for name in self.STAGES}
+        self.dropped_count = 0
+        self.filtered_count = 0  # Segments rejected by preprocess
+        self._stop = threading.Event()
+        self._stop.set()  # Not started
+        self._threads = []
+
+    def start(self):
+        """Start every stage thread."""
+        if self.running:
+            return
+        # Fresh queues for the new run: nothing the last one left behind is replayed
+        stop = self._stop = threading.Event()
+        queues = self.queues = self._new_queues()
+        targets = [("capture", self._capture_stage)]
+        targets += [("recognize", self._recognize_stage)] * self.workers
+        targets += [("intent", self._intent_stage), ("act", self._act_stage), ("speak", self._speak_stage)]
+        for index, (name, target) in enumerate(targets):
+            thread = threading.Thread(target=target, args=(stop, queues), name=f"voice-{name}-{index}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop every stage; work still queued is discarded."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        busy = [thread.name for thread in self._threads if thread.is_alive()]
+        if busy:
+            print(f"Voice pipeline stages still finishing after stop: {', '.join(busy)}")
+        self._threads = []
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def say(self, text):
+        """Queue a reply for the speak stage."""
+        self._put(self._stop, self.queues, "speak", text)
+
+    def metrics(self):
+        """Per-stage latency percentiles, counters and current queue depth."""
+        return {
+            name: self.stage_metrics[name].snapshot(self.queues[name].qsize())
+            for name in self.STAGES
+        }
+
+    def report(self):
+        """Human-readable one-line-per-stage summary of metrics()."""
+        lines = [f"dropped={self.dropped_count} filtered={self.filtered_count}"]
+        for name, stats in self.metrics().items():
+            lines.append(
+                f"{name:<10} n={stats['count']:<5} err={stats['errors']:<3} "
+                f"queue={stats['queue_depth']:<3} p50={stats['p50_ms']:.1f}ms "
+                f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+            )
+        return "\n".join(lines)
+
+    # ---------- stages ----------
+    def _capture_stage(self, stop, queues):
+        sequence = itertools.count()  # Per run, like the intent stage's reorder buffer
+        while not stop.is_set():
+            audio = self._get(queues, "capture")
+            if audio is None:
+                continue
+            started = time.perf_counter()
+            if self.preprocess is not None:
+                try:
+                    audio = self.preprocess(audio)
+                except Exception as e:
+                    self._report_error("capture", e)
+                if audio is None:
+                    self.filtered_count += 1
+                    self.stage_metrics["capture"].record(time.perf_counter() - started)
+                    continue
+            item = (next(sequence), audio)
+            try:
+                queues["recognize"].put_nowait(item)
+            except queue.Full:
+                # Recognition can't keep up: drop the oldest phrase, keep the newest
+                try:
+                    dropped_sequence, _ = queues["recognize"].get_nowait()
+                    self.dropped_count += 1
+                    # Let the reorder buffer skip the dropped phrase
+                    self._put(stop, queues, "intent", (dropped_sequence, None))
+                except queue.Empty:
+                    pass
+                self._put(stop, queues, "recognize", item)
+            self.stage_metrics["capture"].record(time.perf_counter() - started)
+
+    def _recognize_stage(self, stop, queues):
+        while not stop.is_set():
+            item = self._get(queues, "recognize")
+            if item is None:
+                continue
+            sequence, audio = item
+            started = time.perf_counter()
+            text, error = None, None
+            try:
+                text = self.recognize(audio)
+            except Exception as e:
+                error = e
+            self.stage_metrics["recognize"].record(time.perf_counter() - started, error is not None)
+            if error is not None:
+                self._report_error("recognize", error)
+            # Failures still go downstream so the reorder buffer can move past them
+            self._put(stop, queues, "intent", (sequence, text))
+
+    def _intent_stage(self, stop, queues):
+        next_sequence = 0
+        pending = {}
+        while not stop.is_set():
+            item = self._get(queues, "intent")
+            if item is None:
+                continue
+            pending[item[0]] = item
+            while next_sequence in pending:
+                text = pending.pop(next_sequence)[1]
+                next_sequence += 1
+                if text is None:
+                    continue
+                started = time.perf_counter()
+                try:
+                    intent = self.match(text)
+                except Exception as e:
+                    self.stage_metrics["intent"].record(time.perf_counter() - started, True)
+                    self._report_error("intent", e)
+                    continue
+                self.stage_metrics["intent"].record(time.perf_counter() - started)
+                self._put(stop, queues, "act", (text, intent))
+
+    def _act_stage(self, stop, queues):
+        while not stop.is_set():
+            item = self._get(queues, "act")
+            if item is None:
+                continue
+            text, intent = item
+            self._run_stage("act", self.act, text, intent)
+
+    def _speak_stage(self, stop, queues):
+        while not stop.is_set():
+            text = self._get(queues, "speak")
+            if text is None:
+                continue
+            self._run_stage("speak", self.speak, text)
+
+    # ---------- helpers ----------
+    def _run_stage(self, name, func, *args):
+        started = time.perf_counter()
+        error = None
+        try:
+            func(*args)
+        except Exception as e:
+            error = e
+        self.stage_metrics[name].record(time.perf_counter() - started, error is not None)
+        if error is not None:
+            self._report_error(name, error)
+
+    def _new_queues(self):
+        queues = {"capture": self.source}
+        for name in ("recognize", "intent", "act", "speak"):
+            queues[name] = queue.Queue(maxsize=self.queue_size)
+        return queues
+
+    def _get(self, queues, name):
+        try:
+            return queues[name].get(timeout=0.2)
+        except queue.Empty:
+            return None
+
+    def _put(self, stop, queues, name, item):
+        while not stop.is_set():
+            try:
+                queues[name].put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _report_error(self, stage, error):
+        if self.on_error:
+            self.on_error(stage, error)
+        else:
+            print(f"Voice pipeline error in {stage}: {error}")
@@ -0,0 +1,274 @@
+"""Multi-room voice capture: one worker process per audio input.
+
+Each room in rooms.json names an audio input:
+
+    {"rooms": [
+        {"room": "kitchen", "source": "mic", "input": 1},
+        {"room": "living", "source": "mic", "input": "USB Audio"},
+        {"room": "bedroom", "source": "fifo", "path": "/tmp/bedroom.pcm", "sample_rate": 16000},
+        {"room": "test", "source": "wav", "path": "samples/lights_on.wav", "realtime": true}
+    ]}
+
+"input" is a microphone index or part of its name (default: the system
+microphone). A FIFO carries raw little-endian PCM, mono, at sample_rate
+and sample_width; a WAV file is read as fast as possible unless
+"realtime" is set. A worker process captures phrases, drops silence
+with the VAD and recognizes them, so capture, preprocessing and
+recognition for different rooms run on different cores. The parent gets
+one result dict per phrase, tagged with the room.
+"""
+import json
+import multiprocessing
+import queue
+import threading
+import time
+import wave
+
+import speech_recognition as sr
+
+from voice_pipeline import StageMetrics
+
+DEFAULT_CONFIG = "rooms.json"
+
+
+def load_rooms(path=DEFAULT_CONFIG):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["rooms"]
+
+
+class PcmSource(sr.AudioSource):
+    """A WAV file or a FIFO of raw PCM as a speech_recognition audio source.
+
+    ended is set once the stream runs dry (end of file, or the FIFO's
+    writer closed it).
+    """
+
+    def __init__(self, path, sample_rate=16000, sample_width=2, chunk=1024, realtime=False):
+        self.path = path
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = sample_width
+        self.CHUNK = chunk
+        self.realtime = realtime
+        self.ended = False
+        self.stream = None
+        self._file = None
+        self._wave = None
+
+    def __enter__(self):
+        if self.path.lower().endswith(".wav"):
+            self._wave = wave.open(self.path, "rb")
+            if self._wave.getnchannels() != 1:
+                raise ValueError(f"{self.path}: only mono WAV files are supported")
+            self.SAMPLE_RATE = self._wave.getframerate()
+            self.SAMPLE_WIDTH = self._wave.getsampwidth()
+        else:
+            self._file = open(self.path, "rb")  # Blocks until a FIFO has a writer
+        self.stream = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._wave is not None:
+            self._wave.close()
+        if self._file is not None:
+            self._file.close()
+        self.stream = None
+
+    def read(self, size):
+        """Up to size frames of audio; b"" at the end of the stream."""
+        started = time.perf_counter()
+        if self._wave is not None:
+            data = self._wave.readframes(size)
+        else:
+            data = self._file.read(size * self.SAMPLE_WIDTH)
+        if not data:
+            self.ended = True
+        elif self.realtime:
+            duration = len(data) / (self.SAMPLE_WIDTH * self.SAMPLE_RATE)
+            time.sleep(max(0.0, duration - (time.perf_counter() - started)))
+        return data
+
+
+def open_source(spec):
+    """An audio source for one room's config entry."""
+    kind = spec.get("source", "mic")
+    if kind == "mic":
+        device_index = spec.get("input")
+        if isinstance(device_index, str):
+            names = sr.Microphone.list_microphone_names()
+            matches = [i for i, name in enumerate(names) if device_index.lower() in name.lower()]
+            if not matches:
+                raise ValueError(f"No microphone matching {device_index!r} for room {spec['room']}")
+            device_index = matches[0]
+        return sr.Microphone(device_index=device_index, sample_rate=spec.get("sample_rate"))
+    if kind in ("wav", "fifo"):
+        return PcmSource(spec["path"], spec.get("sample_rate", 16000), spec.get("sample_width", 2),
+                         realtime=spec.get("realtime", False))
+    raise ValueError(f"Unknown audio source {kind!r} for room {spec['room']}")
+
+
+def room_worker(spec, results, stop, paused, muted_until, recognizer=("google", {"language": "ar-AR"}),
+                use_vad=True, calibration_seconds=1.0, phrase_time_limit=None):
+    """Worker process: capture, filter and recognize one room's audio until stopped or the input ends.
+
+    Phrases that began before muted_until.value (a time.time()) are dropped.
+    """
+    from recognizers import NotUnderstood, create_recognizer
+
+    room = spec["room"]
+    counts = {"phrases": 0, "filtered": 0, "paused": 0, "muted": 0}
+    try:
+        listener = sr.Recognizer()
+        name, options = recognizer
+        if name == "google":
+            options = dict(options, recognizer=listener)
+        backend = create_recognizer(name, **options)
+        vad = None
+        if use_vad:
+            from vad import EnergyVAD
+            vad = EnergyVAD()
+        with open_source(spec) as source:
+            listener.adjust_for_ambient_noise(source, duration=calibration_seconds)
+            listener.dynamic_energy_threshold = True  # Keep adapting after calibration
+            results.put({"room": room, "event": "listening"})
+            while not stop.is_set() and not getattr(source, "ended", False):
+                try:
+                    audio = listener.listen(source, timeout=1, phrase_time_limit=phrase_time_limit)
+                except sr.WaitTimeoutError:
+                    continue
+                captured = time.time()
+                if not audio.frame_data:
+                    continue
+                if paused.is_set():
+                    counts["paused"] += 1
+                    continue
+                if captured - len(audio.frame_data) / (audio.sample_rate * audio.sample_width) < muted_until.value:
+                    counts["muted"] += 1  # Started while we were speaking: likely our own voice
+                    continue
+                counts["phrases"] += 1
+                started = time.perf_counter()
+                if vad is not None:
+                    audio = vad.process(audio)
+                    if audio is None:
+                        counts["filtered"] += 1
+                        continue
+                recognize_started = time.perf_counter()
+                result = {"room": room, "event": "result", "captured": captured,
+                          "preprocess_ms": (recognize_started - started) * 1000}
+                try:
+                    result["text"] = backend.recognize(audio)
+                except NotUnderstood:
+                    result.update(event="error", stage="recognize", message="not understood", not_understood=True)
+                except Exception as e:
+                    result.update(event="error", stage="recognize", message=str(e))
+                result["recognize_ms"] = (time.perf_counter() - recognize_started) * 1000
+                results.put(result)
+    except Exception as e:
+        results.put({"room": room, "event": "error", "stage": "capture", "message": str(e)})
+    results.put({"room": room, "event": "ended", **counts})
+
+
+class RoomVoicePool:
+    """One room_worker process per room, with results delivered on one thread.
+
+    on_result(result) is called for every dict a worker sends, in the order
+    each room spoke: "listening", "result" (text), "error" (stage,
+    message) and "ended" (capture counters). Per-room latency is measured
+    from the end of the phrase to on_result() returning.
+    """
+
+    def __init__(self, rooms, on_result=None, recognizer=("google", {"language": "ar-AR"}), use_vad=True,
+                 calibration_seconds=1.0, phrase_time_limit=None):
+        self.rooms = rooms
+        self.on_result = on_result
+        self.recognizer = recognizer  # (create_recognizer name, options); built in each worker
+        self.use_vad = use_vad
+        self.calibration_seconds = calibration_seconds
+        self.phrase_time_limit = phrase_time_limit
+        self.room_metrics = {spec["room"]: StageMetrics(spec["room"]) for spec in rooms}
+        self.counts = {}  # room -> counters from its "ended" message
+        # Spawn, not fork: the parent already runs MQTT and TTS threads
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._stop = self._context.Event()
+        self._paused = self._context.Event()
+        self._muted_until = self._context.Value("d", 0.0)
+        self._processes = []
+        self._collector = None
+
+    def start(self):
+        self._stop.clear()
+        for spec in self.rooms:
+            process = self._context.Process(
+                target=room_worker, name=f"voice-room-{spec['room']}",
+                args=(spec, self._results, self._stop, self._paused, self._muted_until, self.recognizer,
+                      self.use_vad, self.calibration_seconds, self.phrase_time_limit),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+        self._collector = threading.Thread(target=self._collect, name="VoiceRooms", daemon=True)
+        self._collector.start()
+
+    def stop(self, timeout=3.0):
+        """Stop every worker; ones still busy after timeout are terminated."""
+        self._stop.set()
+        deadline = time.time() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        if self._collector is not None:
+            self._collector.join(timeout=1)
+            self._collector = None
+
+    def pause(self):
+        """Workers keep their inputs open but discard what they hear."""
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+
+    def mute(self):
+        """Drop phrases heard from now until unmute(), e.g. while our own TTS is playing."""
+        self._muted_until.value = float("inf")
+
+    def unmute(self):
+        self._muted_until.value = time.time()  # A phrase that began while muted is still dropped
+
+    @property
+    def paused(self):
+        return self._paused.is_set()
+
+    @property
+    def running(self):
+        return any(process.is_alive() for process in self._processes) or not self._results.empty()
+
+    def _collect(self):
+        while True:
+            try:
+                result = self._results.get(timeout=0.2)
+            except queue.Empty:
+                if self._stop.is_set() or not self.running:
+                    return
+                continue
+            if result["event"] == "ended":
+                self.counts[result["room"]] = {k: v for k, v in result.items() if k not in ("room", "event")}
+            try:
+                if self.on_result:
+                    self.on_result(result)
+            except Exception as e:
+                print(f"Voice room handler failed on {result}: {e}")
+            if "captured" in result and result["room"] in self.room_metrics:
+                self.room_metrics[result["room"]].record(time.time() - result["captured"], result["event"] == "error")
+
+    def metrics(self):
+        """Per-room phrase counts and phrase-end-to-handled latency."""
+        return {room: dict(m.snapshot(0), **self.counts.get(room, {})) for room, m in self.room_metrics.items()}
+
+    def report(self):
+        lines = []
+        for room, stats in self.metrics().items():
+            lines.append(f"{room:<12} n={stats['count']:<5} err={stats['errors']:<3} "
+                         f"p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+        return "\n".join(lines)